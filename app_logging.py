@@ -0,0 +1,157 @@
+import atexit
+import itertools
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import threading
+import time
+
+# Корневой логгер приложения; логгеры модулей - ROOT.<модуль>
+ROOT = 'asmr'
+# Настройки по умолчанию; переопределяются словарем config.LOGGING
+DEFAULTS = {
+    'level': 'INFO',
+    'modules': {},             # {'database': 'DEBUG', ...}
+    'sample': {},              # {'сообщение': N} - выводится одна запись из N
+    'format': 'text',          # text или json
+    'file': None,              # без файла - stderr
+}
+_listener = None
+_setup_lock = threading.Lock()
+
+
+class StructuredLogger(logging.LoggerAdapter):
+    """Логгер с полями события: log.debug("Запрос", rows=10, seconds=0.02).
+    Проверка уровня выполняется до сборки записи, поэтому отключенный уровень почти ничего не стоит"""
+
+    def __init__(self, logger: logging.Logger):
+        super().__init__(logger, {})
+
+    def process(self, msg, kwargs):
+        fields = {key: kwargs.pop(key) for key in list(kwargs)
+                  if key not in ('exc_info', 'stack_info', 'stacklevel', 'extra')}
+        kwargs['extra'] = {'fields': fields}
+        return msg, kwargs
+
+
+class SamplingFilter(logging.Filter):
+    """Пропускает одну запись из N для частых событий; N задается по тексту сообщения"""
+
+    def __init__(self, rates: dict):
+        super().__init__()
+        self.rates = {message: int(rate) for message, rate in rates.items() if int(rate) > 1}
+        self._counters = {message: itertools.count() for message in self.rates}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        rate = self.rates.get(record.msg)
+        if rate is None:
+            return True
+        if next(self._counters[record.msg]) % rate:
+            return False
+        record.sampled = rate
+        return True
+
+
+class StructuredFormatter(logging.Formatter):
+    """Строка "время уровень логгер: сообщение ключ=значение" или объект JSON на строку"""
+
+    def __init__(self, json_lines: bool = False):
+        super().__init__()
+        self.json_lines = json_lines
+
+    def format(self, record: logging.LogRecord) -> str:
+        fields = dict(getattr(record, 'fields', None) or {})
+        if getattr(record, 'sampled', None):
+            fields['sampled'] = record.sampled
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        timestamp = time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(record.created)) + f'.{int(record.msecs):03d}'
+        if self.json_lines:
+            event = {
+                'time': timestamp,
+                'level': record.levelname,
+                'logger': record.name,
+                'message': record.getMessage(),
+                'thread': record.threadName,
+                **fields,
+            }
+            if record.exc_text:
+                event['exception'] = record.exc_text
+            return json.dumps(event, ensure_ascii=False, default=str)
+        text = f'{timestamp} {record.levelname} {record.name}: {record.getMessage()}'
+        if fields:
+            text += ' ' + ' '.join(f'{key}={value!r}' for key, value in fields.items())
+        if record.exc_text:
+            text += '\n' + record.exc_text
+        return text
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    # Запись форматируется в потоке вывода; в очередь уходит копия без объекта исключения
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.msg = record.getMessage()
+        record.args = None
+        record.exc_info = None
+        return record
+
+
+def get_logger(module: str) -> StructuredLogger:
+    """Логгер модуля приложения (ROOT.<module>)"""
+    return StructuredLogger(logging.getLogger(f'{ROOT}.{module}'))
+
+
+def setup_logging(options: dict = None):
+    """Настроить логирование приложения: уровни по модулям, выборку частых событий и вывод
+    через очередь в отдельном потоке, чтобы запись в поток или файл не задерживала вызывающий код.
+    Без options берется config.LOGGING (если есть); повторный вызов перенастраивает вывод"""
+    global _listener
+    if options is None:
+        try:
+            import config
+            options = getattr(config, 'LOGGING', None) or {}
+        except ImportError:
+            options = {}
+    options = {**DEFAULTS, **options}
+
+    with _setup_lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+        root = logging.getLogger(ROOT)
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        root.setLevel(options['level'])
+        # Записи приложения не дублируются обработчиками корневого логгера Python
+        root.propagate = False
+        for module, level in options['modules'].items():
+            logging.getLogger(f'{ROOT}.{module}').setLevel(level)
+
+        if options['file']:
+            output = logging.FileHandler(options['file'], encoding='utf-8')
+        else:
+            output = logging.StreamHandler(sys.stderr)
+        output.setFormatter(StructuredFormatter(options['format'] == 'json'))
+
+        records = queue.SimpleQueue()
+        handler = _QueueHandler(records)
+        if options['sample']:
+            handler.addFilter(SamplingFilter(options['sample']))
+        root.addHandler(handler)
+        _listener = logging.handlers.QueueListener(records, output, respect_handler_level=True)
+        _listener.start()
+
+
+def shutdown_logging():
+    """Дописать записи из очереди и остановить поток вывода"""
+    global _listener
+    with _setup_lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+
+
+atexit.register(shutdown_logging)
@@ -0,0 +1,105 @@
+"""Память и время построения записей значений показателей: словарь на строку + объект с __dict__
+(как было) против ValueIndicator.row_factory на кортежах курсора.
+
+    python benchmarks/bench_data_classes.py [--rows 1000000]
+
+БД не нужна: строки генерируются в том виде, в каком их отдает psycopg2 (date, Decimal, str, int)."""
+import argparse
+import datetime
+import gc
+import os
+import sys
+import time
+import tracemalloc
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_classes import ValueIndicator, _parse_date  # noqa: E402
+
+COLUMNS = [
+    'Дата начала периода', 'Дата окончания периода', 'Код показателя',
+    'Код аналитики 1', 'Код аналитики 2', 'Код аналитики 3', 'Сумма', 'ДЗО',
+    'Наименование ДЗО', 'Адрес ДЗО',
+]
+
+
+class LegacyValueIndicator:
+    """Прежняя реализация ValueIndicator: атрибуты в __dict__, разбор дат на каждую запись"""
+    def __init__(self, data: dict):
+        self.id_indicator = data.get('Код показателя')
+        self.analytic_1 = data.get('Код аналитики 1')
+        self.analytic_2 = data.get('Код аналитики 2')
+        self.analytic_3 = data.get('Код аналитики 3')
+        self.sum_value = data.get('Сумма')
+        self.date_period_start = _parse_date(data.get('Дата начала периода'))
+        self.date_period_end = _parse_date(data.get('Дата окончания периода'))
+        self.dzo = data.get('ДЗО')
+        self.dzo_name = data.get('Наименование ДЗО')
+        self.dzo_address = data.get('Адрес ДЗО')
+
+
+def generate_rows(count: int) -> list:
+    start = datetime.date(2020, 1, 1)
+    dates = [start + datetime.timedelta(days=30 * month) for month in range(72)]
+    indicators = [f'P{number:04d}' for number in range(500)]
+    analytics = [f'A{number:03d}' for number in range(200)]
+    dzos = [(number, f'ДЗО {number}', f'г. Москва, ул. Тестовая, {number}') for number in range(1, 21)]
+    rows = []
+    for index in range(count):
+        period = dates[index % len(dates)]
+        dzo_id, dzo_name, dzo_address = dzos[index % len(dzos)]
+        rows.append((
+            period, period + datetime.timedelta(days=29),
+            indicators[index % len(indicators)],
+            analytics[index % len(analytics)], analytics[(index // 7) % len(analytics)], None,
+            Decimal(index % 100000) / 100, dzo_id, dzo_name, dzo_address,
+        ))
+    return rows
+
+
+def legacy(rows):
+    return [LegacyValueIndicator(dict(zip(COLUMNS, row))) for row in rows]
+
+
+def slotted(rows):
+    return list(map(ValueIndicator.row_factory(COLUMNS), rows))
+
+
+def measure(name: str, build, rows) -> dict:
+    # Время и память меряются отдельными прогонами: tracemalloc замедляет выделения в разы
+    gc.collect()
+    started = time.perf_counter()
+    records = build(rows)
+    seconds = time.perf_counter() - started
+    del records
+    gc.collect()
+    tracemalloc.start()
+    records = build(rows)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del records
+    return {
+        'name': name,
+        'seconds': seconds,
+        'us_per_row': seconds / len(rows) * 1e6,
+        'bytes_per_row': current / len(rows),
+        'peak_mb': peak / 2 ** 20,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    rows = generate_rows(args.rows)
+    print(f'Строк: {len(rows)}')
+    for name, build in (('dict + __dict__', legacy), ('row_factory + tuple', slotted)):
+        result = measure(name, build, rows)
+        print(f"{result['name']:<22} {result['seconds']:7.2f} с  {result['us_per_row']:6.2f} мкс/строка  "
+              f"{result['bytes_per_row']:7.1f} Б/строка  пик {result['peak_mb']:7.1f} МБ")
+
+
+if __name__ == '__main__':
+    main()
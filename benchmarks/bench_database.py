@@ -0,0 +1,260 @@
+"""Время основных операций Database на синтетических данных в отдельной временной БД.
+
+    python benchmarks/bench_database.py --dsn "host=localhost user=postgres" [--values 100000] [--output run.json]
+    python benchmarks/bench_database.py --initdb [--pg-bin /usr/lib/postgresql/16/bin] [--output run.json]
+    python benchmarks/bench_database.py --compare before.json after.json
+
+С --dsn на сервере создается и в конце удаляется БД asmr_bench_<pid>; с --initdb во временном каталоге
+поднимается отдельный кластер (initdb + pg_ctl), который останавливается и удаляется после прогона.
+Данные генерируются synthetic_data с фиксированным seed, поэтому прогоны на разных коммитах сравнимы.
+Результат - JSON: метаданные прогона и по каждой операции min/median/p95/mean в миллисекундах."""
+import argparse
+import datetime
+import json
+import os
+import platform
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import types
+
+import psycopg2
+from psycopg2 import extensions
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+try:
+    import config  # noqa: E402
+except ImportError:
+    # Бенчмарку нужны только параметры подключения, которые он задает сам
+    config = types.ModuleType('config')
+    config.DB_CONFIG = {}
+    sys.modules['config'] = config
+
+import schema  # noqa: E402
+import synthetic_data  # noqa: E402
+from data_classes import ValueIndicator  # noqa: E402
+from database import Database  # noqa: E402
+
+# Размеры справочников; число значений задается --values
+BENCH_SIZES = {'dzo': 20, 'analytic_types': 10, 'analytics': 1000, 'indicators': 200, 'users': 10, 'years': 10}
+BENCH_LOGIN = 'user00001'
+
+
+# ---------- Сервер и БД ----------
+
+class ThrowawayCluster:
+    """Кластер PostgreSQL во временном каталоге; сокет там же, TCP не слушается"""
+
+    def __init__(self, pg_bin: str = None):
+        self.pg_bin = pg_bin
+        self.directory = tempfile.mkdtemp(prefix='asmr_bench_')
+        self.data = os.path.join(self.directory, 'data')
+        self.port = _free_port()
+
+    def _tool(self, name: str) -> str:
+        path = os.path.join(self.pg_bin, name) if self.pg_bin else shutil.which(name)
+        if not path or not os.path.exists(path):
+            raise SystemExit(f"Не найден {name}: укажите каталог программ PostgreSQL в --pg-bin")
+        return path
+
+    def start(self) -> dict:
+        # initdb и сервер не запускаются от root; в этом случае нужен --dsn
+        subprocess.run([self._tool('initdb'), '-D', self.data, '-U', 'postgres', '-A', 'trust', '-E', 'UTF8',
+                        '--no-sync'], check=True, stdout=subprocess.DEVNULL)
+        options = f"-p {self.port} -k {self.directory} -c listen_addresses='' -c fsync=off"
+        subprocess.run([self._tool('pg_ctl'), '-D', self.data, '-o', options, '-w', '-l',
+                        os.path.join(self.directory, 'server.log'), 'start'], check=True, stdout=subprocess.DEVNULL)
+        return {'host': self.directory, 'port': self.port, 'user': 'postgres'}
+
+    def stop(self):
+        try:
+            subprocess.run([self._tool('pg_ctl'), '-D', self.data, '-m', 'immediate', 'stop'],
+                           check=False, stdout=subprocess.DEVNULL)
+        finally:
+            shutil.rmtree(self.directory, ignore_errors=True)
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _admin(server: dict, statement: str):
+    connection = psycopg2.connect(**{**server, 'dbname': 'postgres'})
+    try:
+        connection.set_isolation_level(extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+        with connection.cursor() as cursor:
+            cursor.execute(statement)
+    finally:
+        connection.close()
+
+
+# ---------- Данные ----------
+
+def load_dataset(db: Database, values: int, seed: int) -> dict:
+    """Заполнить пустую БД генератором synthetic_data с фиксированными размерами справочников"""
+    summary = synthetic_data.generate(db, seed, values=values, **BENCH_SIZES)
+    return {
+        **{key: summary['sizes'][key] for key in ('dzo', 'analytic_types', 'analytics', 'indicators', 'years')},
+        'values': summary['rows'][schema.VALUES_TABLE],
+        'load_seconds': summary['seconds'],
+        'sample': summary['sample'],
+    }
+
+
+# ---------- Замеры ----------
+
+def timed(function, repeat: int, warmup: int = 1, before=None) -> dict:
+    """Выполнить function repeat раз (после warmup прогревочных); before() вызывается вне замера"""
+    samples = []
+    for iteration in range(warmup + repeat):
+        if before is not None:
+            before(iteration)
+        started = time.perf_counter()
+        function(iteration)
+        elapsed = time.perf_counter() - started
+        if iteration >= warmup:
+            samples.append(elapsed * 1000)
+    samples.sort()
+    return {
+        'repeat': repeat,
+        'min_ms': samples[0],
+        'median_ms': statistics.median(samples),
+        'p95_ms': samples[min(len(samples) - 1, int(round(0.95 * (len(samples) - 1))))],
+        'mean_ms': statistics.fmean(samples),
+    }
+
+
+def run_benchmarks(db: Database, dataset: dict, repeat: int) -> dict:
+    indicator = dataset['sample']['indicator']
+    analytic = dataset['sample']['analytic_1']
+    results = {}
+
+    def bench_value(iteration: int, total: float = 1.0) -> ValueIndicator:
+        # Ключи вне сгенерированного диапазона дат, чтобы не пересекаться с загруженными значениями
+        start = datetime.date(2030, 1, 1) + datetime.timedelta(days=31 * iteration)
+        return ValueIndicator({
+            'Код показателя': indicator, 'Дата начала периода': start,
+            'Дата окончания периода': start + datetime.timedelta(days=27),
+            'Код аналитики 1': analytic, 'Сумма': total, 'ДЗО': 1,
+        })
+
+    results['get_values_indicators'] = timed(lambda i: db.get_values_indicators(), max(3, repeat // 5))
+    results['get_values_indicators_page'] = timed(lambda i: db.get_values_indicators_page(), repeat)
+    results['create_values_indicator'] = timed(lambda i: db.create_values_indicator(bench_value(i)), repeat)
+    results['update_values_indicator'] = timed(
+        lambda i: db.update_values_indicator(bench_value(i), bench_value(i, 2.0)), repeat)
+    results['delete_values_indicator'] = timed(lambda i: db.delete_values_indicator(
+        indicator, bench_value(i).date_period_start, bench_value(i).date_period_end, analytic, None, None), repeat)
+
+    for table, read in (
+        ('Показатели', db.get_all_indicators),
+        ('Аналитики', db.get_all_analytics),
+        ('Виды аналитики', db.get_all_analytic_types),
+        ('ДЗО', db.get_all_dzos),
+    ):
+        name = {'Показатели': 'indicators', 'Аналитики': 'analytics',
+                'Виды аналитики': 'analytic_types', 'ДЗО': 'dzos'}[table]
+        results[f'get_all_{name}_cold'] = timed(lambda i: read(), repeat,
+                                                before=lambda i, table=table: db.references.invalidate(table))
+        results[f'get_all_{name}_cached'] = timed(lambda i: read(), repeat)
+    results['login'] = timed(lambda i: db.get_user_by_credentials(BENCH_LOGIN, synthetic_data.PASSWORD), repeat)
+    return results
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ROOT, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def compare(before_path: str, after_path: str):
+    with open(before_path, encoding='utf-8') as file:
+        before = json.load(file)
+    with open(after_path, encoding='utf-8') as file:
+        after = json.load(file)
+    print(f"{'операция':<34} {'было, мс':>10} {'стало, мс':>10} {'изменение':>10}")
+    for name, result in after['results'].items():
+        old = before['results'].get(name)
+        if old is None:
+            print(f'{name:<34} {"-":>10} {result["median_ms"]:10.2f}')
+            continue
+        ratio = result['median_ms'] / old['median_ms'] if old['median_ms'] else float('nan')
+        print(f'{name:<34} {old["median_ms"]:10.2f} {result["median_ms"]:10.2f} {ratio:9.2f}x')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--dsn', default=os.environ.get('ASMR_BENCH_DSN'),
+                        help='Сервер PostgreSQL (строка подключения libpq без dbname)')
+    parser.add_argument('--initdb', action='store_true', help='Поднять временный кластер во временном каталоге')
+    parser.add_argument('--pg-bin', help='Каталог initdb и pg_ctl')
+    parser.add_argument('--values', type=int, default=100_000)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='Файл для результата JSON (по умолчанию stdout)')
+    parser.add_argument('--compare', nargs=2, metavar=('BEFORE', 'AFTER'), help='Сравнить два результата')
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+    if not args.initdb and not args.dsn:
+        parser.error('нужен --dsn (или ASMR_BENCH_DSN) либо --initdb')
+
+    cluster = ThrowawayCluster(args.pg_bin) if args.initdb else None
+    dbname = f'asmr_bench_{os.getpid()}'
+    try:
+        server = cluster.start() if cluster else extensions.parse_dsn(args.dsn)
+        server.pop('dbname', None)
+        _admin(server, f'CREATE DATABASE {dbname}')
+        try:
+            config.DB_CONFIG = {**server, 'dbname': dbname, 'reference_cache_listen': False,
+                                'pool_min_size': 1, 'pool_max_size': 4}
+            db = Database()
+            db.connect()
+            dataset = load_dataset(db, args.values, args.seed)
+            results = run_benchmarks(db, dataset, args.repeat)
+            with db.borrow_connection() as connection:
+                server_version = connection.server_version
+            db.pool.close()
+        finally:
+            _admin(server, f'DROP DATABASE IF EXISTS {dbname} WITH (FORCE)')
+    finally:
+        if cluster:
+            cluster.stop()
+
+    report = {
+        'meta': {
+            'commit': _git_commit(),
+            'time': datetime.datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'postgresql': server_version,
+            'platform': platform.platform(),
+            'seed': args.seed,
+            'repeat': args.repeat,
+            'dataset': dataset,
+        },
+        'results': results,
+    }
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            file.write(text)
+        for name, result in results.items():
+            print(f"{name:<34} median {result['median_ms']:9.2f} мс  p95 {result['p95_ms']:9.2f} мс")
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
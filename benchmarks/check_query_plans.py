@@ -0,0 +1,57 @@
+"""Проверка планов частых запросов к значениям показателей: завершается с кодом 1, если какой-то из них
+читает таблицу значений целиком (нет подходящего индекса).
+
+    python benchmarks/check_query_plans.py [--dsn "host=localhost dbname=asmr user=postgres"] [--migrate] [--verbose]
+
+Без --dsn используется config.DB_CONFIG; --migrate сначала обновляет схему до последней версии."""
+import argparse
+import os
+import sys
+import types
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+try:
+    import config  # noqa: E402
+except ImportError:
+    # Проверке нужны только параметры подключения; без config.py их задает --dsn
+    config = types.ModuleType('config')
+    config.DB_CONFIG = {}
+    sys.modules['config'] = config
+
+from psycopg2 import extensions  # noqa: E402
+
+from database import Database  # noqa: E402
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--dsn', help='Строка подключения libpq к проверяемой БД')
+    parser.add_argument('--migrate', action='store_true', help='Применить недостающие версии схемы')
+    parser.add_argument('--verbose', action='store_true', help='Печатать планы всех запросов')
+    args = parser.parse_args()
+
+    if args.dsn:
+        config.DB_CONFIG = {**extensions.parse_dsn(args.dsn), 'reference_cache_listen': False,
+                            'pool_min_size': 1, 'pool_max_size': 1}
+    db = Database()
+    if not db.connect():
+        return 2
+    if args.migrate:
+        applied = db.migrate()
+        print(f"Версия схемы {db.schema_version()}; применено: {', '.join(map(str, applied)) or 'нет'}")
+
+    failed = 0
+    for result in db.check_query_plans():
+        failed += bool(result['problems'])
+        print(f"{'FULL SCAN' if result['problems'] else 'ok':<10} {result['query']}")
+        for problem in result['problems']:
+            print(f'    {problem}')
+        if result['problems'] or args.verbose:
+            print('    ' + result['plan'].replace('\n', '\n    '))
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,185 @@
+import io
+
+import pandas as pd
+from openpyxl import load_workbook
+
+from date_parsing import merge_counts, parse_date_column
+from schema import VALUES_TABLE
+
+
+# Поля классов data_classes -> колонки таблиц. В заголовках файлов допускаются оба варианта
+TABLE_COLUMNS = {
+    VALUES_TABLE: {
+        'date_period_start': 'Дата начала периода',
+        'date_period_end': 'Дата окончания периода',
+        'id_indicator': 'Код показателя',
+        'analytic_1': 'Код аналитики 1',
+        'analytic_2': 'Код аналитики 2',
+        'analytic_3': 'Код аналитики 3',
+        'sum_value': 'Сумма',
+        'dzo': 'ДЗО',
+    },
+    'Показатели': {
+        'id': 'Код показателя',
+        'indicator_name': 'Показатель',
+        'id_analytic_type_1': 'Код вида аналитики 1',
+        'id_analytic_type_2': 'Код вида аналитики 2',
+        'id_analytic_type_3': 'Код вида аналитики 3',
+        'date_period_start': 'Дата начала периода',
+        'date_period_end': 'Дата конца периода',
+    },
+    'Аналитики': {
+        'id_analytic_type': 'Код вида аналитики',
+        'id': 'Код аналитики',
+        'analytic_name': 'Аналитика',
+        'date_period_start': 'Дата начала периода',
+        'date_period_end': 'Дата конца периода',
+    },
+    'Виды аналитики': {
+        'id': 'Код вида аналитики',
+        'analytic_type_name': 'Вид аналитики',
+    },
+    'ДЗО': {
+        'id': 'Идентификатор ДЗО',
+        'name': 'Наименование',
+        'address': 'Адрес',
+    },
+}
+
+REQUIRED_COLUMNS = {
+    VALUES_TABLE: ('Дата начала периода', 'Дата окончания периода', 'Код показателя', 'Код аналитики 1', 'Сумма'),
+    'Показатели': ('Код показателя', 'Показатель'),
+    'Аналитики': ('Код вида аналитики', 'Код аналитики', 'Аналитика'),
+    'Виды аналитики': ('Код вида аналитики', 'Вид аналитики'),
+    'ДЗО': ('Наименование',),
+}
+
+# Порядок загрузки листов книги с учетом внешних ключей
+LOAD_ORDER = ('Виды аналитики', 'Аналитики', 'Показатели', 'ДЗО', VALUES_TABLE)
+
+DATE_COLUMNS = ('Дата начала периода', 'Дата окончания периода', 'Дата конца периода')
+NUMERIC_COLUMNS = ('Сумма',)
+
+
+def resolve_columns(table_name: str, headers) -> dict:
+    """Сопоставить заголовки файла колонкам таблицы: {заголовок: колонка}"""
+    if table_name not in TABLE_COLUMNS:
+        raise ValueError(f"Загрузка в таблицу '{table_name}' не поддерживается")
+    aliases = {}
+    for field, column in TABLE_COLUMNS[table_name].items():
+        aliases[column.lower()] = column
+        aliases[field.lower()] = column
+
+    mapping = {}
+    for header in headers:
+        column = aliases.get(str(header).strip().lower())
+        if column and column not in mapping.values():
+            mapping[header] = column
+
+    missing = [column for column in REQUIRED_COLUMNS[table_name] if column not in mapping.values()]
+    if missing:
+        raise ValueError(f"В файле отсутствуют обязательные колонки: {', '.join(missing)}")
+    return mapping
+
+
+def read_csv_chunks(filepath, chunk_size: int = 50000, sep: str = ','):
+    """Читать CSV порциями по chunk_size строк, все значения как строки"""
+    return pd.read_csv(
+        filepath,
+        sep=sep,
+        dtype=str,
+        keep_default_na=False,
+        encoding='utf-8-sig',
+        chunksize=chunk_size,
+    )
+
+
+def workbook_tables(filepath) -> list:
+    """Листы книги, названные как таблицы, в порядке загрузки: [(лист, таблица)]"""
+    workbook = load_workbook(filepath, read_only=True)
+    try:
+        by_name = {title.strip().lower(): title for title in workbook.sheetnames}
+    finally:
+        workbook.close()
+    return [(by_name[table.lower()], table) for table in LOAD_ORDER if table.lower() in by_name]
+
+
+def read_excel_chunks(filepath, sheet_name: str = None, chunk_size: int = 50000):
+    """Читать лист xlsx построчно (read_only) и отдавать порции по chunk_size строк"""
+    workbook = load_workbook(filepath, read_only=True, data_only=True)
+    try:
+        sheet = workbook[sheet_name] if sheet_name else workbook.active
+        rows = sheet.iter_rows(values_only=True)
+        headers = next(rows, None)
+        if headers is None:
+            return
+        headers = ['' if header is None else str(header).strip() for header in headers]
+        width = len(headers)
+        batch = []
+        for row in rows:
+            if not any(value is not None for value in row):
+                continue
+            # В режиме read_only строки могут быть короче или длиннее заголовка
+            row = row[:width] if len(row) >= width else row + (None,) * (width - len(row))
+            batch.append(row)
+            if len(batch) >= chunk_size:
+                yield _excel_frame(batch, headers)
+                batch = []
+        if batch:
+            yield _excel_frame(batch, headers)
+    finally:
+        workbook.close()
+
+
+def _excel_frame(batch: list, headers: list) -> pd.DataFrame:
+    frame = pd.DataFrame(batch, columns=headers, dtype=object)
+    # Коды, введенные в Excel числами, приходят как 101.0
+    for position in range(frame.shape[1]):
+        frame.iloc[:, position] = frame.iloc[:, position].map(
+            lambda value: str(int(value)) if isinstance(value, float) and value.is_integer() else value,
+            na_action='ignore',
+        )
+    return frame
+
+
+def prepare_chunk(chunk: pd.DataFrame, mapping: dict, date_formats: dict = None) -> pd.DataFrame:
+    """Привести порцию к колонкам таблицы: пустые значения -> NULL, даты -> ISO, суммы -> числа с точкой.
+    В date_formats, если передан, добавляется число дат, разобранных по каждому формату"""
+    frame = chunk[list(mapping)].rename(columns=mapping)
+    for column in frame.columns:
+        values = frame[column]
+        text = _has_strings(values)
+        # .str возвращает NaN для нестроковых ячеек, поэтому они восстанавливаются из исходной колонки
+        if text:
+            values = values.str.strip().fillna(values)
+        values = values.where(values.notna() & (values != ''), None)
+        if column in DATE_COLUMNS:
+            parsed, counts = parse_date_column(values)
+            if date_formats is not None:
+                merge_counts(date_formats, counts)
+            bad = values.notna() & parsed.isna()
+            if bad.any():
+                raise ValueError(f"Некорректная дата в колонке '{column}': {values[bad].iloc[0]}")
+            values = parsed.map(lambda value: value.isoformat(), na_action='ignore')
+        elif column in NUMERIC_COLUMNS and text:
+            values = values.str.replace(r'[\s\xa0]', '', regex=True).str.replace(',', '.', regex=False).fillna(values)
+        frame[column] = values
+    return frame
+
+
+def _has_strings(values: pd.Series) -> bool:
+    return pd.api.types.infer_dtype(values, skipna=True) in ('string', 'mixed', 'mixed-integer')
+
+
+def copy_statement(target: str, columns) -> str:
+    """COPY FROM STDIN в target (уже экранированное имя таблицы)"""
+    column_list = ', '.join(f'"{column}"' for column in columns)
+    return f'COPY {target} ({column_list}) FROM STDIN WITH (FORMAT csv)'
+
+
+def to_copy_buffer(frame: pd.DataFrame) -> io.StringIO:
+    """Сериализовать порцию в CSV для COPY; None записывается пустым полем, то есть NULL"""
+    buffer = io.StringIO()
+    frame.to_csv(buffer, index=False, header=False)
+    buffer.seek(0)
+    return buffer
@@ -0,0 +1,185 @@
+import threading
+import time
+from contextlib import contextmanager
+
+import psycopg2
+from psycopg2 import extensions
+
+
+class PoolError(Exception):
+    """Ошибка пула соединений"""
+    pass
+
+
+class PoolTimeoutError(PoolError):
+    """Не удалось получить соединение за отведенное время"""
+    pass
+
+
+class ConnectionPool:
+    """Потокобезопасный пул соединений psycopg2 с ожиданием и проверкой соединений при выдаче"""
+
+    def __init__(self, connect_kwargs: dict, min_size: int = 1, max_size: int = 10,
+                 timeout: float = 30.0, health_check_interval: float = 30.0):
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise PoolError(f"Некорректные размеры пула: min={min_size}, max={max_size}")
+        self.connect_kwargs = dict(connect_kwargs)
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.health_check_interval = health_check_interval
+
+        self._condition = threading.Condition()
+        self._idle = []          # [(connection, время возврата в пул)]
+        self._in_use = set()
+        self._pending = 0        # соединения, которые сейчас открываются
+        self._closed = False
+
+        self._waiters = 0
+        self._checkouts = 0
+        self._timeouts = 0
+        self._discarded = 0
+        self._wait_time_total = 0.0
+        self._wait_time_max = 0.0
+
+        for _ in range(min_size):
+            self._idle.append((self._new_connection(), time.monotonic()))
+
+    def _new_connection(self):
+        return psycopg2.connect(**self.connect_kwargs)
+
+    def _size(self) -> int:
+        return len(self._idle) + len(self._in_use) + self._pending
+
+    def _is_healthy(self, connection, idle_since: float) -> bool:
+        """Проверить соединение перед выдачей: закрытые и зависшие в транзакции отбрасываются,
+        давно простаивающие проверяются запросом SELECT 1"""
+        if connection.closed:
+            return False
+        if connection.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+            return False
+        if time.monotonic() - idle_since < self.health_check_interval:
+            return True
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            connection.rollback()
+            return True
+        except Exception:
+            return False
+
+    def _discard(self, connection):
+        self._discarded += 1
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    def getconn(self, timeout: float = None):
+        """Взять соединение из пула, ожидая освобождения не дольше timeout секунд"""
+        timeout = self.timeout if timeout is None else timeout
+        started = time.monotonic()
+        deadline = started + timeout
+        while True:
+            connection, idle_since = self._reserve(deadline, timeout)
+            if connection is None:
+                # Свободных нет, но есть место: подключаемся вне блокировки
+                try:
+                    connection = self._new_connection()
+                except Exception:
+                    with self._condition:
+                        self._pending -= 1
+                        self._condition.notify()
+                    raise
+                with self._condition:
+                    self._pending -= 1
+                    self._in_use.add(connection)
+                break
+            if self._is_healthy(connection, idle_since):
+                break
+            with self._condition:
+                self._in_use.discard(connection)
+                self._discard(connection)
+                self._condition.notify()
+
+        waited = time.monotonic() - started
+        with self._condition:
+            self._checkouts += 1
+            self._wait_time_total += waited
+            self._wait_time_max = max(self._wait_time_max, waited)
+        return connection
+
+    def _reserve(self, deadline: float, timeout: float):
+        """Занять свободное соединение или место под новое (тогда возвращается None)"""
+        with self._condition:
+            while True:
+                if self._closed:
+                    raise PoolError("Пул соединений закрыт")
+                if self._idle:
+                    connection, idle_since = self._idle.pop()
+                    self._in_use.add(connection)
+                    return connection, idle_since
+                if self._size() < self.max_size:
+                    self._pending += 1
+                    return None, None
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._timeouts += 1
+                    raise PoolTimeoutError(
+                        f"Нет свободных соединений в пуле за {timeout} с (занято {len(self._in_use)} из {self.max_size})"
+                    )
+                self._waiters += 1
+                try:
+                    self._condition.wait(remaining)
+                finally:
+                    self._waiters -= 1
+
+    def putconn(self, connection):
+        """Вернуть соединение в пул"""
+        with self._condition:
+            self._in_use.discard(connection)
+            if self._closed or connection.closed:
+                self._discard(connection)
+            else:
+                try:
+                    if connection.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+                        connection.rollback()
+                    self._idle.append((connection, time.monotonic()))
+                except Exception:
+                    self._discard(connection)
+            self._condition.notify()
+
+    @contextmanager
+    def connection(self, timeout: float = None):
+        """Контекстный менеджер: взять соединение и гарантированно вернуть его"""
+        connection = self.getconn(timeout)
+        try:
+            yield connection
+        finally:
+            self.putconn(connection)
+
+    def stats(self) -> dict:
+        """Метрики пула"""
+        with self._condition:
+            return {
+                'size': self._size(),
+                'in_use': len(self._in_use),
+                'idle': len(self._idle),
+                'waiters': self._waiters,
+                'max_size': self.max_size,
+                'checkouts': self._checkouts,
+                'timeouts': self._timeouts,
+                'discarded': self._discarded,
+                'wait_time_total': self._wait_time_total,
+                'wait_time_avg': self._wait_time_total / self._checkouts if self._checkouts else 0.0,
+                'wait_time_max': self._wait_time_max,
+            }
+
+    def close(self):
+        """Закрыть все свободные соединения; занятые закрываются при возврате"""
+        with self._condition:
+            self._closed = True
+            for connection, _ in self._idle:
+                self._discard(connection)
+            self._idle.clear()
+            self._condition.notify_all()
@@ -0,0 +1,123 @@
+import numpy as np
+import pandas as pd
+
+from date_parsing import parse_date
+from values_store import ValuesStore
+
+
+class ConsolidationEngine:
+    """Консолидированные итоги по группам ДЗО (группы могут быть вложенными).
+    Итоги по группе, показателю и периоду считаются за один проход по снимку значений,
+    изменение значения одного ДЗО добавляет разницу только к группам этого ДЗО"""
+
+    def __init__(self, groups, members, store: ValuesStore = None):
+        # groups - записи DZOGroup, members - пары (идентификатор группы, ДЗО)
+        self.groups = {group.id: group for group in groups}
+        self.members = list(members)
+        self.closure = self._build_closure()
+        self.totals = {}                   # (группа, показатель, начало, конец) -> [сумма, число значений]
+        if store is not None:
+            self.rebuild(store)
+
+    @classmethod
+    def from_database(cls, db, filters: dict = None) -> 'ConsolidationEngine':
+        """Загрузить группы и снимок значений и посчитать итоги"""
+        return cls(db.get_dzo_groups(), db.get_dzo_group_members(), db.load_values_store(filters))
+
+    def _build_closure(self) -> dict:
+        """ДЗО -> все группы, в которые оно входит напрямую или через вложенные группы"""
+        ancestors = {}
+        for group_id in self.groups:
+            chain, current = [], group_id
+            while current is not None:
+                if current in chain:
+                    raise ValueError(f"Цикл во вложенности групп ДЗО: {' -> '.join(map(str, chain + [current]))}")
+                if current not in self.groups:
+                    raise ValueError(f"Родительская группа {current} не найдена")
+                chain.append(current)
+                current = self.groups[current].parent_id
+            ancestors[group_id] = chain
+        closure = {}
+        for group_id, dzo_id in self.members:
+            if group_id not in ancestors:
+                raise ValueError(f"Группа {group_id} не найдена")
+            closure.setdefault(int(dzo_id), set()).update(ancestors[group_id])
+        return {dzo_id: tuple(sorted(groups)) for dzo_id, groups in closure.items()}
+
+    def rebuild(self, store: ValuesStore):
+        """Посчитать все итоги: значения сворачиваются по ДЗО, показателю и периоду,
+        затем через таблицу замыкания (ДЗО, группа) разносятся по группам"""
+        dzo_codes = store.dictionaries['dzo']
+        pairs = [
+            (code, group_id)
+            for dzo_id, group_ids in self.closure.items()
+            if (code := dzo_codes.lookup(dzo_id)) is not None
+            for group_id in group_ids
+        ]
+        self.totals = {}
+        if not pairs or not len(store):
+            return
+        closure = pd.DataFrame(pairs, columns=['dzo', 'group'])
+        values = pd.DataFrame({
+            'dzo': store.codes['dzo'],
+            'indicator': store.codes['indicator'],
+            'start': store.start,
+            'end': store.end,
+            'sum': store.sums,
+        })
+        values = values[np.isin(values['dzo'].to_numpy(), closure['dzo'].to_numpy())]
+        by_dzo = values.groupby(['dzo', 'indicator', 'start', 'end'], sort=False)['sum'].agg(['sum', 'size'])
+        by_group = (
+            by_dzo.reset_index()
+            .merge(closure, on='dzo')
+            .groupby(['group', 'indicator', 'start', 'end'], sort=False)[['sum', 'size']]
+            .sum()
+        )
+        indicators = store.dictionaries['indicator'].decode(by_group.index.get_level_values('indicator').to_numpy())
+        starts = by_group.index.get_level_values('start').to_numpy().astype('datetime64[D]').tolist()
+        ends = by_group.index.get_level_values('end').to_numpy().astype('datetime64[D]').tolist()
+        groups = by_group.index.get_level_values('group').tolist()
+        self.totals = {
+            (group, indicator, start, end): [total, int(count)]
+            for group, indicator, start, end, total, count
+            in zip(groups, indicators, starts, ends, by_group['sum'].tolist(), by_group['size'].tolist())
+        }
+
+    def apply_change(self, old_value=None, new_value=None):
+        """Учесть изменение значения: old_value - запись до изменения (None для новой),
+        new_value - после (None для удаленной)"""
+        if old_value is not None:
+            self._add(old_value, -1)
+        if new_value is not None:
+            self._add(new_value, 1)
+
+    def _add(self, value, sign: int):
+        if value.dzo is None or value.dzo == '':
+            return
+        groups = self.closure.get(int(value.dzo), ())
+        amount = 0.0 if value.sum_value is None else float(value.sum_value)
+        period = (value.id_indicator, parse_date(value.date_period_start), parse_date(value.date_period_end))
+        for group_id in groups:
+            key = (group_id,) + period
+            cell = self.totals.setdefault(key, [0.0, 0])
+            cell[0] += sign * amount
+            cell[1] += sign
+            if cell[1] <= 0:
+                del self.totals[key]
+
+    def total(self, group_id: int, indicator_id: str, date_start, date_end) -> float:
+        cell = self.totals.get((group_id, indicator_id, parse_date(date_start), parse_date(date_end)))
+        return cell[0] if cell else 0.0
+
+    def to_frame(self, group_id: int = None) -> pd.DataFrame:
+        """Итоги таблицей: группа, наименование группы, показатель, период, сумма, число значений"""
+        rows = [
+            (group, self.groups[group].name, indicator, start, end, total, count)
+            for (group, indicator, start, end), (total, count) in self.totals.items()
+            if group_id is None or group == group_id
+        ]
+        frame = pd.DataFrame(rows, columns=[
+            'Идентификатор группы', 'Группа', 'Код показателя', 'Дата начала периода', 'Дата окончания периода',
+            'Сумма', 'Количество',
+        ])
+        return frame.sort_values(['Идентификатор группы', 'Код показателя', 'Дата начала периода']).reset_index(drop=True)
@@ -0,0 +1,221 @@
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from values_store import CODE_COLUMNS, ValuesStore
+
+# Измерения куба; имена совпадают с измерениями Database.aggregate_values
+PERIOD_DIMENSIONS = ('month', 'quarter', 'year')
+DIMENSIONS = tuple(CODE_COLUMNS) + PERIOD_DIMENSIONS
+MEASURES = ('sum', 'count', 'min', 'max')
+TOTAL_LABEL = 'Итого'
+
+
+class ValuesCube:
+    """Куб значений показателей в памяти: срез загружается один раз, сводные таблицы, подытоги и детализация
+    считаются из него. Группировки кэшируются; более общая группировка сворачивается из уже посчитанной детальной"""
+
+    def __init__(self, store: ValuesStore, cache_size: int = 64):
+        self.store = store
+        self.cache_size = cache_size
+        self._cache = OrderedDict()        # (измерения, фильтры) -> DataFrame мер по кодам
+        self._cache_version = store.version
+        self.hits = 0
+        self.rollups = 0
+        self.scans = 0
+
+    @classmethod
+    def from_database(cls, db, filters: dict = None, cache_size: int = 64) -> 'ValuesCube':
+        """Загрузить срез значений (фильтры как у Database.aggregate_values) одной выгрузкой"""
+        return cls(ValuesStore.from_database(db, filters), cache_size)
+
+    def group(self, dimensions=(), filters: dict = None) -> pd.DataFrame:
+        """Меры sum/count/min/max по измерениям; индекс - значения измерений (None для пустых)"""
+        return self._decode(self._group(tuple(dimensions), filters))
+
+    def pivot(self, rows, columns=(), measure: str = 'sum', filters: dict = None, margins: bool = False) -> pd.DataFrame:
+        """Сводная таблица: измерения rows по строкам, columns по столбцам.
+        margins=True добавляет строку и столбец TOTAL_LABEL, взятые из более общих группировок"""
+        rows, columns = _as_tuple(rows), _as_tuple(columns)
+        if not rows:
+            raise ValueError("Для сводной таблицы нужно хотя бы одно измерение строк")
+        self._check(rows + columns, (measure,))
+        values = self._decode(self._group(rows + columns, filters))[measure]
+        table = values.unstack(list(columns)) if columns else values.to_frame(measure)
+        if not margins:
+            return table
+        table = table.copy()
+        totals = []
+        if columns:
+            column_totals = self._decode(self._group(columns, filters))[measure]
+            totals = column_totals.reindex(table.columns).tolist()
+            table[_total_key(columns)] = self._decode(self._group(rows, filters))[measure]
+        totals.append(self._decode(self._group((), filters))[measure].iloc[0])
+        table.loc[_total_key(rows), :] = totals
+        return table
+
+    def subtotals(self, dimensions, measure: str = 'sum', filters: dict = None) -> pd.DataFrame:
+        """Подытоги по иерархии измерений, как ROLLUP в SQL: (a, b, c), (a, b), (a), общий итог.
+        Свернутые измерения отмечаются TOTAL_LABEL"""
+        dimensions = _as_tuple(dimensions)
+        self._check(dimensions, (measure,))
+        parts = []
+        for depth in range(len(dimensions), -1, -1):
+            level = self._decode(self._group(dimensions[:depth], filters))[[measure]].reset_index()
+            level = level.drop(columns='index', errors='ignore')
+            for dimension in dimensions[depth:]:
+                level[dimension] = TOTAL_LABEL
+            parts.append(level[list(dimensions) + [measure]])
+        return pd.concat(parts, ignore_index=True)
+
+    def drill_down(self, path: dict, into: str, measure: str = 'sum', filters: dict = None) -> pd.Series:
+        """Детализация ячейки path ({измерение: значение}) по измерению into"""
+        dimensions = tuple(path) + (into,)
+        self._check(dimensions, (measure,))
+        table = self._decode(self._group(dimensions, filters))[measure]
+        if not path:
+            return table
+        selected = table.xs(tuple(path.values()), level=list(path), drop_level=True)
+        return selected
+
+    def stats(self) -> dict:
+        return {
+            'rows': len(self.store),
+            'cached_groups': len(self._cache),
+            'hits': self.hits,
+            'rollups': self.rollups,
+            'scans': self.scans,
+        }
+
+    # ---------- Группировка по кодам ----------
+
+    def _group(self, dimensions: tuple, filters: dict = None) -> pd.DataFrame:
+        self._check(dimensions, ())
+        if self._cache_version != self.store.version:
+            # Снимок изменился (upsert/delete) - посчитанные группировки устарели
+            self._cache.clear()
+            self._cache_version = self.store.version
+        filter_key = _freeze(filters)
+        key = (frozenset(dimensions), filter_key)
+        cached = self._cache.get(key)
+        if cached is not None:
+            self.hits += 1
+            self._cache.move_to_end(key)
+            return _reorder(cached, dimensions)
+
+        finer = self._finest_cached(set(dimensions), filter_key)
+        if finer is not None:
+            self.rollups += 1
+            result = _roll_up(finer, dimensions)
+        else:
+            self.scans += 1
+            result = self._scan(dimensions, filters)
+        self._cache[key] = result
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return _reorder(result, dimensions)
+
+    def _finest_cached(self, dimensions: set, filter_key):
+        # Из подходящих берется самая компактная группировка, содержащая все нужные измерения
+        candidates = [
+            frame for (cached_dimensions, cached_filters), frame in self._cache.items()
+            if cached_filters == filter_key and dimensions < cached_dimensions
+        ]
+        return min(candidates, key=len) if candidates else None
+
+    def _scan(self, dimensions: tuple, filters: dict = None) -> pd.DataFrame:
+        rows = self.store.mask(filters) if filters else slice(None)
+        sums = self.store.sums[rows]
+        if not dimensions:
+            # Пустые суммы пропускаются, как в groupby: итог NaN, только если сумм нет совсем
+            present = np.any(~np.isnan(sums))
+            return pd.DataFrame({
+                'sum': [np.nansum(sums) if present else np.nan],
+                'count': [len(sums)],
+                'min': [np.nanmin(sums) if present else np.nan],
+                'max': [np.nanmax(sums) if present else np.nan],
+            })
+        frame = pd.DataFrame({dimension: self._codes(dimension, rows) for dimension in dimensions})
+        grouped = frame.assign(value=sums).groupby(list(dimensions), sort=True)['value']
+        return pd.DataFrame({
+            'sum': grouped.sum(min_count=1),
+            'count': grouped.size(),
+            'min': grouped.min(),
+            'max': grouped.max(),
+        })
+
+    def _codes(self, dimension: str, rows) -> np.ndarray:
+        if dimension in CODE_COLUMNS:
+            return self.store.codes[dimension][rows]
+        # Периоды кодируются номером месяца начала периода от 1970-01
+        months = self.store.start[rows].astype('datetime64[M]').astype(np.int64)
+        if dimension == 'quarter':
+            return months - months % 3
+        if dimension == 'year':
+            return months - months % 12
+        return months
+
+    def _decode(self, frame: pd.DataFrame) -> pd.DataFrame:
+        if not isinstance(frame.index, pd.MultiIndex) and frame.index.name is None:
+            return frame
+        frame = frame.copy()
+        levels = [self._labels(name, frame.index.get_level_values(name).to_numpy()) for name in frame.index.names]
+        frame.index = pd.MultiIndex.from_arrays(levels, names=frame.index.names) if len(levels) > 1 \
+            else pd.Index(levels[0], name=frame.index.names[0])
+        # Коды присвоены в порядке появления значений; результат упорядочивается по самим значениям
+        return frame.sort_index(na_position='last')
+
+    def _labels(self, dimension: str, codes: np.ndarray) -> np.ndarray:
+        if dimension in CODE_COLUMNS:
+            return self.store.dictionaries[dimension].decode(codes)
+        return np.array([np.datetime64(int(code), 'M').astype('datetime64[D]').item() for code in codes], dtype=object)
+
+    @staticmethod
+    def _check(dimensions, measures):
+        unknown = [name for name in dimensions if name not in DIMENSIONS]
+        unknown += [name for name in measures if name not in MEASURES]
+        if unknown:
+            raise ValueError(f"Неизвестные измерения или меры куба: {', '.join(unknown)}")
+
+
+def _roll_up(frame: pd.DataFrame, dimensions: tuple) -> pd.DataFrame:
+    if not dimensions:
+        return pd.DataFrame({
+            'sum': [frame['sum'].sum(min_count=1)],
+            'count': [frame['count'].sum()],
+            'min': [frame['min'].min()],
+            'max': [frame['max'].max()],
+        })
+    grouped = frame.groupby(level=list(dimensions), sort=True)
+    return pd.DataFrame({
+        'sum': grouped['sum'].sum(min_count=1),
+        'count': grouped['count'].sum(),
+        'min': grouped['min'].min(),
+        'max': grouped['max'].max(),
+    })
+
+
+def _reorder(frame: pd.DataFrame, dimensions: tuple) -> pd.DataFrame:
+    # Кэш не зависит от порядка измерений; уровни индекса выстраиваются как в запросе
+    if len(dimensions) > 1 and tuple(frame.index.names) != dimensions:
+        return frame.reorder_levels(list(dimensions)).sort_index()
+    return frame
+
+
+def _freeze(filters: dict = None):
+    if not filters:
+        return ()
+    return tuple(sorted(
+        (name, tuple(sorted(value, key=str)) if isinstance(value, (list, tuple, set)) else value)
+        for name, value in filters.items()
+        if value is not None and value != '' and value != []
+    ))
+
+
+def _as_tuple(dimensions) -> tuple:
+    return (dimensions,) if isinstance(dimensions, str) else tuple(dimensions)
+
+
+def _total_key(dimensions: tuple):
+    return TOTAL_LABEL if len(dimensions) <= 1 else (TOTAL_LABEL,) * len(dimensions)
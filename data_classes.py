@@ -1,32 +1,91 @@
 import datetime 
+from operator import itemgetter
 
-def _parse_date(value):
-    if not value:
-        return None
-
-    if isinstance(value, datetime.date):
-        return value
-
-    if isinstance(value, datetime.datetime):
-        return value.date()
-
-    if isinstance(value, str):
-        for fmt in ('%Y-%m-%d', '%d.%m.%Y', '%Y-%m-%d %H:%M:%S'):
-            try:
-                return datetime.datetime.strptime(value, fmt).date()
-            except Exception:
-                continue
-    return None
-class ValueIndicator:
-    def __init__(self, data: dict):
-        self.id_indicator = data.get('Код показателя')
-        self.analytic_1 = data.get('Код аналитики 1')
-        self.analytic_2 = data.get('Код аналитики 2')
-        self.analytic_3 = data.get('Код аналитики 3')
-        self.sum_value = data.get('Сумма')
-        self.date_period_start = _parse_date(data.get('Дата начала периода'))
-        self.date_period_end = _parse_date(data.get('Дата окончания периода'))
-        self.dzo = data.get('ДЗО')
+from date_parsing import parse_date as _parse_date
+
+
+class _Record(tuple):
+    """Неизменяемая запись на кортеже: значения лежат по позициям _fields, без __dict__ на экземпляр.
+    Подклассы объявляют __slots__ = () и _fields = ((атрибут, колонка, дата ли), ...)"""
+    __slots__ = ()
+    _fields = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        for index, (name, column, _) in enumerate(cls._fields):
+            setattr(cls, name, property(itemgetter(index), doc=column))
+
+    def __new__(cls, data: dict):
+        return tuple.__new__(cls, [
+            _parse_date(data.get(column)) if is_date else data.get(column)
+            for _, column, is_date in cls._fields
+        ])
+
+    @classmethod
+    def _make(cls, values):
+        return tuple.__new__(cls, values)
+
+    @classmethod
+    def row_factory(cls, columns):
+        """Функция, собирающая запись прямо из кортежа курсора с колонками columns (в порядке выборки).
+        Позиции вычисляются один раз на запрос; колонок, которых нет в выборке, в записи будет None"""
+        positions = {column: index for index, column in enumerate(columns)}
+        absent = len(columns)
+        indexes = [positions.get(column, absent) for _, column, _ in cls._fields]
+        # Отсутствующие колонки берутся из дописанного к строке None
+        pad = (None,) if absent in indexes else None
+        getter = itemgetter(*indexes)
+        dates = [index for index, (_, _, is_date) in enumerate(cls._fields) if is_date]
+        new = tuple.__new__
+
+        def make(row):
+            values = getter(row + pad) if pad else getter(row)
+            for index in dates:
+                value = values[index]
+                # psycopg2 уже отдает date; разбор нужен только строкам и datetime
+                if value is not None and type(value) is not datetime.date:
+                    values = list(values)
+                    for date_index in dates:
+                        values[date_index] = _parse_date(values[date_index])
+                    break
+            return new(cls, values)
+
+        return make
+
+    def __reduce__(self):
+        return (self._make, (tuple(self),))
+
+    def __repr__(self):
+        values = ', '.join(f'{name}={value!r}' for (name, _, _), value in zip(self._fields, self))
+        return f'{type(self).__name__}({values})'
+
+
+class ValueIndicator(_Record):
+    __slots__ = ()
+    _fields = (
+        ('id_indicator', 'Код показателя', False),
+        ('analytic_1', 'Код аналитики 1', False),
+        ('analytic_2', 'Код аналитики 2', False),
+        ('analytic_3', 'Код аналитики 3', False),
+        ('sum_value', 'Сумма', False),
+        ('date_period_start', 'Дата начала периода', True),
+        ('date_period_end', 'Дата окончания периода', True),
+        ('dzo', 'ДЗО', False),
+        # Заполняются, если запрос присоединяет таблицу "ДЗО"
+        ('dzo_name', 'Наименование ДЗО', False),
+        ('dzo_address', 'Адрес ДЗО', False),
+    )
+
+    def page_key(self):
+        """Ключ сортировки для постраничной выборки; пустые аналитики сравниваются как ''"""
+        return (
+            self.date_period_start,
+            self.date_period_end,
+            self.id_indicator,
+            self.analytic_1 or '',
+            self.analytic_2 or '',
+            self.analytic_3 or '',
+        )
     def to_dict(self):
         return {
             'Код показателя': self.id_indicator,
@@ -38,15 +97,32 @@ class ValueIndicator:
             'Дата окончания периода': self.date_period_end,
             'ДЗО': self.dzo
         }
-class Indicator:
-    def __init__(self, data: dict ):
-        self.id = data.get('Код показателя')
-        self.indicator_name = data.get('Показатель')
-        self.id_analytic_type_1 = data.get('Код вида аналитики 1')
-        self.id_analytic_type_2 = data.get('Код вида аналитики 2')
-        self.id_analytic_type_3 = data.get('Код вида аналитики 3')
-        self.date_period_start = _parse_date(data.get('Дата начала периода'))
-        self.date_period_end = _parse_date(data.get('Дата конца периода'))
+class ValuesPage:
+    """Страница значений показателей для постраничного просмотра"""
+    def __init__(self, items: list, has_next: bool, has_previous: bool):
+        self.items = items
+        self.has_next = has_next
+        self.has_previous = has_previous
+
+    @property
+    def first_key(self):
+        return self.items[0].page_key() if self.items else None
+
+    @property
+    def last_key(self):
+        return self.items[-1].page_key() if self.items else None
+class Indicator(_Record):
+    __slots__ = ()
+    _fields = (
+        ('id', 'Код показателя', False),
+        ('indicator_name', 'Показатель', False),
+        ('id_analytic_type_1', 'Код вида аналитики 1', False),
+        ('id_analytic_type_2', 'Код вида аналитики 2', False),
+        ('id_analytic_type_3', 'Код вида аналитики 3', False),
+        ('date_period_start', 'Дата начала периода', True),
+        ('date_period_end', 'Дата конца периода', True),
+    )
+
     def to_dict(self):
         return {
             'Код показателя': self.id,
@@ -57,24 +133,29 @@ class Indicator:
             'Дата начала периода': self.date_period_start,
             'Дата конца периода': self.date_period_end
         }
-class AnalyticType:
-    def __init__(self, data: dict):
-        self.id = data.get('Код вида аналитики')
-        self.analytic_type_name = data.get('Вид аналитики')
-    
+class AnalyticType(_Record):
+    __slots__ = ()
+    _fields = (
+        ('id', 'Код вида аналитики', False),
+        ('analytic_type_name', 'Вид аналитики', False),
+    )
+
     def to_dict(self):
         return {
             'Код вида аналитики': self.id,
             'Вид аналитики': self.analytic_type_name
         }
         
-class Analytic:
-    def __init__(self, data: dict):
-        self.id = data.get('Код аналитики')
-        self.id_analytic_type = data.get('Код вида аналитики')
-        self.analytic_name = data.get('Аналитика')
-        self.date_period_start = _parse_date(data.get('Дата начала периода'))
-        self.date_period_end = _parse_date(data.get('Дата конца периода'))
+class Analytic(_Record):
+    __slots__ = ()
+    _fields = (
+        ('id', 'Код аналитики', False),
+        ('id_analytic_type', 'Код вида аналитики', False),
+        ('analytic_name', 'Аналитика', False),
+        ('date_period_start', 'Дата начала периода', True),
+        ('date_period_end', 'Дата конца периода', True),
+    )
+
     def to_dict(self):
         return {
             'Код аналитики': self.id,
@@ -84,12 +165,14 @@ class Analytic:
             'Дата конца периода': self.date_period_end
         }
 
-class DZO:
-    def __init__(self, data: dict):
-        self.id = data.get('Идентификатор ДЗО')
-        self.name = data.get('Наименование')
-        self.address = data.get('Адрес')
-        
+class DZO(_Record):
+    __slots__ = ()
+    _fields = (
+        ('id', 'Идентификатор ДЗО', False),
+        ('name', 'Наименование', False),
+        ('address', 'Адрес', False),
+    )
+
     def to_dict(self):
         return {
             'Идентификатор ДЗО': self.id,
@@ -97,15 +180,31 @@ class DZO:
             'Адрес': self.address
         }
     
-class User:
-    def __init__(self, data: dict):
-        self.id = data.get('Идентификационный номер')
-        self.full_name = data.get('ФИО')
-        self.login = data.get('Логин')
-        self.password = data.get('Пароль')
-        self.role = data.get('Роль')
-        self.dzo = data.get('ДЗО')
+class DZOGroup(_Record):
+    __slots__ = ()
+    _fields = (
+        ('id', 'Идентификатор группы', False),
+        ('name', 'Наименование', False),
+        ('parent_id', 'Родительская группа', False),
+    )
+
+    def to_dict(self):
+        return {
+            'Идентификатор группы': self.id,
+            'Наименование': self.name,
+            'Родительская группа': self.parent_id
+        }
 
+class User(_Record):
+    __slots__ = ()
+    _fields = (
+        ('id', 'Идентификационный номер', False),
+        ('full_name', 'ФИО', False),
+        ('login', 'Логин', False),
+        ('password', 'Пароль', False),
+        ('role', 'Роль', False),
+        ('dzo', 'ДЗО', False),
+    )
     
     def to_dict(self):
         return {
@@ -1,61 +1,485 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
 import psycopg2
+from psycopg2 import extensions
 from psycopg2.extras import RealDictCursor
 import config
-from data_classes import Analytic, Indicator, AnalyticType, ValueIndicator, _parse_date, User, DZO
+import bulk_import
+import schema
+from connection_pool import ConnectionPool
+from query_stats import QueryStats, fingerprint
+from app_logging import get_logger
+from reference_cache import NOTIFY_CHANNEL, REFERENCE_TABLES, ReferenceCache, ReferenceView
+from values_store import ValuesStore, values_filter_clause
+from formulas import Formula, evaluation_order
+from data_classes import Analytic, Indicator, AnalyticType, ValueIndicator, ValuesPage, _parse_date, User, DZO, DZOGroup
 import pandas as pd
 
+# Параметры приложения в config.DB_CONFIG; остальные ключи передаются в psycopg2.connect
+APP_OPTIONS = (
+    'pool_min_size', 'pool_max_size', 'pool_timeout', 'pool_health_check_interval',
+    'reference_cache_listen', 'query_stats', 'slow_query_ms', 'slow_query_log_size',
+)
+
+# Ключ записи в "Значения показателей ДЗО"
+VALUES_KEY_COLUMNS = (
+    'Код показателя', 'Дата начала периода', 'Дата окончания периода',
+    'Код аналитики 1', 'Код аналитики 2', 'Код аналитики 3',
+)
+# Порядок постраничной выборки значений; совпадает с ValueIndicator.page_key()
+VALUES_PAGE_KEY = (
+    'v."Дата начала периода"', 'v."Дата окончания периода"', 'v."Код показателя"',
+    'COALESCE(v."Код аналитики 1", \'\')', 'COALESCE(v."Код аналитики 2", \'\')', 'COALESCE(v."Код аналитики 3", \'\')',
+)
+
+# Измерения агрегации значений -> выражение группировки; периоды считаются по дате начала
+VALUES_DIMENSIONS = {
+    'indicator': 'v."Код показателя"',
+    'dzo': 'v."ДЗО"',
+    'analytic_1': 'v."Код аналитики 1"',
+    'analytic_2': 'v."Код аналитики 2"',
+    'analytic_3': 'v."Код аналитики 3"',
+    'month': 'date_trunc(\'month\', v."Дата начала периода")::date',
+    'quarter': 'date_trunc(\'quarter\', v."Дата начала периода")::date',
+    'year': 'date_trunc(\'year\', v."Дата начала периода")::date',
+}
+# Меры агрегации -> агрегатная функция
+VALUES_MEASURES = {
+    'sum': 'sum(v."Сумма")',
+    'count': 'count(*)',
+    'min': 'min(v."Сумма")',
+    'max': 'max(v."Сумма")',
+}
+
+# Присоединение данных ДЗО к строкам значений из CTE source
+VALUES_WITH_DZO_SELECT = '''
+    SELECT {source}.*, d."Наименование" AS "Наименование ДЗО", d."Адрес" AS "Адрес ДЗО"
+    FROM {source}
+    LEFT JOIN public."ДЗО" d ON d."Идентификатор ДЗО" = {source}."ДЗО"
+'''
+
+_pool = None
+_pool_lock = threading.Lock()
+_reference_cache = None
+_query_stats = None
+
+log = get_logger('database')
+
+
+def _connect_kwargs() -> dict:
+    return {key: value for key, value in config.DB_CONFIG.items() if key not in APP_OPTIONS}
+
+
+def get_pool() -> ConnectionPool:
+    """Общий для процесса пул соединений, создается при первом обращении"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            options = dict(config.DB_CONFIG)
+            _pool = ConnectionPool(
+                _connect_kwargs(),
+                min_size=options.get('pool_min_size', 1),
+                max_size=options.get('pool_max_size', 20),
+                timeout=options.get('pool_timeout', 30.0),
+                health_check_interval=options.get('pool_health_check_interval', 30.0),
+            )
+        return _pool
+
+
+def get_reference_cache() -> ReferenceCache:
+    """Общий для процесса кэш справочников; при первом обращении запускается LISTEN"""
+    global _reference_cache
+    with _pool_lock:
+        if _reference_cache is None:
+            _reference_cache = ReferenceCache(Database().execute_query)
+            if config.DB_CONFIG.get('reference_cache_listen', True):
+                _reference_cache.start_listener(_connect_kwargs())
+        return _reference_cache
+
+
+def get_query_stats() -> QueryStats:
+    """Общая для процесса статистика запросов; порог медленного запроса - slow_query_ms в DB_CONFIG"""
+    global _query_stats
+    with _pool_lock:
+        if _query_stats is None:
+            options = dict(config.DB_CONFIG)
+            _query_stats = QueryStats(
+                slow_seconds=options.get('slow_query_ms', 500) / 1000,
+                slow_log_size=options.get('slow_query_log_size', 200),
+                enabled=options.get('query_stats', True),
+            )
+        return _query_stats
+
+
+def _build_rows(cursor, row_factory=None) -> list:
+    columns = [desc[0] for desc in cursor.description]
+    if row_factory is None:
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+    return list(map(row_factory(columns), cursor.fetchall()))
+
+
+def _within_spans(keys: pd.Series, spans: dict, start: pd.Series, end: pd.Series):
+    """Лежит ли период [start, end] (даты ISO) в единственном периоде действия записи по ключу.
+    False - ключа нет в spans или период не покрыт; такие строки проверяются полностью"""
+    span_start = keys.map({key: span[0] for key, span in spans.items()})
+    span_end = keys.map({key: span[1] for key, span in spans.items()})
+    known = span_start.notna() & start.notna() & end.notna()
+    within = (span_start[known] <= start[known]) & (span_end[known] >= end[known])
+    result = known.to_numpy().copy()
+    result[result] = within.to_numpy(dtype=bool)
+    return result
+
+
+def _full_scans(node: dict, ordered: bool = False) -> list:
+    """Узлы плана EXPLAIN (FORMAT JSON), читающие таблицу значений целиком. ordered - строки узла
+    уходят под LIMIT без сортировки, то есть обход индекса без условия читает только начало таблицы"""
+    kind = node['Node Type']
+    if kind == 'Limit':
+        ordered = True
+    elif kind in ('Sort', 'Incremental Sort', 'Aggregate', 'Hash'):
+        ordered = False
+    problems = []
+    if node.get('Relation Name') == schema.VALUES_TABLE:
+        index = f" using {node['Index Name']}" if 'Index Name' in node else ''
+        if kind == 'Seq Scan' or (kind in ('Index Scan', 'Index Only Scan') and 'Index Cond' not in node
+                                  and not ordered):
+            problems.append(f"{kind} on {node['Relation Name']}{index}")
+    for position, child in enumerate(node.get('Plans', ())):
+        # В соединении порядок результата задает только внешняя (первая) ветвь
+        problems += _full_scans(child, ordered and position == 0)
+    return problems
+
+
+def _has_sort(node: dict) -> bool:
+    return node['Node Type'] in ('Sort', 'Incremental Sort') or any(_has_sort(child) for child in node.get('Plans', ()))
+
+
 class DatabaseError(Exception):
     """Кастомное исключение для ошибок базы данных"""
     pass
 
+
+class CancelScope:
+    """Метка запросов одной фоновой загрузки: Database.cancel(scope) прерывает только их"""
+    __slots__ = ('cancelled',)
+
+    def __init__(self):
+        self.cancelled = False
+
 class Database:
     def __init__(self):
-        self.connection = None
+        self.pool = None
+        self._rollups_installed = None
+        # Соединения, на которых сейчас выполняются запросы execute_query -> CancelScope запроса или None;
+        # их прерывает cancel()
+        self._running = {}
+        self._running_lock = threading.Lock()
+        self._scope = threading.local()
     
     def connect(self):
         try:
-            self.connection = psycopg2.connect(**config.DB_CONFIG)
+            self.pool = get_pool()
             return True
         except Exception as e:
-            print(f"Ошибка подключения к БД: {e}")
+            log.error("Ошибка подключения к БД", error=str(e))
             return False
+
+    @contextmanager
+    def borrow_connection(self):
+        """Взять соединение из общего пула на время блока"""
+        pool = self.pool or get_pool()
+        with pool.connection() as connection:
+            yield connection
+
+    @property
+    def references(self) -> ReferenceView:
+        """Кэш справочников: виды аналитики, аналитики, показатели, ДЗО.
+        Недостающие таблицы читаются запросами этого объекта, и их прерывает его cancel()"""
+        return get_reference_cache().using(self.execute_query)
+
+    def _notify_reference_changed(self, cursor, table: str):
+        # Уведомление уходит при фиксации транзакции, вместе с самим изменением
+        if table in REFERENCE_TABLES:
+            cursor.execute('SELECT pg_notify(%s, %s)', (NOTIFY_CHANNEL, table))
+
+    def _invalidate_reference(self, table: str):
+        if table in REFERENCE_TABLES and _reference_cache is not None:
+            _reference_cache.invalidate(table)
+
+    @contextmanager
+    def scoped(self, scope: CancelScope):
+        """Пометить scope запросы execute_query, которые этот поток выполнит внутри блока"""
+        previous = getattr(self._scope, 'current', None)
+        self._scope.current = scope
+        try:
+            yield scope
+        finally:
+            self._scope.current = previous
+
+    def cancel(self, scope: CancelScope = None):
+        """Прервать на сервере запросы чтения, которые сейчас выполняет этот объект: все или только помеченные scope.
+        Прерванный execute_query завершается DatabaseError; следующие запросы отмененного scope не выполняются"""
+        # Отмена отправляется под блокировкой: execute_query убирает соединение из _running под ней же
+        # до возврата в пул, поэтому отмена не попадет в чужой запрос на том же соединении
+        with self._running_lock:
+            if scope is not None:
+                scope.cancelled = True
+            for connection, running_scope in self._running.items():
+                if scope is not None and running_scope is not scope:
+                    continue
+                try:
+                    connection.cancel()
+                except Exception:
+                    pass
+
+    def pool_stats(self) -> dict:
+        """Метрики пула соединений: занятые, ожидающие, время ожидания"""
+        return (self.pool or get_pool()).stats()
+
+    def query_stats(self) -> dict:
+        """Статистика запросов процесса по отпечаткам и журнал медленных запросов (QueryStats.snapshot)"""
+        return get_query_stats().snapshot()
         
-    def execute_query(self, query: str, params: tuple = None):
-        """Универсальный метод выполнения SELECT запросов"""
+    def execute_query(self, query: str, params: tuple = None, row_factory=None):
+        """Универсальный метод выполнения SELECT запросов.
+        По умолчанию строки - словари {колонка: значение}; row_factory(columns) возвращает функцию,
+        которая строит запись прямо из кортежа курсора (например, ValueIndicator.row_factory)"""
+        scope = getattr(self._scope, 'current', None)
         try:
-            with self.connection.cursor() as cursor:
-                cursor.execute(query, params or ())
-                if cursor.description:
-                    columns = [desc[0] for desc in cursor.description]
-                    return [dict(zip(columns, row)) for row in cursor.fetchall()]
-                return []
+            # Открытая транзакция чтения откатывается пулом при возврате соединения
+            with get_query_stats().measure('query', query) as measurement, self.borrow_connection() as connection:
+                with self._running_lock:
+                    if scope is not None and scope.cancelled:
+                        raise DatabaseError("Загрузка отменена")
+                    self._running[connection] = scope
+                try:
+                    with connection.cursor() as cursor:
+                        cursor.execute(query, params or ())
+                        rows = _build_rows(cursor, row_factory) if cursor.description else []
+                        measurement.rows = len(rows)
+                        if log.isEnabledFor(logging.DEBUG):
+                            log.debug("Запрос", query=fingerprint(query), rows=len(rows))
+                        return rows
+                finally:
+                    # До возврата соединения в пул: после этого cancel() его уже не прервет
+                    with self._running_lock:
+                        self._running.pop(connection, None)
         except Exception as e:
             raise DatabaseError(f"Ошибка выполнения запроса: {e}\nЗапрос: {query}")
     
-    def execute_command(self, query: str, params: tuple = None) -> bool:
-        """Универсальный метод выполнения INSERT/UPDATE/DELETE"""
+    def execute_command(self, query: str, params: tuple = None, changes: str = None) -> bool:
+        """Универсальный метод выполнения INSERT/UPDATE/DELETE.
+        changes - справочник, который меняет команда: его кэш сбрасывается во всех процессах"""
         try:
-            with self.connection.cursor() as cursor:
-                cursor.execute(query, params or ())
-                self.connection.commit()
+            with get_query_stats().measure('command', query) as measurement, self.borrow_connection() as connection:
+                try:
+                    with connection.cursor() as cursor:
+                        cursor.execute(query, params or ())
+                        measurement.rows = max(cursor.rowcount, 0)
+                        if log.isEnabledFor(logging.DEBUG):
+                            log.debug("Команда", query=fingerprint(query), rows=cursor.rowcount)
+                        self._notify_reference_changed(cursor, changes)
+                    connection.commit()
+                except Exception:
+                    connection.rollback()
+                    raise
+            self._invalidate_reference(changes)
             return True
         except Exception as e:
-            self.connection.rollback()
+            raise DatabaseError(f"Ошибка выполнения команды: {e}\nКоманда: {query}")
+
+    def execute_returning(self, query: str, params: tuple = None, changes: str = None, row_factory=None):
+        """Выполнить INSERT/UPDATE/DELETE ... RETURNING и вернуть строки как execute_query"""
+        try:
+            with get_query_stats().measure('returning', query) as measurement, self.borrow_connection() as connection:
+                try:
+                    with connection.cursor() as cursor:
+                        cursor.execute(query, params or ())
+                        rows = _build_rows(cursor, row_factory)
+                        measurement.rows = len(rows)
+                        self._notify_reference_changed(cursor, changes)
+                    connection.commit()
+                except Exception:
+                    connection.rollback()
+                    raise
+            self._invalidate_reference(changes)
+            return rows
+        except Exception as e:
             raise DatabaseError(f"Ошибка выполнения команды: {e}\nКоманда: {query}")
       
-    def load_from_csv(self, filepath, table_name):
-        """Загрузить данные из CSV файла"""
+    def copy_to(self, query: str, params: tuple, target):
+        """Выгрузить результат SELECT в файловый объект target (CSV с заголовком) через COPY TO STDOUT"""
+        try:
+            with self.borrow_connection() as connection:
+                with connection.cursor() as cursor:
+                    statement = cursor.mogrify(query, params or ()).decode(extensions.encodings[connection.encoding])
+                    cursor.copy_expert(f'COPY ({statement}) TO STDOUT WITH (FORMAT csv, HEADER)', target)
+        except Exception as e:
+            raise DatabaseError(f"Ошибка выгрузки данных: {e}\nЗапрос: {query}")
+
+    def load_values_store(self, filters: dict = None):
+        """Колоночный снимок значений показателей (ValuesStore) для аналитики"""
+        return ValuesStore.from_database(self, filters)
+
+    def load_from_csv(self, filepath, table_name, chunk_size: int = 50000, sep: str = ','):
+        """Загрузить данные из CSV файла через COPY, читая файл порциями"""
+        try:
+            return self.copy_chunks(table_name, bulk_import.read_csv_chunks(filepath, chunk_size, sep))
+        except DatabaseError:
+            raise
+        except Exception as e:
+            raise DatabaseError(f"Ошибка загрузки CSV: {e}")
+
+    def copy_chunks(self, table_name: str, chunks) -> dict:
+        """Загрузить порции (DataFrame) в таблицу через COPY FROM STDIN одной транзакцией"""
+        started = time.perf_counter()
+        try:
+            with self.borrow_connection() as connection:
+                try:
+                    with connection.cursor() as cursor:
+                        date_formats = {}
+                        rows, _ = self._copy_frames(cursor, table_name, f'public."{table_name}"', chunks, date_formats)
+                        self._notify_reference_changed(cursor, table_name)
+                    connection.commit()
+                except Exception:
+                    connection.rollback()
+                    raise
+            self._invalidate_reference(table_name)
+        except Exception as e:
+            raise DatabaseError(f"Ошибка загрузки в таблицу '{table_name}': {e}")
+        elapsed = time.perf_counter() - started
+        return {
+            'table': table_name,
+            'rows': rows,
+            'seconds': elapsed,
+            'rows_per_second': rows / elapsed if elapsed > 0 else float(rows),
+            'date_formats': date_formats,
+        }
+
+    def _copy_frames(self, cursor, table_name: str, target: str, chunks, date_formats: dict = None):
+        """COPY порций в target с колонками таблицы table_name; возвращает (число строк, колонки).
+        В date_formats накапливается число дат по форматам"""
+        rows = 0
+        mapping = None
+        for chunk in chunks:
+            if mapping is None:
+                mapping = bulk_import.resolve_columns(table_name, chunk.columns)
+                statement = bulk_import.copy_statement(target, mapping.values())
+            frame = bulk_import.prepare_chunk(chunk, mapping, date_formats)
+            if table_name == schema.VALUES_TABLE:
+                self._check_values_frame(frame)
+            cursor.copy_expert(statement, bulk_import.to_copy_buffer(frame))
+            rows += len(frame)
+        return rows, list(mapping.values()) if mapping else []
+
+    def load_from_excel(self, filepath, table_name: str = None, sheet_name: str = None,
+                        chunk_size: int = 50000, merge: bool = False) -> dict:
+        """Загрузить данные из xlsx, читая листы построчно.
+        Без table_name загружаются все листы, названные как таблицы; merge=True сливает значения показателей"""
+        try:
+            if table_name:
+                sheets = [(sheet_name, table_name)]
+            else:
+                sheets = bulk_import.workbook_tables(filepath)
+                if not sheets:
+                    raise DatabaseError("В книге нет листов с названиями таблиц")
+            results = {}
+            for sheet, table in sheets:
+                chunks = bulk_import.read_excel_chunks(filepath, sheet, chunk_size)
+                if merge and table == schema.VALUES_TABLE:
+                    results[sheet or table] = self.merge_values_chunks(chunks)
+                else:
+                    results[sheet or table] = self.copy_chunks(table, chunks)
+            return results
+        except DatabaseError:
+            raise
+        except Exception as e:
+            raise DatabaseError(f"Ошибка загрузки Excel: {e}")
+
+    def merge_values_from_csv(self, filepath, chunk_size: int = 50000, sep: str = ','):
+        """Загрузить значения показателей из CSV с обновлением существующих записей"""
+        try:
+            return self.merge_values_chunks(bulk_import.read_csv_chunks(filepath, chunk_size, sep))
+        except DatabaseError:
+            raise
+        except Exception as e:
+            raise DatabaseError(f"Ошибка загрузки CSV: {e}")
+
+    def _require_values_key_index(self, cursor):
+        # ON CONFLICT по ключу значения работает только с уникальным индексом ключа; его создает migrate()
+        cursor.execute('SELECT to_regclass(%s) IS NOT NULL', (f'public."{schema.VALUES_KEY_INDEX}"',))
+        if not cursor.fetchone()[0]:
+            raise DatabaseError(f'Нет уникального индекса "{schema.VALUES_KEY_INDEX}": '
+                                f'обновите схему БД (Database.migrate())')
+
+    def merge_values_chunks(self, chunks) -> dict:
+        """Слить порции значений показателей с таблицей: COPY во временную таблицу
+        и один INSERT ... ON CONFLICT DO UPDATE по ключу значения (NULL в аналитиках считаются равными)"""
+        started = time.perf_counter()
+        key = ', '.join(f'"{column}"' for column in VALUES_KEY_COLUMNS)
         try:
-            df = pd.read_csv(filepath)
-            return self._insert_dataframe(df, table_name)
+            with self.borrow_connection() as connection:
+                try:
+                    with connection.cursor() as cursor:
+                        self._require_values_key_index(cursor)
+                        cursor.execute(
+                            'CREATE TEMP TABLE "Загрузка значений" '
+                            f'(LIKE public."{schema.VALUES_TABLE}", "Номер строки" bigserial) ON COMMIT DROP'
+                        )
+                        date_formats = {}
+                        rows, columns = self._copy_frames(
+                            cursor, schema.VALUES_TABLE, 'pg_temp."Загрузка значений"', chunks, date_formats
+                        )
+                        result = {'rows': rows, 'inserted': 0, 'updated': 0, 'unchanged': 0, 'date_formats': date_formats}
+                        if rows:
+                            column_list = ', '.join(f'"{column}"' for column in columns)
+                            changed = [column for column in columns if column not in VALUES_KEY_COLUMNS]
+                            if changed:
+                                set_clause = ', '.join(f'"{column}" = EXCLUDED."{column}"' for column in changed)
+                                where_clause = ' OR '.join(
+                                    f'target."{column}" IS DISTINCT FROM EXCLUDED."{column}"' for column in changed
+                                )
+                                conflict_action = f'DO UPDATE SET {set_clause} WHERE {where_clause}'
+                            else:
+                                conflict_action = 'DO NOTHING'
+                            # Из дублей ключа внутри файла берется последняя строка
+                            cursor.execute(f'''
+                                WITH source AS (
+                                    SELECT DISTINCT ON ({key}) {column_list}
+                                    FROM pg_temp."Загрузка значений"
+                                    ORDER BY {key}, "Номер строки" DESC
+                                ), merged AS (
+                                    INSERT INTO public."{schema.VALUES_TABLE}" AS target ({column_list})
+                                    SELECT {column_list} FROM source
+                                    ON CONFLICT ({key}) {conflict_action}
+                                    RETURNING (xmax = 0) AS inserted
+                                )
+                                SELECT (SELECT count(*) FROM source),
+                                       count(*) FILTER (WHERE inserted),
+                                       count(*) FILTER (WHERE NOT inserted)
+                                FROM merged
+                            ''')
+                            distinct_rows, inserted, updated = cursor.fetchone()
+                            result.update(
+                                inserted=inserted,
+                                updated=updated,
+                                unchanged=distinct_rows - inserted - updated,
+                            )
+                    connection.commit()
+                except Exception:
+                    connection.rollback()
+                    raise
         except Exception as e:
-            print(f"Ошибка загрузки CSV: {e}")
-            raise e
+            raise DatabaseError(f"Ошибка слияния значений показателей: {e}")
+        result['seconds'] = time.perf_counter() - started
+        return result
     
      # ========== CRUD ДЛЯ Analytic ==========
         
-    def create_analytic(self, analytic: Analytic):
-        """Создать новую аналитику"""
+    def create_analytic(self, analytic: Analytic) -> Analytic:
+        """Создать новую аналитику; возвращает сохраненную запись (с датами периода и значениями по умолчанию)"""
         try:
             existing = self.get_analytic_by_id(analytic.id_analytic_type, analytic.id)
             if existing:
@@ -65,10 +489,13 @@ class Database:
             if not parent_type:
                 raise DatabaseError(f"Родительский тип аналитики '{analytic.id_analytic_type}' не найден")
             
-            return self.execute_command(
-                'INSERT INTO public."Аналитики" ("Код вида аналитики", "Код аналитики", "Аналитика") VALUES (%s, %s, %s)',
-                (analytic.id_analytic_type, analytic.id, analytic.analytic_name)
+            result = self.execute_returning(
+                'INSERT INTO public."Аналитики" ("Код вида аналитики", "Код аналитики", "Аналитика") VALUES (%s, %s, %s) RETURNING *',
+                (analytic.id_analytic_type, analytic.id, analytic.analytic_name),
+                changes='Аналитики',
+                row_factory=Analytic.row_factory
             )
+            return result[0]
         except DatabaseError:
             raise
         except Exception as e:
@@ -77,36 +504,36 @@ class Database:
     def get_analytic_by_id(self, analytic_type_id: str, analytic_id: str):
         """Получить аналитику по ID"""
         try:
-            result = self.execute_query(
-                'SELECT * FROM public."Аналитики" WHERE "Код вида аналитики" = %s AND "Код аналитики" = %s',
-                (analytic_type_id, analytic_id)
-            )
-            return Analytic(result[0]) if result else None
+            return self.references.get('Аналитики', (analytic_type_id, analytic_id))
         except Exception as e:
             raise DatabaseError(f"Ошибка получения аналитики по ID: {e}")
     
     def get_all_analytics(self):
         """Получить все аналитики"""
-        query = """
-        SELECT * FROM public."Аналитики"
-        ORDER BY "Код вида аналитики" ASC, "Код аналитики" ASC
-        """
         try:
-            result = self.execute_query(query)
-            return [Analytic(row) for row in result]
+            return self.references.rows('Аналитики')
         except Exception as e:
             raise DatabaseError(f"Ошибка получения всех аналитик: {e}")
     
     def get_analytics_by_type(self, analytic_type_id: str):
         """Получить аналитики по виду аналитики"""
         try:
-            result = self.execute_query(
-                'SELECT * FROM public."Аналитики" WHERE "Код вида аналитики" = %s',
-                (analytic_type_id,)
-            )
-            return [Analytic(row) for row in result]
+            return [
+                analytic for analytic in self.references.rows('Аналитики')
+                if analytic.id_analytic_type == analytic_type_id
+            ]
         except Exception as e:
             raise DatabaseError(f"Ошибка получения аналитик по типу: {e}")
+
+    def get_analytics_valid_on(self, date, analytic_type_id: str = None):
+        """Аналитики, действовавшие на дату (при analytic_type_id - только этого вида)"""
+        try:
+            analytics = self.references.validity('Аналитики').valid_on(date)
+            if analytic_type_id is not None:
+                analytics = [analytic for analytic in analytics if analytic.id_analytic_type == analytic_type_id]
+            return analytics
+        except Exception as e:
+            raise DatabaseError(f"Ошибка получения действующих аналитик: {e}")
     
     def update_analytic(self, analytic_type_id: str, analytic_id: str, new_name: str) -> bool:
         """Обновить аналитику"""
@@ -118,10 +545,11 @@ class Database:
             parent_type = self.get_analytic_type_by_id(analytic_type_id)
             if not parent_type:
                 raise DatabaseError(f"Родительский тип аналитики '{analytic_type_id}' не найден")
-            print(parent_type)
+            log.debug("Обновление аналитики", analytic_type=analytic_type_id, analytic=analytic_id)
             return self.execute_command(
                 'UPDATE public."Аналитики" SET "Аналитика" = %s WHERE "Код вида аналитики" = %s AND "Код аналитики" = %s',
-             (new_name, analytic_type_id, analytic_id)
+             (new_name, analytic_type_id, analytic_id),
+                changes='Аналитики'
             )
         except DatabaseError:
             raise
@@ -137,7 +565,8 @@ class Database:
             
             return self.execute_command(
                 'DELETE FROM public."Аналитики" WHERE "Код вида аналитики" = %s AND "Код аналитики" = %s',
-                (analytic_type_id, analytic_id)
+                (analytic_type_id, analytic_id),
+                changes='Аналитики'
             )
         except DatabaseError:
             raise
@@ -148,8 +577,8 @@ class Database:
     
     # ========== CRUD ДЛЯ Indicator ==========
     
-    def create_indicator(self, indicator: Indicator) -> bool:
-        """Создать новый показатель"""
+    def create_indicator(self, indicator: Indicator) -> Indicator:
+        """Создать новый показатель; возвращает сохраненную запись (с датами периода и значениями по умолчанию)"""
         try:
             existing = self.get_indicator_by_id(indicator.id)
             if existing:
@@ -170,10 +599,13 @@ class Database:
                 if not parent3:
                     raise DatabaseError(f"Тип аналитики 3 '{indicator.id_analytic_type_3}' не найден")
             
-            return self.execute_command(
-                'INSERT INTO public."Показатели" ("Код показателя", "Показатель", "Код вида аналитики 1", "Код вида аналитики 2", "Код вида аналитики 3") VALUES (%s, %s, %s, %s, %s)',
-                (indicator.id, indicator.indicator_name, indicator.id_analytic_type_1, indicator.id_analytic_type_2, indicator.id_analytic_type_3)
+            result = self.execute_returning(
+                'INSERT INTO public."Показатели" ("Код показателя", "Показатель", "Код вида аналитики 1", "Код вида аналитики 2", "Код вида аналитики 3") VALUES (%s, %s, %s, %s, %s) RETURNING *',
+                (indicator.id, indicator.indicator_name, indicator.id_analytic_type_1, indicator.id_analytic_type_2, indicator.id_analytic_type_3),
+                changes='Показатели',
+                row_factory=Indicator.row_factory
             )
+            return result[0]
         except DatabaseError:
             raise
         except Exception as e:
@@ -182,23 +614,87 @@ class Database:
     def get_indicator_by_id(self, indicator_id: str):
         """Получить показатель по ID"""
         try:
-            result = self.execute_query(
-                'SELECT * FROM public."Показатели" WHERE "Код показателя" = %s',
-                (indicator_id,)
-            )
-            return Indicator(result[0]) if result else None
+            return self.references.get('Показатели', indicator_id)
         except Exception as e:
             raise DatabaseError(f"Ошибка получения показателя по ID: {e}")
     
     def get_all_indicators(self):
         """Получить все показатели"""
         try:
-            result = self.execute_query(
-                """SELECT * FROM public."Показатели" ORDER BY "Код показателя" ASC """
-            )
-            return [Indicator(row) for row in result]
+            return self.references.rows('Показатели')
         except Exception as e:
             raise DatabaseError(f"Ошибка получения всех показателей: {e}")
+
+    def get_indicators_valid_on(self, date):
+        """Показатели, действовавшие на дату"""
+        try:
+            return self.references.validity('Показатели').valid_on(date)
+        except Exception as e:
+            raise DatabaseError(f"Ошибка получения действующих показателей: {e}")
+
+    def check_value_validity(self, indicator_id: str, date_start, date_end,
+                             analytic_1: str = None, analytic_2: str = None, analytic_3: str = None) -> list:
+        """Проверить по кэшу справочников, что показатель и аналитики значения действуют весь его период.
+        Аналитика проверяется, если у показателя задан вид аналитики на ее месте. Возвращает список ошибок"""
+        indicators = self.references.validity('Показатели')
+        indicator = indicators.records.get(indicator_id)
+        if indicator is None:
+            return [f"Показатель '{indicator_id}' не найден"]
+        errors = []
+        if not indicators.covers(indicator_id, date_start, date_end):
+            errors.append(f"Показатель '{indicator_id}' не действует в периоде {date_start} - {date_end}")
+        analytics = self.references.validity('Аналитики')
+        analytic_types = (indicator.id_analytic_type_1, indicator.id_analytic_type_2, indicator.id_analytic_type_3)
+        for number, (analytic_type, analytic_id) in enumerate(zip(analytic_types, (analytic_1, analytic_2, analytic_3)), 1):
+            if not analytic_type or analytic_id is None or analytic_id == '':
+                continue
+            key = (analytic_type, analytic_id)
+            if not analytics.exists(key):
+                errors.append(f"Аналитика {number} '{analytic_id}' вида '{analytic_type}' не найдена")
+            elif not analytics.covers(key, date_start, date_end):
+                errors.append(f"Аналитика {number} '{analytic_id}' не действует в периоде {date_start} - {date_end}")
+        return errors
+
+    def _check_values_validity(self, value: ValueIndicator):
+        errors = self.check_value_validity(
+            value.id_indicator, value.date_period_start, value.date_period_end,
+            value.analytic_1, value.analytic_2, value.analytic_3,
+        )
+        if errors:
+            raise DatabaseError('; '.join(errors))
+
+    def _check_values_frame(self, frame: pd.DataFrame):
+        """Проверить периоды действия для порции импорта значений по кэшу справочников.
+        Записи с одним периодом действия проверяются для всей порции сравнением дат ISO;
+        остальные строки (несколько периодов, нет записи или даты) - по одной через check_value_validity"""
+        columns = ['Код показателя', 'Дата начала периода', 'Дата окончания периода',
+                   'Код аналитики 1', 'Код аналитики 2', 'Код аналитики 3']
+        rows = pd.DataFrame({column: frame[column] if column in frame.columns else None for column in columns},
+                            index=frame.index)
+        start = rows['Дата начала периода']
+        end = rows['Дата окончания периода'].fillna(start)
+        indicators = self.references.validity('Показатели')
+        analytic_spans = {f'{analytic_type}\x1f{analytic_id}': span
+                          for (analytic_type, analytic_id), span in self.references.validity('Аналитики').spans().items()}
+
+        suspect = start.isna().to_numpy() | ~_within_spans(rows['Код показателя'], indicators.spans(), start, end)
+        for number in (1, 2, 3):
+            analytic = rows[f'Код аналитики {number}']
+            analytic_types = rows['Код показателя'].map(
+                {key: getattr(record, f'id_analytic_type_{number}') for key, record in indicators.records.items()})
+            checked = analytic_types.notna() & (analytic_types != '') & analytic.notna() & (analytic != '')
+            if checked.any():
+                keys = analytic_types[checked] + '\x1f' + analytic[checked].astype(str)
+                suspect[checked.to_numpy()] |= ~_within_spans(keys, analytic_spans, start[checked], end[checked])
+
+        invalid = []
+        for row in rows[suspect].drop_duplicates().itertuples(index=False, name=None):
+            errors = self.check_value_validity(*row)
+            if errors:
+                invalid.append(errors[0])
+        if invalid:
+            examples = '; '.join(invalid[:5])
+            raise DatabaseError(f"Значения вне периода действия справочников ({len(invalid)} сочетаний): {examples}")
     
     def update_indicator(self, indicator_id: str, indicator_name: str, id_analytic_type_1: str, id_analytic_type_2: str, id_analytic_type_3: str):
         """Обновить показатель"""
@@ -226,7 +722,8 @@ class Database:
             """
             return self.execute_command(
                 query,
-                (indicator_id, indicator_name, id_analytic_type_1, id_analytic_type_2, id_analytic_type_3, indicator_id)
+                (indicator_id, indicator_name, id_analytic_type_1, id_analytic_type_2, id_analytic_type_3, indicator_id),
+                changes='Показатели'
             )
         except DatabaseError:
             raise
@@ -243,7 +740,8 @@ class Database:
             
             return self.execute_command(
                 'DELETE FROM public."Показатели" WHERE "Код показателя" = %s',
-                (indicator_id,)
+                (indicator_id,),
+                changes='Показатели'
             )
         except DatabaseError:
             raise
@@ -253,17 +751,20 @@ class Database:
 
 
     # ========== CRUD ДЛЯ AnalyticType ==========
-    def create_analytic_type(self, analytic_type: AnalyticType) -> bool:
-        """Создать новый вид аналитики"""
+    def create_analytic_type(self, analytic_type: AnalyticType) -> AnalyticType:
+        """Создать новый вид аналитики; возвращает сохраненную запись"""
         try:
             existing = self.get_analytic_type_by_id(analytic_type.id)
             if existing:
                 raise DatabaseError(f"Вид аналитики с ID '{analytic_type.id}' уже существует")
             
-            return self.execute_command(
-                'INSERT INTO public."Виды аналитики" ("Код вида аналитики", "Вид аналитики") VALUES (%s, %s)',
-                (analytic_type.id, analytic_type.analytic_type_name)
+            result = self.execute_returning(
+                'INSERT INTO public."Виды аналитики" ("Код вида аналитики", "Вид аналитики") VALUES (%s, %s) RETURNING *',
+                (analytic_type.id, analytic_type.analytic_type_name),
+                changes='Виды аналитики',
+                row_factory=AnalyticType.row_factory
             )
+            return result[0]
         except DatabaseError:
             raise 
         except Exception as e:
@@ -272,23 +773,14 @@ class Database:
     def get_all_analytic_types(self):
         """Получить все виды аналитик"""
         try:
-            result = self.execute_query(
-                """
-                SELECT * FROM public."Виды аналитики" ORDER BY "Код вида аналитики" ASC"""
-            )
-            return [AnalyticType(row) for row in result]
+            return self.references.rows('Виды аналитики')
         except Exception as e:
             raise DatabaseError(f"Ошибка получения всех видов аналитик: {e}")
     
     def get_analytic_type_by_id(self, analytic_type_id: str):
         """Получить вид аналитики по ID"""
         try:
-            result = self.execute_query(
-                'SELECT * FROM public."Виды аналитики" WHERE "Код вида аналитики" = %s',
-                (analytic_type_id,)
-            )
-            print(result)
-            return AnalyticType(result[0]) if result else None
+            return self.references.get('Виды аналитики', analytic_type_id)
         except Exception as e:
             raise DatabaseError(f"Ошибка получения вида аналитики по ID: {e}")
             
@@ -301,7 +793,8 @@ class Database:
             
             return self.execute_command(
                 'UPDATE public."Виды аналитики" SET "Вид аналитики" = %s WHERE "Код вида аналитики" = %s',
-                (new_name, analytic_type_id)
+                (new_name, analytic_type_id),
+                changes='Виды аналитики'
             )
         except DatabaseError:
             raise
@@ -325,7 +818,8 @@ class Database:
             
             return self.execute_command(
                 'DELETE FROM public."Виды аналитики" WHERE "Код вида аналитики" = %s',
-                (analytic_type_id,)
+                (analytic_type_id,),
+                changes='Виды аналитики'
             )
         except DatabaseError:
             raise
@@ -334,17 +828,27 @@ class Database:
         
 
     # ========== CRUD ДЛЯ ValuesIndicator ==========
-    def create_values_indicator(self, dzo: ValueIndicator) -> bool:
-        """Создать новое значение показателя"""
+    def create_values_indicator(self, dzo: ValueIndicator) -> ValueIndicator:
+        """Создать новое значение показателя; возвращает сохраненную запись с данными ДЗО"""
         try:
             existing = self.get_values_indicator_by_id(dzo.id_indicator, dzo.date_period_start, dzo.date_period_end, dzo.analytic_1, dzo.analytic_2, dzo.analytic_3)
             if existing:
                 raise DatabaseError(f"Значение показателя с указанными параметрами уже существует")
             
-            return self.execute_command(
-                'INSERT INTO public."Значения показателей ДЗО" ("Дата начала периода", "Дата окончания периода", "Код показателя", "Код аналитики 1", "Код аналитики 2", "Код аналитики 3", "Сумма", "ДЗО") VALUES (%s, %s, %s, %s, %s, %s, %s, %s)',
-                (dzo.date_period_start, dzo.date_period_end, dzo.id_indicator, dzo.analytic_1, dzo.analytic_2, dzo.analytic_3, dzo.sum_value, dzo.dzo)
+            self._check_values_validity(dzo)
+
+            result = self.execute_returning(
+                f'''
+                WITH inserted AS (
+                    INSERT INTO public."{schema.VALUES_TABLE}" ("Дата начала периода", "Дата окончания периода", "Код показателя", "Код аналитики 1", "Код аналитики 2", "Код аналитики 3", "Сумма", "ДЗО") VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+                    RETURNING *
+                )
+                {VALUES_WITH_DZO_SELECT.format(source='inserted')}
+                ''',
+                (dzo.date_period_start, dzo.date_period_end, dzo.id_indicator, dzo.analytic_1, dzo.analytic_2, dzo.analytic_3, dzo.sum_value, dzo.dzo),
+                row_factory=ValueIndicator.row_factory
             )
+            return result[0]
         except DatabaseError:
             raise 
         except Exception as e:
@@ -353,43 +857,197 @@ class Database:
     def get_values_indicator_by_id(self, indicator_id: str, date_start: str, date_end: str, analytic_1: str, analytic_2: str, analytic_3: str):
         """Получить значение показателя по ID"""
         try:
-            query = 'SELECT * FROM public."Значения показателей ДЗО" WHERE "Код показателя" = %s AND "Дата начала периода" = %s AND "Дата окончания периода" = %s'
-            params = [indicator_id, _parse_date(date_start), _parse_date(date_end)]
-
-            query += ' AND "Код аналитики 1" = %s'
-            params.append(analytic_1)
-
-            if analytic_2 is None or analytic_2 == '':
-                query += ' AND "Код аналитики 2" IS NULL'
-            else:
-                query += ' AND "Код аналитики 2" = %s'
-                params.append(analytic_2)
-
-            if analytic_3 is None or analytic_3 == '':
-                query += ' AND "Код аналитики 3" IS NULL'
-            else:
-                query += ' AND "Код аналитики 3" = %s'
-                params.append(analytic_3)
-
-            result = self.execute_query(query, tuple(params))
-            return ValueIndicator(result[0]) if result else None
+            condition, params = self._values_key_clause(
+                indicator_id, _parse_date(date_start), _parse_date(date_end), analytic_1, analytic_2, analytic_3)
+            query = f'SELECT * FROM public."{schema.VALUES_TABLE}" WHERE {condition}'
+            result = self.execute_query(query, params, row_factory=ValueIndicator.row_factory)
+            return result[0] if result else None
         except Exception as e:
             raise DatabaseError(f"Ошибка получения значения показателя по ID: {e}")
    
     def get_values_indicators(self):
-        """Получить все значения показателей"""
+        """Получить все значения показателей вместе с наименованием и адресом ДЗО"""
         try:
             result = self.execute_query(
-                """SELECT * FROM public."Значения показателей ДЗО" ORDER BY "Дата начала периода" ASC, "Дата окончания периода" ASC, "Код показателя" ASC"""
+                f"""
+                SELECT v.*, d."Наименование" AS "Наименование ДЗО", d."Адрес" AS "Адрес ДЗО"
+                FROM public."{schema.VALUES_TABLE}" v
+                LEFT JOIN public."ДЗО" d ON d."Идентификатор ДЗО" = v."ДЗО"
+                ORDER BY v."Дата начала периода" ASC, v."Дата окончания периода" ASC, v."Код показателя" ASC""",
+                row_factory=ValueIndicator.row_factory
             )
-            return [ValueIndicator(row) for row in result]
+            return result
         except Exception as e:
             raise DatabaseError(f"Ошибка получения всех значений показателей: {e}")
+
+    def get_values_indicators_page(self, page_size: int = 100, after: tuple = None, before: tuple = None,
+                                   filters: dict = None) -> ValuesPage:
+        """Получить страницу значений показателей по ключу сортировки (keyset).
+        after/before - ключ ValueIndicator.page_key() последней/первой записи соседней страницы"""
+        try:
+            query, params, descending = self._values_page_query(page_size, after, before, filters)
+            items = self.execute_query(query, params, row_factory=ValueIndicator.row_factory)
+            has_more = len(items) > page_size
+            items = items[:page_size]
+            if descending:
+                items.reverse()
+                return ValuesPage(items, has_next=True, has_previous=has_more)
+            return ValuesPage(items, has_next=has_more, has_previous=after is not None)
+        except Exception as e:
+            raise DatabaseError(f"Ошибка получения страницы значений показателей: {e}")
+
+    def _values_page_query(self, page_size: int, after: tuple = None, before: tuple = None, filters: dict = None):
+        """Запрос страницы значений, его параметры и направление (True - страница назад)"""
+        where, params = values_filter_clause(filters)
+        descending = before is not None and after is None
+        cursor_key = before if descending else after
+        if cursor_key is not None:
+            placeholders = ', '.join(['%s'] * len(VALUES_PAGE_KEY))
+            where.append(f"({', '.join(VALUES_PAGE_KEY)}) {'<' if descending else '>'} ({placeholders})")
+            params.extend(cursor_key)
+        direction = 'DESC' if descending else 'ASC'
+        query = f"""
+            SELECT v.*, d."Наименование" AS "Наименование ДЗО", d."Адрес" AS "Адрес ДЗО"
+            FROM public."{schema.VALUES_TABLE}" v
+            LEFT JOIN public."ДЗО" d ON d."Идентификатор ДЗО" = v."ДЗО"
+            {'WHERE ' + ' AND '.join(where) if where else ''}
+            ORDER BY {', '.join(f'{column} {direction}' for column in VALUES_PAGE_KEY)}
+            LIMIT %s
+        """
+        params.append(page_size + 1)
+        return query, tuple(params), descending
+
+    def _values_key_clause(self, indicator_id, date_start, date_end, analytic_1, analytic_2, analytic_3):
+        """Условие WHERE по ключу значения и его параметры. Пустые аналитики 2/3 ищутся через IS NULL;
+        оба варианта условия выполняются по уникальному индексу ключа (schema.VALUES_KEY_INDEX_DDL)"""
+        condition = ('"Код показателя" = %s AND "Дата начала периода" = %s AND "Дата окончания периода" = %s'
+                     ' AND "Код аналитики 1" = %s')
+        params = [indicator_id, date_start, date_end, analytic_1]
+        for number, analytic in ((2, analytic_2), (3, analytic_3)):
+            if analytic is None or analytic == '':
+                condition += f' AND "Код аналитики {number}" IS NULL'
+            else:
+                condition += f' AND "Код аналитики {number}" = %s'
+                params.append(analytic)
+        return condition, tuple(params)
+
+    def aggregate_values(self, group_by=(), measures=('sum',), filters: dict = None, grouping_sets=None,
+                         use_rollups: bool = True) -> list:
+        """Итоги значений показателей одним запросом GROUP BY на сервере.
+        group_by - измерения VALUES_DIMENSIONS (indicator, dzo, analytic_1..3, month, quarter, year),
+        measures - меры VALUES_MEASURES (sum, count, min, max), filters - как у постраничной выборки.
+        grouping_sets - список наборов измерений для GROUPING SETS (например [('indicator', 'dzo'), ('indicator',), ()]);
+        тогда в строках есть 'grouping' - битовая маска измерений, свернутых в итог (как GROUPING() в PostgreSQL).
+        Запросы без аналитик читаются из итогов по периодам (install_rollups), если они установлены и очередь
+        пересчета пуста; иначе - из таблицы значений. Чтение итоги не пересчитывает: это делает refresh_rollups.
+        Возвращает список словарей {измерение: значение, мера: значение}"""
+        try:
+            if grouping_sets is not None:
+                grouping_sets = [tuple(grouping_set) for grouping_set in grouping_sets]
+                dimensions = list(dict.fromkeys(
+                    dimension for grouping_set in grouping_sets for dimension in grouping_set
+                ))
+            else:
+                dimensions = list(group_by)
+            unknown = [name for name in dimensions if name not in VALUES_DIMENSIONS]
+            unknown += [name for name in measures if name not in VALUES_MEASURES]
+            if unknown:
+                raise DatabaseError(f"Неизвестные измерения или меры агрегации: {', '.join(unknown)}")
+            if not measures:
+                raise DatabaseError("Не указаны меры агрегации")
+
+            source, measure_sql = f'public."{schema.VALUES_TABLE}"', VALUES_MEASURES
+            if (use_rollups and schema.rollup_fits(dimensions, measures, filters) and self.rollups_installed()
+                    and self._rollups_current()):
+                source, measure_sql = f'public."{schema.ROLLUP_TABLE}"', schema.ROLLUP_MEASURES
+
+            select = [f'{VALUES_DIMENSIONS[name]} AS {name}' for name in dimensions]
+            select += [f'{measure_sql[name]} AS {name}' for name in measures]
+            if grouping_sets is not None and dimensions:
+                select.append(f"GROUPING({', '.join(VALUES_DIMENSIONS[name] for name in dimensions)}) AS grouping")
+            where, params = values_filter_clause(filters)
+            query = f"""
+                SELECT {', '.join(select)}
+                FROM {source} v
+                {'WHERE ' + ' AND '.join(where) if where else ''}
+            """
+            if grouping_sets is not None:
+                sets = ', '.join(
+                    f"({', '.join(VALUES_DIMENSIONS[name] for name in grouping_set)})" for grouping_set in grouping_sets
+                )
+                query += f' GROUP BY GROUPING SETS ({sets})'
+            elif dimensions:
+                query += f" GROUP BY {', '.join(VALUES_DIMENSIONS[name] for name in dimensions)}"
+            if dimensions:
+                query += f" ORDER BY {', '.join(f'{name} NULLS LAST' for name in dimensions)}"
+            return self.execute_query(query, tuple(params))
+        except DatabaseError:
+            raise
+        except Exception as e:
+            raise DatabaseError(f"Ошибка агрегации значений показателей: {e}")
+
+    def install_rollups(self) -> dict:
+        """Создать итоги значений по показателю, ДЗО и периоду с триггерами очереди пересчета
+        и построить их; повторный вызов безопасен"""
+        try:
+            with self.borrow_connection() as connection:
+                try:
+                    with connection.cursor() as cursor:
+                        for statement in schema.ROLLUP_DDL:
+                            cursor.execute(statement)
+                    connection.commit()
+                except Exception:
+                    connection.rollback()
+                    raise
+            self._rollups_installed = True
+        except Exception as e:
+            raise DatabaseError(f"Ошибка установки итогов значений: {e}")
+        return self.refresh_rollups()
+
+    def rollups_installed(self) -> bool:
+        if self._rollups_installed is None:
+            result = self.execute_query('SELECT to_regclass(%s) IS NOT NULL AS installed',
+                                        (f'public."{schema.ROLLUP_TABLE}"',))
+            self._rollups_installed = bool(result and result[0]['installed'])
+        return self._rollups_installed
+
+    def _rollups_current(self) -> bool:
+        """Актуальны ли итоги: очередь пересчета пуста (только чтение)"""
+        result = self.execute_query(f'SELECT EXISTS (SELECT 1 FROM public."{schema.ROLLUP_QUEUE_TABLE}") AS pending')
+        return not result[0]['pending']
+
+    def refresh_rollups(self) -> dict:
+        """Пересчитать итоги только по периодам из очереди (их значения менялись после прошлого пересчета).
+        Вызывается явно: после импорта или по расписанию; до пересчета агрегаты читают таблицу значений"""
+        started = time.perf_counter()
+        try:
+            with self.borrow_connection() as connection:
+                try:
+                    with connection.cursor() as cursor:
+                        # Параллельные пересчеты выполняются по очереди
+                        cursor.execute('SELECT pg_advisory_xact_lock(hashtext(%s))', (schema.ROLLUP_LOCK_KEY,))
+                        cursor.execute(schema.ROLLUP_TAKE_QUEUE)
+                        periods = cursor.fetchall()
+                        rows = 0
+                        if periods:
+                            starts = [start for start, _ in periods]
+                            ends = [end for _, end in periods]
+                            cursor.execute(schema.ROLLUP_DELETE_PERIODS, (starts, ends))
+                            cursor.execute(schema.ROLLUP_INSERT_PERIODS, (starts, ends))
+                            rows = cursor.rowcount
+                    connection.commit()
+                except Exception:
+                    connection.rollback()
+                    raise
+        except Exception as e:
+            raise DatabaseError(f"Ошибка пересчета итогов значений: {e}")
+        return {'periods': len(periods), 'rows': rows, 'seconds': time.perf_counter() - started}
+
     def add_values_indicator(self, value_indicator: ValueIndicator) -> bool:
         """Добавить значение показателя"""
         try:
             return self.execute_command(
-                'INSERT INTO public."Значения показателей ДЗО" ("Дата начала периода", "Дата окончания периода", "Код показателя", "Код аналитики 1", "Код аналитики 2", "Код аналитики 3", "Сумма") VALUES (%s, %s, %s, %s, %s, %s, %s)',
+                f'INSERT INTO public."{schema.VALUES_TABLE}" ("Дата начала периода", "Дата окончания периода", "Код показателя", "Код аналитики 1", "Код аналитики 2", "Код аналитики 3", "Сумма") VALUES (%s, %s, %s, %s, %s, %s, %s)',
                 (value_indicator.date_period_start, value_indicator.date_period_end, value_indicator.id_indicator, value_indicator.analytic_1, value_indicator.analytic_2, value_indicator.analytic_3, value_indicator.sum_value)
             )
         except Exception as e:
@@ -402,60 +1060,27 @@ class Database:
             if not existing:
                 raise DatabaseError(f"Значение показателя с указанными параметрами не найдено")
             
-            query = '''
-                DELETE FROM public."Значения показателей ДЗО"
-                WHERE "Код показателя" = %s
-                AND "Дата начала периода" = %s
-                AND "Дата окончания периода" = %s
-                AND "Код аналитики 1" = %s
-            '''
-            params = [indicator_id, date_start, date_end, analytic_1]
-
-            # analytic_2
-            if analytic_2 is None or analytic_2 == '':
-                query += ' AND "Код аналитики 2" IS NULL'
-            else:
-                query += ' AND "Код аналитики 2" = %s'
-                params.append(analytic_2)
-
-            # analytic_3
-            if analytic_3 is None or analytic_3 == '':
-                query += ' AND "Код аналитики 3" IS NULL'
-            else:
-                query += ' AND "Код аналитики 3" = %s'
-                params.append(analytic_3)
-
-            return self.execute_command(query, tuple(params))
+            condition, params = self._values_key_clause(
+                indicator_id, date_start, date_end, analytic_1, analytic_2, analytic_3)
+            query = f'DELETE FROM public."{schema.VALUES_TABLE}" WHERE {condition}'
+            return self.execute_command(query, params)
         except DatabaseError:
             raise
         except Exception as e:
             raise DatabaseError(f"Ошибка удаления значения показателя: {e}")
         
-    def update_values_indicator(self, old_value: ValueIndicator, new_value: ValueIndicator) -> bool:
-        """Обновить значение показателя"""
-        try:
-            existing = self.get_values_indicator_by_id(
-                old_value.id_indicator,
-                old_value.date_period_start,
-                old_value.date_period_end,
-                old_value.analytic_1,
-                old_value.analytic_2,
-                old_value.analytic_3
-            )
-            if not existing:
-                raise DatabaseError(f"Значение показателя с указанными параметрами не найдено")
-
+    def update_values_indicator(self, old_value: ValueIndicator, new_value: ValueIndicator) -> ValueIndicator:
+        """Обновить значение показателя; возвращает обновленную запись с данными ДЗО"""
+        try:
             dzo_existing = self.get_dzo_by_id(new_value.dzo)
             if not dzo_existing:
                 raise DatabaseError(f"ДЗО с ID '{new_value.dzo}' не найдено")
-            
-            where_clause = '''
-                "Код показателя" = %s AND
-                "Дата начала периода" = %s AND
-                "Дата окончания периода" = %s AND
-                "Код аналитики 1" = %s
-            '''
-            params = [
+            self._check_values_validity(new_value)
+
+            where_clause, key_params = self._values_key_clause(
+                old_value.id_indicator, old_value.date_period_start, old_value.date_period_end,
+                old_value.analytic_1, old_value.analytic_2, old_value.analytic_3)
+            params = (
                 new_value.date_period_start,
                 new_value.date_period_end,
                 new_value.id_indicator,
@@ -464,39 +1089,29 @@ class Database:
                 new_value.analytic_3,
                 new_value.sum_value,
                 new_value.dzo,
-                old_value.id_indicator,
-                old_value.date_period_start,
-                old_value.date_period_end,
-                old_value.analytic_1,
-                
-            ]
-
-            if old_value.analytic_2 is None or old_value.analytic_2 == '':
-                where_clause += ' AND "Код аналитики 2" IS NULL'
-            else:
-                where_clause += ' AND "Код аналитики 2" = %s'
-                params.append(old_value.analytic_2)
-
-            if old_value.analytic_3 is None or old_value.analytic_3 == '':
-                where_clause += ' AND "Код аналитики 3" IS NULL'
-            else:
-                where_clause += ' AND "Код аналитики 3" = %s'
-                params.append(old_value.analytic_3)
+            ) + key_params
 
             query = f'''
-                UPDATE public."Значения показателей ДЗО"
-                SET "Дата начала периода" = %s,
-                    "Дата окончания периода" = %s,
-                    "Код показателя" = %s,
-                    "Код аналитики 1" = %s,
-                    "Код аналитики 2" = %s,
-                    "Код аналитики 3" = %s,
-                    "Сумма" = %s,
-                    "ДЗО" = %s
-                WHERE {where_clause}
+                WITH updated AS (
+                    UPDATE public."{schema.VALUES_TABLE}"
+                    SET "Дата начала периода" = %s,
+                        "Дата окончания периода" = %s,
+                        "Код показателя" = %s,
+                        "Код аналитики 1" = %s,
+                        "Код аналитики 2" = %s,
+                        "Код аналитики 3" = %s,
+                        "Сумма" = %s,
+                        "ДЗО" = %s
+                    WHERE {where_clause}
+                    RETURNING *
+                )
+                {VALUES_WITH_DZO_SELECT.format(source='updated')}
             '''
 
-            return self.execute_command(query, tuple(params))
+            result = self.execute_returning(query, params, row_factory=ValueIndicator.row_factory)
+            if not result:
+                raise DatabaseError(f"Значение показателя с указанными параметрами не найдено")
+            return result[0]
         except DatabaseError:
             raise
         except Exception as e:
@@ -504,34 +1119,30 @@ class Database:
     
     # ========== CRUD ДЛЯ DZO ==========
 
-    def create_dzo(self, name, address) -> bool:
-        """Создать новое ДЗО"""
+    def create_dzo(self, name, address) -> DZO:
+        """Создать новое ДЗО; возвращает запись с присвоенным идентификатором"""
         try:
-            return self.execute_command(
-                'INSERT INTO public."ДЗО" ("Наименование", "Адрес") VALUES (%s, %s)',
-                (name, address)
+            result = self.execute_returning(
+                'INSERT INTO public."ДЗО" ("Наименование", "Адрес") VALUES (%s, %s) RETURNING *',
+                (name, address),
+                changes='ДЗО',
+                row_factory=DZO.row_factory
             )
+            return result[0]
         except Exception as e:
             raise DatabaseError(f"Ошибка создания ДЗО: {e}")
 
     def get_dzo_by_id(self, dzo_id: str):
         """Получить ДЗО по ID"""
         try:
-            result = self.execute_query(
-                'SELECT * FROM public."ДЗО" WHERE "Идентификатор ДЗО" = %s',
-                (dzo_id,)
-            )
-            return DZO(result[0]) if result else None
+            return self.references.get('ДЗО', str(dzo_id))
         except Exception as e:
             raise DatabaseError(f"Ошибка получения ДЗО по ID: {e}")
         
     def get_all_dzos(self):
         """Получить все ДЗО"""
         try:
-            result = self.execute_query(
-                '''SELECT * FROM public."ДЗО" ORDER BY "Идентификатор ДЗО" ASC'''
-            )
-            return [DZO(row) for row in result]
+            return self.references.rows('ДЗО')
         except Exception as e:
             raise DatabaseError(f"Ошибка получения всех ДЗО: {e}")
         
@@ -545,7 +1156,8 @@ class Database:
                     "Адрес" = %s
                 WHERE "Идентификатор ДЗО" = %s
                 ''',
-                (name, address, dzo_id)
+                (name, address, dzo_id),
+                changes='ДЗО'
             )
         except Exception as e:
             raise DatabaseError(f"Ошибка обновления ДЗО: {e}")
@@ -555,29 +1167,275 @@ class Database:
         try:
             return self.execute_command(
                 'DELETE FROM public."ДЗО" WHERE "Идентификатор ДЗО" = %s',
-                (dzo_id,)
+                (dzo_id,),
+                changes='ДЗО'
             )
         except Exception as e:
             raise DatabaseError(f"Ошибка удаления ДЗО: {e}")
-    
-    # ========== CRUD ДЛЯ USER ==========
 
-    def create_user(self, user: User) -> bool:
-        """Создать нового пользователя"""
+    # ========== ВЕРСИИ СХЕМЫ ==========
+
+    def schema_version(self) -> int:
+        """Последняя примененная версия схемы (0 - версии еще не применялись)"""
+        try:
+            result = self.execute_query('SELECT to_regclass(%s) IS NOT NULL AS installed',
+                                        (f'public."{schema.SCHEMA_VERSIONS_TABLE}"',))
+            if not result[0]['installed']:
+                return 0
+            result = self.execute_query(
+                f'SELECT COALESCE(max("Версия"), 0) AS version FROM public."{schema.SCHEMA_VERSIONS_TABLE}"')
+            return result[0]['version']
+        except Exception as e:
+            raise DatabaseError(f"Ошибка получения версии схемы: {e}")
+
+    def migrate(self, target: int = None) -> list:
+        """Применить недостающие версии схемы (schema.MIGRATIONS) по возрастанию до target включительно,
+        каждую в своей транзакции; параллельные вызовы выполняются по очереди.
+        Индексы строятся обычным CREATE INDEX: на время построения запись в таблицу значений ждет.
+        Возвращает номера примененных версий"""
+        applied = []
+        try:
+            with self.borrow_connection() as connection:
+                for version, description, statements in schema.MIGRATIONS:
+                    if target is not None and version > target:
+                        break
+                    try:
+                        with connection.cursor() as cursor:
+                            cursor.execute('SELECT pg_advisory_xact_lock(hashtext(%s))',
+                                           (schema.SCHEMA_VERSIONS_LOCK_KEY,))
+                            cursor.execute(schema.SCHEMA_VERSIONS_DDL)
+                            cursor.execute(
+                                f'SELECT 1 FROM public."{schema.SCHEMA_VERSIONS_TABLE}" WHERE "Версия" = %s',
+                                (version,)
+                            )
+                            if cursor.fetchone() is None:
+                                for statement in statements:
+                                    cursor.execute(statement)
+                                cursor.execute(
+                                    f'''
+                                    INSERT INTO public."{schema.SCHEMA_VERSIONS_TABLE}" ("Версия", "Описание")
+                                    VALUES (%s, %s)
+                                    ''',
+                                    (version, description)
+                                )
+                                applied.append(version)
+                        connection.commit()
+                    except Exception as e:
+                        connection.rollback()
+                        raise DatabaseError(f"Ошибка обновления схемы до версии {version} ({description}): {e}")
+                    if applied and applied[-1] == version:
+                        log.info("Применена версия схемы", version=version, description=description)
+        except DatabaseError:
+            raise
+        except Exception as e:
+            raise DatabaseError(f"Ошибка обновления схемы: {e}")
+        return applied
+
+    def check_query_plans(self) -> list:
+        """Проверить по EXPLAIN, что частые запросы к значениям показателей не читают таблицу целиком.
+        Планы строятся с enable_seqscan = off: последовательное чтение остается в плане, только если
+        подходящего индекса нет, поэтому результат не зависит от объема данных и статистики.
+        Целиком читает таблицу и Seq Scan, и обход индекса без условия, если он не отдает строки
+        в порядке ORDER BY под LIMIT; страницы без фильтров к тому же должны читаться без сортировки.
+        Возвращает [{'query': имя, 'problems': [узлы плана], 'plan': текст плана}]"""
+        page_key = ('2000-01-01', '2000-01-31', '', '', '', '')
+        queries = []
+        for name, analytics in (('по ключу', ('', None, None)), ('по ключу с аналитиками 2, 3', ('', '-', '-'))):
+            condition, params = self._values_key_clause('', '2000-01-01', '2000-01-31', *analytics)
+            queries.append((f'get_values_indicator_by_id {name}',
+                            f'SELECT * FROM public."{schema.VALUES_TABLE}" WHERE {condition}', params, False))
+        condition, params = self._values_key_clause('', '2000-01-01', '2000-01-31', '', None, None)
+        queries.append(('delete_values_indicator', f'DELETE FROM public."{schema.VALUES_TABLE}" WHERE {condition}',
+                        params, False))
+        queries.append(('update_values_indicator',
+                        f'UPDATE public."{schema.VALUES_TABLE}" SET "Сумма" = %s WHERE {condition}', (0,) + params,
+                        False))
+        for name, arguments, ordered in (
+            ('первая страница', {}, True),
+            ('следующая страница', {'after': page_key}, True),
+            ('предыдущая страница', {'before': page_key}, True),
+            ('фильтр по ДЗО', {'filters': {'dzo_id': 1}}, False),
+            ('фильтр по периоду', {'filters': {'date_from': '2000-01-01', 'date_to': '2000-12-31'}}, False),
+            ('фильтр по показателю', {'filters': {'indicator_id': '-'}}, False),
+        ):
+            query, params, _ = self._values_page_query(100, **arguments)
+            queries.append((f'get_values_indicators_page: {name}', query, params, ordered))
+
+        results = []
+        try:
+            with self.borrow_connection() as connection:
+                try:
+                    with connection.cursor() as cursor:
+                        cursor.execute('SET LOCAL enable_seqscan = off')
+                        for name, query, params, ordered in queries:
+                            cursor.execute(f'EXPLAIN (FORMAT JSON) {query}', params)
+                            tree = cursor.fetchone()[0][0]['Plan']
+                            problems = _full_scans(tree)
+                            if ordered and _has_sort(tree):
+                                problems.append('Sort: страница не читается в порядке индекса')
+                            cursor.execute(f'EXPLAIN {query}', params)
+                            plan = '\n'.join(row[0] for row in cursor.fetchall())
+                            results.append({'query': name, 'problems': problems, 'plan': plan})
+                finally:
+                    # EXPLAIN без ANALYZE ничего не меняет; откат снимает SET LOCAL
+                    connection.rollback()
+        except Exception as e:
+            raise DatabaseError(f"Ошибка проверки планов запросов: {e}")
+        return results
+
+    # ========== ГРУППЫ ДЗО ==========
+
+    def install_dzo_groups(self):
+        """Создать таблицы групп ДЗО для консолидации; повторный вызов безопасен"""
         try:
-            dzo_available = self.execute_query(
-                'SELECT * FROM public."ДЗО" WHERE "Идентификатор ДЗО" = %s',
-                (user.dzo,)
+            with self.borrow_connection() as connection:
+                try:
+                    with connection.cursor() as cursor:
+                        for statement in schema.DZO_GROUPS_DDL:
+                            cursor.execute(statement)
+                    connection.commit()
+                except Exception:
+                    connection.rollback()
+                    raise
+        except Exception as e:
+            raise DatabaseError(f"Ошибка установки групп ДЗО: {e}")
+
+    def get_dzo_groups(self):
+        """Получить все группы ДЗО"""
+        try:
+            return self.execute_query(
+                f'SELECT * FROM public."{schema.DZO_GROUPS_TABLE}" ORDER BY "Идентификатор группы"',
+                row_factory=DZOGroup.row_factory
             )
-            if not dzo_available:
-                raise DatabaseError(f"ДЗО с ID '{user.dzo}' не найдено")
+        except Exception as e:
+            raise DatabaseError(f"Ошибка получения групп ДЗО: {e}")
+
+    def get_dzo_group_members(self):
+        """Получить состав групп: пары (идентификатор группы, ДЗО)"""
+        try:
+            result = self.execute_query(
+                f'SELECT "Идентификатор группы", "ДЗО" FROM public."{schema.DZO_GROUP_MEMBERS_TABLE}"'
+            )
+            return [(row['Идентификатор группы'], row['ДЗО']) for row in result]
+        except Exception as e:
+            raise DatabaseError(f"Ошибка получения состава групп ДЗО: {e}")
+
+    def create_dzo_group(self, name: str, parent_id: int = None) -> DZOGroup:
+        """Создать группу ДЗО, вложенную в parent_id или верхнего уровня"""
+        try:
+            result = self.execute_returning(
+                f'''
+                INSERT INTO public."{schema.DZO_GROUPS_TABLE}" ("Наименование", "Родительская группа")
+                VALUES (%s, %s) RETURNING *
+                ''',
+                (name, parent_id),
+                row_factory=DZOGroup.row_factory
+            )
+            return result[0]
+        except Exception as e:
+            raise DatabaseError(f"Ошибка создания группы ДЗО: {e}")
+
+    def delete_dzo_group(self, group_id: int) -> bool:
+        """Удалить группу ДЗО вместе с вложенными группами"""
+        try:
+            return self.execute_command(
+                f'DELETE FROM public."{schema.DZO_GROUPS_TABLE}" WHERE "Идентификатор группы" = %s',
+                (group_id,)
+            )
+        except Exception as e:
+            raise DatabaseError(f"Ошибка удаления группы ДЗО: {e}")
+
+    def add_dzo_to_group(self, group_id: int, dzo_id: int) -> bool:
+        """Включить ДЗО в группу"""
+        try:
+            return self.execute_command(
+                f'''
+                INSERT INTO public."{schema.DZO_GROUP_MEMBERS_TABLE}" ("Идентификатор группы", "ДЗО")
+                VALUES (%s, %s) ON CONFLICT DO NOTHING
+                ''',
+                (group_id, dzo_id)
+            )
+        except Exception as e:
+            raise DatabaseError(f"Ошибка добавления ДЗО в группу: {e}")
+
+    def remove_dzo_from_group(self, group_id: int, dzo_id: int) -> bool:
+        """Исключить ДЗО из группы"""
+        try:
+            return self.execute_command(
+                f'DELETE FROM public."{schema.DZO_GROUP_MEMBERS_TABLE}" WHERE "Идентификатор группы" = %s AND "ДЗО" = %s',
+                (group_id, dzo_id)
+            )
+        except Exception as e:
+            raise DatabaseError(f"Ошибка исключения ДЗО из группы: {e}")
+
+    # ========== ФОРМУЛЫ ПОКАЗАТЕЛЕЙ ==========
+
+    def install_formulas(self):
+        """Создать таблицу формул производных показателей; повторный вызов безопасен"""
+        try:
+            with self.borrow_connection() as connection:
+                try:
+                    with connection.cursor() as cursor:
+                        for statement in schema.FORMULAS_DDL:
+                            cursor.execute(statement)
+                    connection.commit()
+                except Exception:
+                    connection.rollback()
+                    raise
+        except Exception as e:
+            raise DatabaseError(f"Ошибка установки формул показателей: {e}")
+
+    def get_formulas(self) -> dict:
+        """Формулы производных показателей: {код показателя: текст формулы}"""
+        try:
+            result = self.execute_query(f'SELECT "Код показателя", "Формула" FROM public."{schema.FORMULAS_TABLE}"')
+            return {row['Код показателя']: row['Формула'] for row in result}
+        except Exception as e:
+            raise DatabaseError(f"Ошибка получения формул показателей: {e}")
+
+    def save_formula(self, indicator_id: str, expression: str) -> bool:
+        """Сохранить формулу показателя; формула проверяется на синтаксис и циклы зависимостей"""
+        try:
+            formulas = {code: Formula(code, text) for code, text in self.get_formulas().items()}
+            formulas[indicator_id] = Formula(indicator_id, expression)
+            evaluation_order(formulas)
             return self.execute_command(
+                f'''
+                INSERT INTO public."{schema.FORMULAS_TABLE}" ("Код показателя", "Формула") VALUES (%s, %s)
+                ON CONFLICT ("Код показателя") DO UPDATE SET "Формула" = EXCLUDED."Формула"
+                ''',
+                (indicator_id, expression)
+            )
+        except Exception as e:
+            raise DatabaseError(f"Ошибка сохранения формулы показателя: {e}")
+
+    def delete_formula(self, indicator_id: str) -> bool:
+        """Удалить формулу; показатель снова становится хранимым"""
+        try:
+            return self.execute_command(
+                f'DELETE FROM public."{schema.FORMULAS_TABLE}" WHERE "Код показателя" = %s',
+                (indicator_id,)
+            )
+        except Exception as e:
+            raise DatabaseError(f"Ошибка удаления формулы показателя: {e}")
+
+    # ========== CRUD ДЛЯ USER ==========
+
+    def create_user(self, user: User) -> User:
+        """Создать нового пользователя; возвращает сохраненную запись"""
+        try:
+            if not self.get_dzo_by_id(user.dzo):
+                raise DatabaseError(f"ДЗО с ID '{user.dzo}' не найдено")
+            result = self.execute_returning(
                 '''
                 INSERT INTO public."Пользователи"("ФИО", "Роль", "Логин", "Пароль", "ДЗО")
                 VALUES (%s, %s, %s, crypt(%s, gen_salt('bf')), %s)
+                RETURNING *
                 ''',
-                (user.full_name, user.role, user.login, user.password, user.dzo)
+                (user.full_name, user.role, user.login, user.password, user.dzo),
+                row_factory=User.row_factory
             )
+            return result[0]
         except Exception as e:
             raise DatabaseError(f"Ошибка создания пользователя: {e}")
     
@@ -589,9 +1447,10 @@ class Database:
                 SELECT * FROM public."Пользователи"
                 WHERE "Логин" = %s AND "Пароль" = crypt(%s, "Пароль")
                 ''',
-                (login, password)
+                (login, password),
+                row_factory=User.row_factory
             )
-            return User(result[0]) if result else None
+            return result[0] if result else None
         except Exception as e:
             raise DatabaseError(f"Ошибка получения пользователя по учетным данным: {e}")
         
@@ -599,23 +1458,20 @@ class Database:
         """Получить всех пользователей"""
         try:
             result = self.execute_query(
-                '''SELECT * FROM public."Пользователи" ORDER BY "Идентификационный номер" ASC'''
+                '''SELECT * FROM public."Пользователи" ORDER BY "Идентификационный номер" ASC''',
+                row_factory=User.row_factory
             )
-            return [User(row) for row in result]
+            return result
         except Exception as e:
             raise DatabaseError(f"Ошибка получения всех пользователей: {e}")
         
-    def update_user(self, user_id: str, full_name: str, role: str, login: str, password: str, dzo: str) -> bool:
-        """Обновить пользователя"""
+    def update_user(self, user_id: str, full_name: str, role: str, login: str, password: str, dzo: str) -> User:
+        """Обновить пользователя; возвращает обновленную запись"""
         try:
-            dzo_available = self.execute_query(
-                'SELECT * FROM public."ДЗО" WHERE "Идентификатор ДЗО" = %s',
-                (dzo,)
-            )
-            if not dzo_available:
+            if not self.get_dzo_by_id(dzo):
                 raise DatabaseError(f"ДЗО с ID '{dzo}' не найдено")
             
-            return self.execute_command(
+            result = self.execute_returning(
                 '''
                 UPDATE public."Пользователи"
                 SET "ФИО" = %s,
@@ -624,9 +1480,16 @@ class Database:
                     "Пароль" = crypt(%s, gen_salt('bf')),
                     "ДЗО" = %s
                 WHERE "Идентификационный номер" = %s
+                RETURNING *
                 ''',
-                (full_name, role, login, password, dzo, user_id)
+                (full_name, role, login, password, dzo, user_id),
+                row_factory=User.row_factory
             )
+            if not result:
+                raise DatabaseError(f"Пользователь с ID '{user_id}' не найден")
+            return result[0]
+        except DatabaseError:
+            raise
         except Exception as e:
             raise DatabaseError(f"Ошибка обновления пользователя: {e}")
         
@@ -0,0 +1,102 @@
+import datetime
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+# Допустимые форматы дат в порядке проверки
+DATE_FORMATS = ('%Y-%m-%d', '%d.%m.%Y', '%Y-%m-%d %H:%M:%S')
+# Метки статистики разбора: значения, уже бывшие датами, и нераспознанные строки
+FROM_DATE = 'date'
+INVALID = 'invalid'
+
+
+def parse_date(value):
+    """Привести значение к datetime.date; пустое или нераспознанное значение - None"""
+    if not value:
+        return None
+    # datetime - подкласс date, поэтому проверяется первым
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    if isinstance(value, datetime.date):
+        return value
+    if isinstance(value, str):
+        return _parse_date_string(value)[0]
+    return None
+
+
+def date_format_of(value: str):
+    """Формат из DATE_FORMATS, по которому разбирается строка, или None"""
+    return _parse_date_string(value)[1]
+
+
+@lru_cache(maxsize=4096)
+def _parse_date_string(value: str):
+    # Быстрый путь без strptime и исключений для строк ровно по формату
+    if len(value) == 10:
+        if value[4] == '-' and value[7] == '-':
+            try:
+                return datetime.date.fromisoformat(value), DATE_FORMATS[0]
+            except ValueError:
+                pass
+        elif value[2] == '.' and value[5] == '.' and value.replace('.', '').isdigit():
+            try:
+                return datetime.date(int(value[6:]), int(value[3:5]), int(value[:2])), DATE_FORMATS[1]
+            except ValueError:
+                pass
+    # strptime принимает и варианты без ведущих нулей (2024-1-5)
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.datetime.strptime(value, fmt).date(), fmt
+        except ValueError:
+            continue
+    return None, None
+
+
+def parse_date_column(values: pd.Series):
+    """Разобрать колонку дат порции импорта.
+    Каждое различное значение разбирается один раз, строки - векторно через pd.to_datetime по каждому формату.
+    Возвращает (Series из datetime.date или None, {формат | 'date' | 'invalid': число строк})"""
+    codes, uniques = pd.factorize(values, use_na_sentinel=True)
+    uniques = np.asarray(uniques, dtype=object)
+    parsed_uniques = np.full(len(uniques), None, dtype=object)
+    labels = np.full(len(uniques), None, dtype=object)
+
+    is_text = np.fromiter((isinstance(value, str) for value in uniques), dtype=bool, count=len(uniques))
+    pending = np.flatnonzero(is_text & (uniques != ''))
+    for fmt in DATE_FORMATS:
+        if not len(pending):
+            break
+        parsed = pd.to_datetime(pd.Index(uniques[pending]), format=fmt, errors='coerce')
+        hit = ~np.asarray(parsed.isna())
+        if hit.any():
+            parsed_uniques[pending[hit]] = np.asarray(parsed[hit].date, dtype=object)
+            labels[pending[hit]] = fmt
+        pending = pending[~hit]
+    # Что не разобралось векторно (в том числе даты вне диапазона datetime64[ns], например 9999-12-31)
+    for index in pending:
+        parsed_uniques[index], labels[index] = _parse_date_string(uniques[index])
+        if labels[index] is None:
+            labels[index] = INVALID
+    for index in np.flatnonzero(~is_text):
+        parsed_uniques[index] = parse_date(uniques[index])
+        labels[index] = FROM_DATE if parsed_uniques[index] is not None else INVALID
+
+    present = codes >= 0
+    result = np.full(len(codes), None, dtype=object)
+    result[present] = parsed_uniques[codes[present]]
+
+    rows_per_unique = np.bincount(codes[present], minlength=len(uniques))
+    counts = {}
+    for label in DATE_FORMATS + (FROM_DATE, INVALID):
+        hits = int(rows_per_unique[labels == label].sum())
+        if hits:
+            counts[label] = hits
+    return pd.Series(result, index=values.index, dtype=object), counts
+
+
+def merge_counts(total: dict, counts: dict) -> dict:
+    """Сложить статистику разбора counts в total"""
+    for label, hits in counts.items():
+        total[label] = total.get(label, 0) + hits
+    return total
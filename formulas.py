@@ -0,0 +1,327 @@
+import ast
+import re
+from graphlib import CycleError, TopologicalSorter
+
+import numpy as np
+import pandas as pd
+
+from date_parsing import parse_date
+from values_store import CODE_COLUMNS, DATE_COLUMNS, SUM_COLUMN, ValuesStore
+
+# Ссылка на показатель в тексте формулы: [Код показателя]
+REFERENCE = re.compile(r'\[([^\[\]]+)\]')
+# Функции формул: имя -> (число аргументов, функция); работают поэлементно над колонками значений.
+# Число аргументов проверяется при разборе: лишний позиционный аргумент ufunc numpy принял бы за буфер out
+FUNCTIONS = {
+    'abs': (1, np.abs),
+    'min': (2, np.minimum),
+    'max': (2, np.maximum),
+    # nvl(x, y): y там, где значения x нет
+    'nvl': (2, lambda value, default: np.where(np.isnan(value), default, value)),
+}
+_OPERATORS = (ast.Add, ast.Sub, ast.Mult, ast.Div, ast.Pow, ast.USub, ast.UAdd)
+# Ключ значения формулы: показатель рассчитывается отдельно для каждого ДЗО, периода и набора аналитик
+KEY_FIELDS = ('dzo', 'start', 'end', 'analytic_1', 'analytic_2', 'analytic_3')
+
+
+class Formula:
+    """Формула производного показателя, например "[P1] / [P2] * 100".
+    Разбирается через ast; допустимы числа, ссылки на показатели, + - * / ** и функции FUNCTIONS"""
+
+    def __init__(self, indicator_id: str, expression: str):
+        self.indicator_id = indicator_id
+        self.expression = expression
+        references = []
+
+        def replace(match):
+            code = match.group(1).strip()
+            if code not in references:
+                references.append(code)
+            return f'_{references.index(code)}'
+
+        try:
+            tree = ast.parse(REFERENCE.sub(replace, expression), mode='eval')
+        except SyntaxError as e:
+            raise ValueError(f"Ошибка в формуле показателя {indicator_id}: {e.msg}")
+        names = {f'_{index}' for index in range(len(references))}
+        # Имя функции допустимо только как вызываемое в вызове, не как значение
+        callees = {id(node.func) for node in ast.walk(tree) if isinstance(node, ast.Call)}
+        for node in ast.walk(tree):
+            self._check(node, names, callees)
+        self.references = tuple(references)
+        self._code = compile(tree, f'<формула {indicator_id}>', 'eval')
+
+    def _check(self, node, names: set, callees: set):
+        if isinstance(node, (ast.Expression, ast.BinOp, ast.UnaryOp, ast.Load) + _OPERATORS):
+            return
+        if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)) \
+                and not isinstance(node.value, bool):
+            return
+        if isinstance(node, ast.Name) and (node.id in names or node.id in FUNCTIONS and id(node) in callees):
+            return
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id in FUNCTIONS \
+                and not node.keywords:
+            arity = FUNCTIONS[node.func.id][0]
+            if len(node.args) != arity:
+                raise ValueError(f"Функция {node.func.id} в формуле показателя {self.indicator_id} "
+                                 f"принимает аргументов: {arity}, передано: {len(node.args)}")
+            return
+        raise ValueError(f"Недопустимый элемент в формуле показателя {self.indicator_id}: {ast.dump(node)[:60]}")
+
+    def evaluate(self, columns: list) -> np.ndarray:
+        """Значения формулы по колонкам ссылок (в порядке references); деление на ноль дает NaN"""
+        namespace = {name: function for name, (_, function) in FUNCTIONS.items()}
+        namespace.update({f'_{index}': np.asarray(column, dtype=float) for index, column in enumerate(columns)})
+        with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+            result = np.asarray(eval(self._code, {'__builtins__': {}}, namespace), dtype=float)
+        if result.ndim == 0:
+            result = np.full(len(columns[0]) if columns else 1, float(result))
+        result[~np.isfinite(result)] = np.nan
+        return result
+
+
+def evaluation_order(formulas: dict) -> list:
+    """Коды формульных показателей в порядке расчета: каждый после тех, от которых зависит.
+    formulas - {код: Formula}; цикл зависимостей - ValueError"""
+    graph = {
+        code: [reference for reference in formula.references if reference in formulas]
+        for code, formula in formulas.items()
+    }
+    try:
+        return list(TopologicalSorter(graph).static_order())
+    except CycleError as e:
+        raise ValueError(f"Цикл в формулах показателей: {' -> '.join(e.args[1])}")
+
+
+class FormulaEngine:
+    """Расчет формульных показателей по снимку значений (ValuesStore).
+    Формулы считаются векторно в топологическом порядке, результаты кэшируются.
+    Изменение значения отмечает устаревшими только период изменения у зависимых формул,
+    при следующем чтении пересчитываются только они"""
+
+    def __init__(self, formulas: dict, store: ValuesStore):
+        # formulas - {код показателя: текст формулы}
+        self.store = store
+        self.formulas = {}
+        self.order = []
+        self.dependents = {}
+        self._results = {}                 # код -> Series значений с индексом KEY_FIELDS (коды и datetime64)
+        self._stale = set()                # формулы, которые нужно пересчитать целиком
+        self._dirty = {}                   # код -> ключи периодов, которые нужно пересчитать
+        self.evaluations = 0
+        self.partial_evaluations = 0
+        self._set_formulas({code: Formula(code, expression) for code, expression in formulas.items()})
+
+    @classmethod
+    def from_database(cls, db, filters: dict = None) -> 'FormulaEngine':
+        return cls(db.get_formulas(), db.load_values_store(filters))
+
+    # ---------- Формулы ----------
+
+    def _set_formulas(self, formulas: dict):
+        order = evaluation_order(formulas)
+        self.formulas = formulas
+        self.order = order
+        self.dependents = {}
+        for code, formula in formulas.items():
+            for reference in formula.references:
+                self.dependents.setdefault(reference, set()).add(code)
+
+    def set_formula(self, indicator_id: str, expression: str):
+        """Добавить или изменить формулу; пересчитываются она и зависимые от нее"""
+        formulas = dict(self.formulas)
+        formulas[indicator_id] = Formula(indicator_id, expression)
+        self._set_formulas(formulas)
+        self._stale |= self.downstream(indicator_id) | {indicator_id}
+
+    def remove_formula(self, indicator_id: str):
+        formulas = dict(self.formulas)
+        formulas.pop(indicator_id, None)
+        self._set_formulas(formulas)
+        self._results.pop(indicator_id, None)
+        self._dirty.pop(indicator_id, None)
+        self._stale.discard(indicator_id)
+        self._stale |= self.downstream(indicator_id)
+
+    def downstream(self, indicator_id: str) -> set:
+        """Формулы, прямо или через другие формулы зависящие от показателя"""
+        found, pending = set(), [indicator_id]
+        while pending:
+            for code in self.dependents.get(pending.pop(), ()):
+                if code not in found:
+                    found.add(code)
+                    pending.append(code)
+        return found
+
+    # ---------- Изменения значений ----------
+
+    def invalidate(self, indicator_id: str, date_start=None, date_end=None):
+        """Отметить устаревшими зависимые от показателя формулы: за период или, без периода, целиком"""
+        codes = self.downstream(indicator_id)
+        if date_start is None and date_end is None:
+            self._stale |= codes
+            return
+        period = _period_key(np.datetime64(parse_date(date_start), 'D'), np.datetime64(parse_date(date_end), 'D'))
+        for code in codes - self._stale:
+            self._dirty.setdefault(code, set()).add(int(period))
+
+    def apply_change(self, old_value=None, new_value=None):
+        """Отразить изменение значения (ValueIndicator) в снимке и отметить зависимые формулы:
+        old_value - запись до изменения (None для новой), new_value - после (None для удаленной)"""
+        if old_value is not None and new_value is not None:
+            self.store.replace(old_value, new_value)
+        elif new_value is not None:
+            self.store.upsert([new_value])
+        elif old_value is not None:
+            self.store.delete([old_value])
+        for value in (old_value, new_value):
+            if value is not None:
+                self.invalidate(value.id_indicator, value.date_period_start, value.date_period_end)
+
+    # ---------- Расчет ----------
+
+    def refresh(self):
+        """Пересчитать устаревшее: формулы целиком или только отмеченные периоды"""
+        full = self._stale | (set(self.formulas) - set(self._results))
+        if not full and not self._dirty:
+            return
+        periods = set().union(*self._dirty.values()) if self._dirty else set()
+        stored_all = stored_dirty = None
+        for code in self.order:
+            if code in full:
+                if stored_all is None:
+                    stored_all = self._stored(None)
+                self._results[code] = self._evaluate(self.formulas[code], stored_all, None)
+                self.evaluations += 1
+            elif code in self._dirty:
+                if stored_dirty is None:
+                    stored_dirty = self._stored(periods)
+                code_periods = np.fromiter(self._dirty[code], dtype=np.int64)
+                kept = self._results[code]
+                kept = kept[~np.isin(_index_periods(kept.index), code_periods)]
+                fresh = self._evaluate(self.formulas[code], stored_dirty, code_periods)
+                fresh = fresh[np.isin(_index_periods(fresh.index), code_periods)]
+                self._results[code] = pd.concat([kept, fresh]) if len(kept) else fresh
+                self.partial_evaluations += 1
+        self._stale.clear()
+        self._dirty.clear()
+
+    def _stored(self, periods) -> pd.DataFrame:
+        """Хранимые значения показателей, на которые ссылаются формулы: строки - KEY_FIELDS, колонки - коды"""
+        referenced = {reference for formula in self.formulas.values() for reference in formula.references}
+        dictionary = self.store.dictionaries['indicator']
+        codes = [code for code in (dictionary.lookup(reference) for reference in referenced - set(self.formulas))
+                 if code is not None]
+        rows = np.isin(self.store.codes['indicator'], codes)
+        if periods is not None:
+            rows &= np.isin(_period_key(self.store.start, self.store.end), np.fromiter(periods, dtype=np.int64))
+        frame = pd.DataFrame({
+            'dzo': self.store.codes['dzo'][rows],
+            'start': self.store.start[rows],
+            'end': self.store.end[rows],
+            'analytic_1': self.store.codes['analytic_1'][rows],
+            'analytic_2': self.store.codes['analytic_2'][rows],
+            'analytic_3': self.store.codes['analytic_3'][rows],
+            'indicator': self.store.decode('indicator', rows),
+            'value': self.store.sums[rows],
+        })
+        return frame.groupby(list(KEY_FIELDS) + ['indicator'], sort=False)['value'].sum(min_count=1) \
+            .unstack('indicator')
+
+    def _evaluate(self, formula: Formula, stored: pd.DataFrame, periods) -> pd.Series:
+        # Ссылки на формулы берутся из уже пересчитанных результатов (порядок расчета топологический)
+        inputs = []
+        for reference in formula.references:
+            if reference in self.formulas:
+                column = self._results.get(reference, _empty())
+                if periods is not None:
+                    column = column[np.isin(_index_periods(column.index), periods)]
+            elif reference in stored.columns:
+                column = stored[reference]
+            else:
+                column = _empty()
+            inputs.append(column.rename(reference))
+        if not inputs:
+            return _empty()
+        frame = pd.concat(inputs, axis=1, join='outer') if len(inputs) > 1 else inputs[0].to_frame()
+        frame = frame.dropna(how='all')
+        if frame.empty:
+            return _empty()
+        result = pd.Series(formula.evaluate([frame[column].to_numpy() for column in frame.columns]),
+                           index=frame.index, name=formula.indicator_id)
+        # Значение формулы есть там, где его удалось посчитать (нет пропусков в нужных показателях)
+        return result.dropna()
+
+    # ---------- Чтение ----------
+
+    def value(self, indicator_id: str, dzo, date_start, date_end, analytic_1=None, analytic_2=None, analytic_3=None):
+        """Значение формульного показателя по ключу или None"""
+        self.refresh()
+        series = self._results.get(indicator_id)
+        if series is None:
+            raise ValueError(f"Показатель {indicator_id} не является формульным")
+        dictionaries = self.store.dictionaries
+        key = (
+            dictionaries['dzo'].lookup(None if dzo in (None, '') else int(dzo)),
+            np.datetime64(parse_date(date_start), 'D'),
+            np.datetime64(parse_date(date_end), 'D'),
+            dictionaries['analytic_1'].lookup(analytic_1 or None),
+            dictionaries['analytic_2'].lookup(analytic_2 or None),
+            dictionaries['analytic_3'].lookup(analytic_3 or None),
+        )
+        if any(code is None for code in key):
+            return None
+        try:
+            return float(series.loc[key])
+        except KeyError:
+            return None
+
+    def to_frame(self, indicator_ids=None) -> pd.DataFrame:
+        """Значения формульных показателей в колонках таблицы значений; подходит для ValuesStore.from_frame"""
+        self.refresh()
+        parts = []
+        for code in indicator_ids or self.order:
+            series = self._results.get(code)
+            if series is None or series.empty:
+                continue
+            index = series.index
+            part = {
+                DATE_COLUMNS['start']: index.get_level_values('start').to_numpy(),
+                DATE_COLUMNS['end']: index.get_level_values('end').to_numpy(),
+                CODE_COLUMNS['indicator']: code,
+            }
+            for field in ('analytic_1', 'analytic_2', 'analytic_3', 'dzo'):
+                part[CODE_COLUMNS[field]] = self.store.dictionaries[field].decode(
+                    index.get_level_values(field).to_numpy())
+            part[SUM_COLUMN] = series.to_numpy()
+            parts.append(pd.DataFrame(part))
+        if not parts:
+            return pd.DataFrame(columns=list(DATE_COLUMNS.values()) + list(CODE_COLUMNS.values()) + [SUM_COLUMN])
+        return pd.concat(parts, ignore_index=True)
+
+    def stats(self) -> dict:
+        return {
+            'formulas': len(self.formulas),
+            'evaluations': self.evaluations,
+            'partial_evaluations': self.partial_evaluations,
+            'stale': len(self._stale),
+            'dirty': len(self._dirty),
+        }
+
+
+def _period_key(start, end):
+    # Период одним числом: дни начала и конца от 1970-01-01 (9999-12-31 - меньше 3 млн дней)
+    return start.astype('datetime64[D]').astype(np.int64) * 10_000_000 + end.astype('datetime64[D]').astype(np.int64)
+
+
+def _index_periods(index: pd.MultiIndex) -> np.ndarray:
+    return _period_key(index.get_level_values('start').to_numpy(), index.get_level_values('end').to_numpy())
+
+
+def _empty() -> pd.Series:
+    index = pd.MultiIndex.from_arrays(
+        [np.array([], dtype=np.int32), np.array([], dtype='datetime64[D]'), np.array([], dtype='datetime64[D]'),
+         np.array([], dtype=np.int32), np.array([], dtype=np.int32), np.array([], dtype=np.int32)],
+        names=KEY_FIELDS,
+    )
+    return pd.Series([], index=index, dtype=float)
@@ -1,10 +1,14 @@
 import flet as ft
 import theme.colors as colors
+from app_logging import get_logger, setup_logging
+
+log = get_logger('main')
 
 def main(page: ft.Page):
     page.title = "Показатели"
     page.bgcolor = colors.background_blue
-    page.scroll = ft.ScrollMode.ADAPTIVE
+    # Прокрутку выполняют таблицы экранов (VirtualTable), страница не прокручивается целиком
+    page.scroll = None
     
     user = page.client_storage.get("user")
     if user:
@@ -23,128 +27,89 @@ def main(page: ft.Page):
         return
     allow_admin_features = user.role == "Администратор УК"
 
-    def navigate_routes_drawer(e):
-        selected_route = e.control.selected_index if e else 0
+    # Маршрут -> (заголовок, конструктор экрана). Экраны импортируются при первом переходе
+    def indicators_screen():
+        from screens.indicators import IndicatorsScreen
+        return IndicatorsScreen(page, user)
+
+    def analytics_screen():
+        from screens.analytics import AnalyticsPage
+        return AnalyticsPage(page, user)
+
+    def analytics_types_screen():
+        from screens.analytics_types import AnalyticsTypesScreen
+        return AnalyticsTypesScreen(page, user)
+
+    def values_indicators_screen():
+        from screens.values_indicators import ValuesIndicatorsScreen
+        return ValuesIndicatorsScreen(page, user)
+
+    def dzos_screen():
+        from screens.dzos import DZOsScreen
+        return DZOsScreen(page)
+
+    def users_screen():
+        from screens.users import UsersScreen
+        return UsersScreen(page)
+
+    routes = {
+        "/indicators": ("Показатели", indicators_screen),
+        "/analytics": ("Аналитики", analytics_screen),
+        "/analytics_types": ("Виды аналитик", analytics_types_screen),
+        "/values_indicators": ("Значения показателей ДЗО", values_indicators_screen),
+    }
+    if allow_admin_features:
+        routes["/dzos"] = ("Дочерние зависимые общества", dzos_screen)
+        routes["/users"] = ("Пользователи", users_screen)
+    # Пункты меню в порядке отображения; у пользователя без прав пункты администратора скрыты
+    drawer_routes = list(routes) + ["/logout"]
+    current_screen = None
+
+    def logout():
+        page.client_storage.remove("user")
+        from screens.login_page import LoginPage
         page.controls.clear()
+        page.appbar = None
+        page.drawer = None
         page.floating_action_button = None
-        
-        if selected_route == 0:
-            from screens.indicators import IndicatorsScreen
-            page.title = "Показатели"
-            print("Navigate to Indicators Screen")
-            indicators = IndicatorsScreen(page, user)
-            page.add(
-                ft.Container(
-                    expand=True,
-                    content=indicators.build(),
-                )
-            )
-            page.appbar.title = ft.Text(page.title, color=colors.grey)
-            page.update()
-            page.drawer.open = False
-        elif selected_route == 1:
-            from screens.analytics import AnalyticsPage
-            page.title = "Аналитики"
-            analytics = AnalyticsPage(page, user)
-            print("Navigate to Analytics Screen")
-            page.add(
-                ft.Container(
-                    expand=True,
-                    content=analytics.build(),
-                )
-            )
-            page.appbar.title = ft.Text(page.title, color=colors.grey)
-            page.update()
-            page.drawer.open = False
-        elif selected_route == 2:
-            from screens.analytics_types import AnalyticsTypesScreen
-            page.title = "Виды аналитик"
-            analytics_types = AnalyticsTypesScreen(page, user)
-            print("Navigate to Analytics Types Screen")
-            page.add(
-                ft.Container(
-                    expand=True,
-                    content=analytics_types.build(),
-                )
-            )
-            page.appbar.title = ft.Text(page.title, color=colors.grey)
-            page.update()
-            page.drawer.open = False
-        elif selected_route == 3:
-            from screens.values_indicators import ValuesIndicatorsScreen
-            page.title = "Значения показателей ДЗО"
-            values_indicators = ValuesIndicatorsScreen(page, user)
-            print("Navigate to Values Indicators Screen")
-            page.add(
-                ft.Container(
-                    expand=True,
-                    content=values_indicators.build(),
-                )   
-            )
-            page.appbar.title = ft.Text(page.title, color=colors.grey)
-            page.update()
-            page.drawer.open = False
-        elif selected_route == 4:
-            if allow_admin_features:
-                from screens.dzos import DZOsScreen
-                page.title = "Дочерние зависимые общества"
-                dzos = DZOsScreen(page)
-                print("Navigate to DZOS Screen")
-                page.add(
-                    ft.Container(
-                        expand=True,
-                        content=dzos.build(),
-                    )   
-                )
-                page.appbar.title = ft.Text(page.title, color=colors.grey)
-                page.update()
-                page.drawer.open = False
-            else:
-                page.client_storage.remove("user")
-                from screens.login_page import LoginPage
-                page.controls.clear()
-                page.appbar = None
-                page.drawer = None
-                page.floating_action_button = None
-                page.add(
-                    ft.Container(
-                        expand=True,
-                        bgcolor=colors.background_blue,
-                        content=LoginPage(page).build(),
-                    )
-                )
-                page.update()
-        elif selected_route == 5:
-            from screens.users import UsersScreen
-            page.title = "Пользователи"
-            users = UsersScreen(page)
-            print("Navigate to Users Screen")
-            page.add(
-                ft.Container(
-                    expand=True,
-                    content=users.build(),
-                )   
+        page.add(
+            ft.Container(
+                expand=True,
+                bgcolor=colors.background_blue,
+                content=LoginPage(page).build(),
             )
-            page.appbar.title = ft.Text(page.title, color=colors.grey)
-            page.update()
-            page.drawer.open = False
-        elif selected_route == 6:
-            page.client_storage.remove("user")
-            from screens.login_page import LoginPage
-            page.controls.clear()
-            page.appbar = None
-            page.drawer = None
-            page.floating_action_button = None
-            page.add(
-                ft.Container(
-                    expand=True,
-                    bgcolor=colors.background_blue,
-                    content=LoginPage(page).build(),
-                )
+        )
+        page.update()
+
+    def show_route(route):
+        """Открыть экран маршрута сразу; данные экран догружает в фоне"""
+        nonlocal current_screen
+        if current_screen is not None:
+            # Загрузка ушедшего экрана отменяется вместе с запросом на сервере
+            current_screen.dispose()
+            current_screen = None
+        if route == "/logout":
+            logout()
+            return
+        title, create_screen = routes.get(route, routes["/indicators"])
+        page.controls.clear()
+        page.floating_action_button = None
+        page.title = title
+        log.debug("Переход", route=route)
+        current_screen = create_screen()
+        page.add(
+            ft.Container(
+                expand=True,
+                content=current_screen.build(),
             )
-            page.update()
-            
-        
+        )
+        page.appbar.title = ft.Text(page.title, color=colors.grey)
+        page.update()
+
+    def navigate_routes_drawer(e):
+        selected_route = e.control.selected_index if e else 0
+        page.drawer.open = False
+        page.go(drawer_routes[selected_route])
 
     drawer_theme = ft.NavigationDrawerTheme(
         label_text_style=ft.TextStyle(color = colors.background_blue),
@@ -182,64 +147,6 @@ def main(page: ft.Page):
         bgcolor=colors.fade_blue,
     )
 
-    def navigate_routes(e):
-        route = page.route
-        page.controls.clear()
-        page.floating_action_button = None
-        
-        if route == "/indicators":
-            from screens.indicators import IndicatorsScreen
-            page.title = "Показатели"
-            print("Navigate to Indicators Screen")
-            indicators = IndicatorsScreen(page, user)
-            page.add(
-                ft.Container(
-                    expand=True,
-                    content=indicators.build(),
-                )
-            )
-            page.appbar.title = ft.Text(page.title, color=colors.grey)
-            page.update()
-        elif route == "/analytics":
-            from screens.analytics import AnalyticsPage
-            page.title = "Аналитики"
-            analytics = AnalyticsPage(page, user)
-            print("Navigate to Analytics Screen")
-            page.add(
-                ft.Container(
-                    expand=True,
-                    content=analytics.build(),
-                )
-            )
-            page.appbar.title = ft.Text(page.title, color=colors.grey)
-            page.update()
-        elif route == "/analytics_types":
-            from screens.analytics_types import AnalyticsTypesScreen
-            page.title = "Виды аналитик"
-            analytics_types = AnalyticsTypesScreen(page, user)
-            print("Navigate to Analytics Types Screen")
-            page.add(
-                ft.Container(
-                    expand=True,
-                    content=analytics_types.build(),
-                )
-            )
-            page.appbar.title = ft.Text(page.title, color=colors.grey)
-            page.update()
-        elif route == "/values_indicators":
-            from screens.values_indicators import ValuesIndicatorsScreen
-            page.title = "Значения показателей ДЗО"
-            values_indicators = ValuesIndicatorsScreen(page)
-            print("Navigate to Values Indicators Screen")
-            page.add(
-                ft.Container(
-                    expand=True,
-                    content=values_indicators.build(),
-                )   
-            )
-            page.appbar.title = ft.Text(page.title, color=colors.grey)
-            page.update()
-    
     nav_drawer.on_change = navigate_routes_drawer
     page.drawer = nav_drawer
     page.appbar = ft.AppBar(
@@ -252,9 +159,10 @@ def main(page: ft.Page):
             bgcolor=colors.dark_blue
         )
     
-    page.on_route_change = lambda e: navigate_routes(None)
+    page.on_route_change = lambda e: show_route(page.route)
     page.go("/indicators")
     page.update()
 
 if __name__ == "__main__":
+    setup_logging()
     ft.app(target=main)
\ No newline at end of file
@@ -0,0 +1,220 @@
+import json
+import os
+import re
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from functools import lru_cache
+
+# Верхние границы корзин гистограммы времени выполнения, секунды (последняя корзина - все остальное)
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_COMMENTS = re.compile(r'--[^\n]*|/\*.*?\*/', re.S)
+_STRINGS = re.compile(r"'(?:[^']|'')*'")
+_NUMBERS = re.compile(r'(?<![\w"])-?\d+(?:\.\d+)?(?![\w"])')
+_PLACEHOLDERS = re.compile(r'%\(\w+\)s|%s')
+_LISTS = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+_SPACES = re.compile(r'\s+')
+
+# Модули, кадры которых пропускаются при поиске места вызова
+_INTERNAL_FILES = {'database.py', 'query_stats.py', 'contextlib.py', 'threading.py'}
+
+
+@lru_cache(maxsize=1024)
+def fingerprint(query: str) -> str:
+    """Отпечаток запроса: без комментариев, литералов и параметров, с одинарными пробелами.
+    Запросы, различающиеся только значениями, получают один отпечаток"""
+    text = _COMMENTS.sub(' ', query)
+    text = _STRINGS.sub('?', text)
+    text = _PLACEHOLDERS.sub('?', text)
+    text = _NUMBERS.sub('?', text)
+    text = _LISTS.sub('(...)', text)
+    return _SPACES.sub(' ', text).strip()
+
+
+def call_site() -> dict:
+    """Место вызова запроса: метод Database и первый кадр вне слоя доступа к БД (экран, модуль)"""
+    method = None
+    origin = None
+    frame = sys._getframe(1)
+    while frame is not None and origin is None:
+        filename = os.path.basename(frame.f_code.co_filename)
+        name = frame.f_code.co_name
+        if filename == 'database.py':
+            if method is None and not name.startswith(('execute_', '_')):
+                method = name
+        elif filename not in _INTERNAL_FILES:
+            origin = f'{filename}:{frame.f_lineno} {name}'
+        frame = frame.f_back
+    return {'method': method, 'origin': origin}
+
+
+class _Statement:
+    """Накопленная статистика одного отпечатка запроса"""
+    __slots__ = ('kind', 'calls', 'errors', 'rows', 'seconds', 'max_seconds', 'buckets')
+
+    def __init__(self, kind: str):
+        self.kind = kind
+        self.calls = 0
+        self.errors = 0
+        self.rows = 0
+        self.seconds = 0.0
+        self.max_seconds = 0.0
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+
+
+class _Measurement:
+    __slots__ = ('rows',)
+
+    def __init__(self):
+        self.rows = 0
+
+
+class QueryStats:
+    """Статистика запросов процесса по отпечаткам: число вызовов, ошибки, строки, гистограмма времени,
+    и журнал медленных запросов с местом вызова"""
+
+    def __init__(self, slow_seconds: float = 0.5, slow_log_size: int = 200, enabled: bool = True):
+        self.slow_seconds = slow_seconds
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._statements = {}              # отпечаток -> _Statement
+        self._slow_log = deque(maxlen=slow_log_size)
+        self._started = time.time()
+
+    @contextmanager
+    def measure(self, kind: str, query: str):
+        """Замерить выполнение запроса; в measurement.rows блок записывает число строк"""
+        measurement = _Measurement()
+        if not self.enabled:
+            yield measurement
+            return
+        started = time.perf_counter()
+        failed = False
+        try:
+            yield measurement
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            self.record(kind, query, time.perf_counter() - started, measurement.rows, failed)
+
+    def record(self, kind: str, query: str, seconds: float, rows: int = 0, failed: bool = False):
+        key = fingerprint(query)
+        bucket = _bucket(seconds)
+        with self._lock:
+            statement = self._statements.get(key)
+            if statement is None:
+                statement = self._statements[key] = _Statement(kind)
+            statement.calls += 1
+            statement.errors += failed
+            statement.rows += rows
+            statement.seconds += seconds
+            statement.max_seconds = max(statement.max_seconds, seconds)
+            statement.buckets[bucket] += 1
+        if seconds >= self.slow_seconds:
+            # Место вызова ищется только для медленных запросов: обход стека не бесплатный
+            entry = {
+                'time': time.time(),
+                'kind': kind,
+                'fingerprint': key,
+                'seconds': seconds,
+                'rows': rows,
+                'failed': failed,
+                **call_site(),
+            }
+            with self._lock:
+                self._slow_log.append(entry)
+
+    def reset(self):
+        with self._lock:
+            self._statements.clear()
+            self._slow_log.clear()
+            self._started = time.time()
+
+    def snapshot(self) -> dict:
+        """Снимок статистики: запросы по убыванию суммарного времени и журнал медленных запросов"""
+        with self._lock:
+            statements = [
+                {
+                    'fingerprint': key,
+                    'kind': statement.kind,
+                    'calls': statement.calls,
+                    'errors': statement.errors,
+                    'rows': statement.rows,
+                    'seconds': statement.seconds,
+                    'mean_seconds': statement.seconds / statement.calls,
+                    'max_seconds': statement.max_seconds,
+                    'buckets': list(statement.buckets),
+                }
+                for key, statement in self._statements.items()
+            ]
+            slow_log = list(self._slow_log)
+            started = self._started
+        for statement in statements:
+            # Граница корзины не больше самого долгого вызова
+            for name, q in (('p50_seconds', 0.5), ('p95_seconds', 0.95), ('p99_seconds', 0.99)):
+                statement[name] = min(_quantile(statement['buckets'], q), statement['max_seconds'])
+        statements.sort(key=lambda statement: statement['seconds'], reverse=True)
+        return {
+            'since': started,
+            'buckets': list(LATENCY_BUCKETS),
+            'slow_seconds': self.slow_seconds,
+            'statements': statements,
+            'slow_log': slow_log,
+        }
+
+    def to_json(self, indent: int = None) -> str:
+        return json.dumps(self.snapshot(), ensure_ascii=False, indent=indent)
+
+    def to_prometheus(self) -> str:
+        """Снимок в текстовом формате Prometheus: гистограмма, ошибки и строки по отпечаткам"""
+        snapshot = self.snapshot()
+        lines = [
+            '# HELP db_query_duration_seconds Query latency by statement fingerprint',
+            '# TYPE db_query_duration_seconds histogram',
+        ]
+        for statement in snapshot['statements']:
+            labels = f'fingerprint="{_escape(statement["fingerprint"])}",kind="{statement["kind"]}"'
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS + (float('inf'),), statement['buckets']):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append(f'db_query_duration_seconds_bucket{{{labels},le="{le}"}} {cumulative}')
+            lines.append(f'db_query_duration_seconds_sum{{{labels}}} {statement["seconds"]}')
+            lines.append(f'db_query_duration_seconds_count{{{labels}}} {statement["calls"]}')
+        for name, field, help_text in (
+            ('db_query_errors_total', 'errors', 'Failed queries by statement fingerprint'),
+            ('db_query_rows_total', 'rows', 'Rows returned or affected by statement fingerprint'),
+        ):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} counter')
+            for statement in snapshot['statements']:
+                labels = f'fingerprint="{_escape(statement["fingerprint"])}",kind="{statement["kind"]}"'
+                lines.append(f'{name}{{{labels}}} {statement[field]}')
+        return '\n'.join(lines) + '\n'
+
+
+def _bucket(seconds: float) -> int:
+    for index, bound in enumerate(LATENCY_BUCKETS):
+        if seconds <= bound:
+            return index
+    return len(LATENCY_BUCKETS)
+
+
+def _quantile(buckets: list, q: float):
+    """Оценка квантиля по гистограмме: верхняя граница корзины, в которую он попадает"""
+    total = sum(buckets)
+    rank = q * total
+    cumulative = 0
+    for bound, count in zip(LATENCY_BUCKETS + (float('inf'),), buckets):
+        cumulative += count
+        if cumulative >= rank:
+            return bound
+    return float('inf')
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', ' ')
@@ -0,0 +1,164 @@
+import select
+import threading
+
+import psycopg2
+from psycopg2 import extensions
+
+from app_logging import get_logger
+from data_classes import Analytic, AnalyticType, DZO, Indicator
+from validity_index import ValidityIndex
+
+# Канал PostgreSQL, в который Database сообщает об изменении справочника (payload - имя таблицы)
+NOTIFY_CHANNEL = 'reference_changed'
+
+# Таблица -> (запрос, класс записи, ключ записи)
+REFERENCE_TABLES = {
+    'Виды аналитики': (
+        'SELECT * FROM public."Виды аналитики" ORDER BY "Код вида аналитики" ASC',
+        AnalyticType,
+        lambda analytic_type: analytic_type.id,
+    ),
+    'Аналитики': (
+        'SELECT * FROM public."Аналитики" ORDER BY "Код вида аналитики" ASC, "Код аналитики" ASC',
+        Analytic,
+        lambda analytic: (analytic.id_analytic_type, analytic.id),
+    ),
+    'Показатели': (
+        'SELECT * FROM public."Показатели" ORDER BY "Код показателя" ASC',
+        Indicator,
+        lambda indicator: indicator.id,
+    ),
+    'ДЗО': (
+        'SELECT * FROM public."ДЗО" ORDER BY "Идентификатор ДЗО" ASC',
+        DZO,
+        # Идентификатор ДЗО приходит из полей ввода строкой
+        lambda dzo: str(dzo.id),
+    ),
+}
+# Справочники с периодом действия записей
+VALIDITY_TABLES = ('Аналитики', 'Показатели')
+
+log = get_logger('reference_cache')
+
+
+class ReferenceCache:
+    """Кэш справочников в памяти процесса: таблица загружается целиком при первом обращении
+    и сбрасывается при записи через Database или по уведомлению из другого процесса"""
+
+    def __init__(self, execute_query):
+        self._execute_query = execute_query
+        self._lock = threading.Lock()
+        self._tables = {}                                   # таблица -> (записи по порядку, {ключ: запись})
+        self._validity = {}                                 # таблица -> (записи, ValidityIndex по ним)
+        self._versions = {table: 0 for table in REFERENCE_TABLES}
+        self._stop = threading.Event()
+        self._listener = None
+
+    def rows(self, table: str, execute_query=None) -> list:
+        """Все записи справочника в порядке ключа (новый список на каждый вызов).
+        execute_query - чем читать таблицу, если ее нет в кэше (по умолчанию - собственным Database кэша)"""
+        return list(self._load(table, execute_query)[0])
+
+    def get(self, table: str, key, execute_query=None):
+        """Запись справочника по ключу за O(1) или None"""
+        return self._load(table, execute_query)[1].get(key)
+
+    def validity(self, table: str, execute_query=None) -> ValidityIndex:
+        """Индекс периодов действия записей справочника; строится по кэшированным записям и сбрасывается вместе с ними"""
+        if table not in VALIDITY_TABLES:
+            raise ValueError(f"У справочника '{table}' нет периодов действия")
+        records = self._load(table, execute_query)[0]
+        with self._lock:
+            cached = self._validity.get(table)
+        if cached is not None and cached[0] is records:
+            return cached[1]
+        index = ValidityIndex(records, REFERENCE_TABLES[table][2])
+        with self._lock:
+            self._validity[table] = (records, index)
+        return index
+
+    def invalidate(self, table: str = None):
+        """Сбросить таблицу (или все таблицы); следующее обращение перечитает ее из БД"""
+        with self._lock:
+            tables = [table] if table in REFERENCE_TABLES else list(REFERENCE_TABLES)
+            for name in tables:
+                self._versions[name] += 1
+                self._tables.pop(name, None)
+                self._validity.pop(name, None)
+
+    def _load(self, table: str, execute_query=None):
+        with self._lock:
+            cached = self._tables.get(table)
+            version = self._versions[table]
+        if cached is not None:
+            return cached
+        query, record_class, key = REFERENCE_TABLES[table]
+        records = (execute_query or self._execute_query)(query, row_factory=record_class.row_factory)
+        cached = (records, {key(record): record for record in records})
+        with self._lock:
+            # Если таблицу сбросили во время чтения, результат не сохраняем
+            if self._versions[table] == version:
+                self._tables[table] = cached
+        return cached
+
+    def using(self, execute_query) -> 'ReferenceView':
+        """Кэш, который читает недостающие таблицы через execute_query вызывающего Database"""
+        return ReferenceView(self, execute_query)
+
+    def start_listener(self, connect_kwargs: dict):
+        """Запустить фоновый поток LISTEN, сбрасывающий кэш по изменениям из других процессов"""
+        if self._listener is not None:
+            return
+        self._listener = threading.Thread(
+            target=self._listen, args=(dict(connect_kwargs),), name='reference-cache-listener', daemon=True
+        )
+        self._listener.start()
+
+    def stop_listener(self):
+        self._stop.set()
+
+    def _listen(self, connect_kwargs: dict):
+        while not self._stop.is_set():
+            connection = None
+            try:
+                connection = psycopg2.connect(**connect_kwargs)
+                connection.set_isolation_level(extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+                with connection.cursor() as cursor:
+                    cursor.execute(f'LISTEN {NOTIFY_CHANNEL}')
+                # Пока слушатель не был подключен, уведомления могли быть пропущены
+                self.invalidate()
+                while not self._stop.is_set():
+                    if select.select([connection], [], [], 5.0) == ([], [], []):
+                        continue
+                    connection.poll()
+                    while connection.notifies:
+                        notify = connection.notifies.pop(0)
+                        self.invalidate(notify.payload or None)
+            except Exception as e:
+                log.warning("Ошибка прослушивания изменений справочников", error=str(e))
+                self.invalidate()
+                self._stop.wait(5.0)
+            finally:
+                if connection is not None:
+                    connection.close()
+
+
+class ReferenceView:
+    """Общий кэш справочников глазами одного Database: таблицу, которой нет в кэше, читает execute_query
+    этого Database, поэтому ее загрузку прерывает его cancel()"""
+
+    def __init__(self, cache: ReferenceCache, execute_query):
+        self.cache = cache
+        self._execute_query = execute_query
+
+    def rows(self, table: str) -> list:
+        return self.cache.rows(table, self._execute_query)
+
+    def get(self, table: str, key):
+        return self.cache.get(table, key, self._execute_query)
+
+    def validity(self, table: str) -> ValidityIndex:
+        return self.cache.validity(table, self._execute_query)
+
+    def invalidate(self, table: str = None):
+        self.cache.invalidate(table)
@@ -0,0 +1,291 @@
+"""DDL объектов БД, которыми управляет приложение"""
+
+VALUES_TABLE = 'Значения показателей ДЗО'
+
+# ---------- Основные таблицы ----------
+
+# Структура таблиц, с которыми работает приложение; нужна для развертывания пустой БД (бенчмарки, тестовые стенды)
+BASE_DDL = (
+    'CREATE EXTENSION IF NOT EXISTS pgcrypto',
+    '''
+    CREATE TABLE IF NOT EXISTS public."ДЗО" (
+        "Идентификатор ДЗО" serial PRIMARY KEY,
+        "Наименование" varchar,
+        "Адрес" varchar
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS public."Виды аналитики" (
+        "Код вида аналитики" varchar PRIMARY KEY,
+        "Вид аналитики" varchar
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS public."Аналитики" (
+        "Код вида аналитики" varchar NOT NULL REFERENCES public."Виды аналитики" ("Код вида аналитики"),
+        "Код аналитики" varchar NOT NULL,
+        "Аналитика" varchar,
+        "Дата начала периода" date,
+        "Дата конца периода" date,
+        PRIMARY KEY ("Код вида аналитики", "Код аналитики")
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS public."Показатели" (
+        "Код показателя" varchar PRIMARY KEY,
+        "Показатель" varchar,
+        "Код вида аналитики 1" varchar REFERENCES public."Виды аналитики" ("Код вида аналитики"),
+        "Код вида аналитики 2" varchar REFERENCES public."Виды аналитики" ("Код вида аналитики"),
+        "Код вида аналитики 3" varchar REFERENCES public."Виды аналитики" ("Код вида аналитики"),
+        "Дата начала периода" date,
+        "Дата конца периода" date
+    )
+    ''',
+    f'''
+    CREATE TABLE IF NOT EXISTS public."{VALUES_TABLE}" (
+        "Дата начала периода" date,
+        "Дата окончания периода" date,
+        "Код показателя" varchar REFERENCES public."Показатели" ("Код показателя"),
+        "Код аналитики 1" varchar,
+        "Код аналитики 2" varchar,
+        "Код аналитики 3" varchar,
+        "Сумма" numeric,
+        "ДЗО" integer REFERENCES public."ДЗО" ("Идентификатор ДЗО")
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS public."Пользователи" (
+        "Идентификационный номер" serial PRIMARY KEY,
+        "ФИО" varchar,
+        "Роль" varchar,
+        "Логин" varchar UNIQUE,
+        "Пароль" varchar,
+        "ДЗО" integer REFERENCES public."ДЗО" ("Идентификатор ДЗО")
+    )
+    ''',
+)
+
+# ---------- Индексы значений ----------
+
+# Ключ значения. NULLS NOT DISTINCT (PostgreSQL 15+) нужен, чтобы пустые аналитики 2/3 участвовали в уникальности;
+# условия "Код аналитики 2" IS NULL в поиске по ключу тоже выполняются по этому индексу
+VALUES_KEY_INDEX = f'{VALUES_TABLE}_ключ'
+VALUES_KEY_INDEX_DDL = f'''
+    CREATE UNIQUE INDEX IF NOT EXISTS "{VALUES_KEY_INDEX}"
+    ON public."{VALUES_TABLE}" ("Код показателя", "Дата начала периода", "Дата окончания периода",
+                                 "Код аналитики 1", "Код аналитики 2", "Код аналитики 3")
+    NULLS NOT DISTINCT
+'''
+
+VALUES_INDEX_DDL = (
+    # Порядок постраничной выборки (Database.VALUES_PAGE_KEY) и фильтры по датам периода
+    f'''
+    CREATE INDEX IF NOT EXISTS "{VALUES_TABLE}_порядок"
+    ON public."{VALUES_TABLE}" ("Дата начала периода", "Дата окончания периода", "Код показателя",
+                                 COALESCE("Код аналитики 1", ''), COALESCE("Код аналитики 2", ''),
+                                 COALESCE("Код аналитики 3", ''))
+    ''',
+    # Фильтр по ДЗО и проверка ссылок при удалении ДЗО
+    f'''
+    CREATE INDEX IF NOT EXISTS "{VALUES_TABLE}_ДЗО"
+    ON public."{VALUES_TABLE}" ("ДЗО", "Дата начала периода")
+    ''',
+)
+
+# ---------- Итоги значений по показателю, ДЗО и периоду ----------
+
+ROLLUP_TABLE = 'Итоги значений'
+# Периоды, значения которых менялись после последнего пересчета итогов
+ROLLUP_QUEUE_TABLE = 'Итоги значений: очередь'
+ROLLUP_LOCK_KEY = 'Итоги значений'
+
+# Колонки ключа итогов называются как в таблице значений: фильтры и измерения агрегации подходят к обеим.
+# Даты периода обязательны при вводе и импорте; значения без периода в итоги не попадают
+ROLLUP_DIMENSIONS = ('indicator', 'dzo', 'month', 'quarter', 'year')
+ROLLUP_FILTERS = ('indicator_id', 'dzo_id', 'date_from', 'date_to')
+# Меры агрегации по строкам итогов; все меры складываются из итогов периодов
+ROLLUP_MEASURES = {
+    'sum': 'sum(v."Сумма")',
+    'count': 'COALESCE(sum(v."Количество"), 0)::bigint',
+    'min': 'min(v."Минимум")',
+    'max': 'max(v."Максимум")',
+}
+
+ROLLUP_DDL = (
+    f'''
+    CREATE TABLE IF NOT EXISTS public."{ROLLUP_TABLE}" (
+        "Дата начала периода" date NOT NULL,
+        "Дата окончания периода" date NOT NULL,
+        "Код показателя" varchar,
+        "ДЗО" integer,
+        "Сумма" numeric,
+        "Количество" bigint NOT NULL,
+        "Минимум" numeric,
+        "Максимум" numeric
+    )
+    ''',
+    f'''
+    CREATE UNIQUE INDEX IF NOT EXISTS "{ROLLUP_TABLE}_ключ"
+    ON public."{ROLLUP_TABLE}" ("Дата начала периода", "Дата окончания периода", "Код показателя", "ДЗО")
+    NULLS NOT DISTINCT
+    ''',
+    f'''
+    CREATE TABLE IF NOT EXISTS public."{ROLLUP_QUEUE_TABLE}" (
+        "Дата начала периода" date NOT NULL,
+        "Дата окончания периода" date NOT NULL,
+        PRIMARY KEY ("Дата начала периода", "Дата окончания периода")
+    )
+    ''',
+    # Триггеры уровня оператора с переходными таблицами: одна вставка в очередь на оператор, а не на строку
+    f'''
+    CREATE OR REPLACE FUNCTION public."{ROLLUP_TABLE}: отметить периоды"() RETURNS trigger
+    LANGUAGE plpgsql AS $$
+    BEGIN
+        IF TG_OP = 'TRUNCATE' THEN
+            DELETE FROM public."{ROLLUP_TABLE}";
+            DELETE FROM public."{ROLLUP_QUEUE_TABLE}";
+            RETURN NULL;
+        END IF;
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            INSERT INTO public."{ROLLUP_QUEUE_TABLE}" ("Дата начала периода", "Дата окончания периода")
+            SELECT DISTINCT "Дата начала периода", "Дата окончания периода" FROM new_rows
+            WHERE "Дата начала периода" IS NOT NULL AND "Дата окончания периода" IS NOT NULL
+            ON CONFLICT DO NOTHING;
+        END IF;
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            INSERT INTO public."{ROLLUP_QUEUE_TABLE}" ("Дата начала периода", "Дата окончания периода")
+            SELECT DISTINCT "Дата начала периода", "Дата окончания периода" FROM old_rows
+            WHERE "Дата начала периода" IS NOT NULL AND "Дата окончания периода" IS NOT NULL
+            ON CONFLICT DO NOTHING;
+        END IF;
+        RETURN NULL;
+    END
+    $$
+    ''',
+    f'DROP TRIGGER IF EXISTS "{ROLLUP_TABLE}: вставка" ON public."{VALUES_TABLE}"',
+    f'''
+    CREATE TRIGGER "{ROLLUP_TABLE}: вставка" AFTER INSERT ON public."{VALUES_TABLE}"
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION public."{ROLLUP_TABLE}: отметить периоды"()
+    ''',
+    f'DROP TRIGGER IF EXISTS "{ROLLUP_TABLE}: изменение" ON public."{VALUES_TABLE}"',
+    f'''
+    CREATE TRIGGER "{ROLLUP_TABLE}: изменение" AFTER UPDATE ON public."{VALUES_TABLE}"
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION public."{ROLLUP_TABLE}: отметить периоды"()
+    ''',
+    f'DROP TRIGGER IF EXISTS "{ROLLUP_TABLE}: удаление" ON public."{VALUES_TABLE}"',
+    f'''
+    CREATE TRIGGER "{ROLLUP_TABLE}: удаление" AFTER DELETE ON public."{VALUES_TABLE}"
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION public."{ROLLUP_TABLE}: отметить периоды"()
+    ''',
+    f'DROP TRIGGER IF EXISTS "{ROLLUP_TABLE}: очистка" ON public."{VALUES_TABLE}"',
+    f'''
+    CREATE TRIGGER "{ROLLUP_TABLE}: очистка" AFTER TRUNCATE ON public."{VALUES_TABLE}"
+    FOR EACH STATEMENT EXECUTE FUNCTION public."{ROLLUP_TABLE}: отметить периоды"()
+    ''',
+    # Итоги строятся заново по всем периодам при первом пересчете
+    f'''
+    INSERT INTO public."{ROLLUP_QUEUE_TABLE}" ("Дата начала периода", "Дата окончания периода")
+    SELECT DISTINCT "Дата начала периода", "Дата окончания периода" FROM public."{VALUES_TABLE}"
+    WHERE "Дата начала периода" IS NOT NULL AND "Дата окончания периода" IS NOT NULL
+    ON CONFLICT DO NOTHING
+    ''',
+)
+
+# Пересчет: забрать периоды из очереди, удалить их итоги и собрать заново только по этим периодам
+ROLLUP_TAKE_QUEUE = f'''
+    DELETE FROM public."{ROLLUP_QUEUE_TABLE}"
+    RETURNING "Дата начала периода", "Дата окончания периода"
+'''
+ROLLUP_DELETE_PERIODS = f'''
+    DELETE FROM public."{ROLLUP_TABLE}" r
+    USING unnest(%s::date[], %s::date[]) AS p("Дата начала периода", "Дата окончания периода")
+    WHERE r."Дата начала периода" = p."Дата начала периода"
+      AND r."Дата окончания периода" = p."Дата окончания периода"
+'''
+ROLLUP_INSERT_PERIODS = f'''
+    INSERT INTO public."{ROLLUP_TABLE}"
+        ("Дата начала периода", "Дата окончания периода", "Код показателя", "ДЗО",
+         "Сумма", "Количество", "Минимум", "Максимум")
+    SELECT v."Дата начала периода", v."Дата окончания периода", v."Код показателя", v."ДЗО",
+           sum(v."Сумма"), count(*), min(v."Сумма"), max(v."Сумма")
+    FROM public."{VALUES_TABLE}" v
+    JOIN unnest(%s::date[], %s::date[]) AS p("Дата начала периода", "Дата окончания периода")
+      ON v."Дата начала периода" = p."Дата начала периода"
+     AND v."Дата окончания периода" = p."Дата окончания периода"
+    GROUP BY v."Дата начала периода", v."Дата окончания периода", v."Код показателя", v."ДЗО"
+'''
+
+
+def rollup_fits(dimensions, measures, filters: dict = None) -> bool:
+    """Можно ли ответить на запрос агрегации по итогам: без аналитик в измерениях и фильтрах"""
+    return (
+        all(name in ROLLUP_DIMENSIONS for name in dimensions)
+        and all(name in ROLLUP_MEASURES for name in measures)
+        and all(name in ROLLUP_FILTERS for name, value in (filters or {}).items()
+                if value is not None and value != '' and value != [])
+    )
+
+
+# ---------- Группы ДЗО для консолидации ----------
+
+DZO_GROUPS_TABLE = 'Группы ДЗО'
+DZO_GROUP_MEMBERS_TABLE = 'Состав групп ДЗО'
+
+DZO_GROUPS_DDL = (
+    f'''
+    CREATE TABLE IF NOT EXISTS public."{DZO_GROUPS_TABLE}" (
+        "Идентификатор группы" serial PRIMARY KEY,
+        "Наименование" varchar NOT NULL,
+        "Родительская группа" integer REFERENCES public."{DZO_GROUPS_TABLE}" ("Идентификатор группы") ON DELETE CASCADE
+    )
+    ''',
+    f'''
+    CREATE TABLE IF NOT EXISTS public."{DZO_GROUP_MEMBERS_TABLE}" (
+        "Идентификатор группы" integer NOT NULL
+            REFERENCES public."{DZO_GROUPS_TABLE}" ("Идентификатор группы") ON DELETE CASCADE,
+        "ДЗО" integer NOT NULL REFERENCES public."ДЗО" ("Идентификатор ДЗО") ON DELETE CASCADE,
+        PRIMARY KEY ("Идентификатор группы", "ДЗО")
+    )
+    ''',
+)
+
+# ---------- Формулы производных показателей ----------
+
+FORMULAS_TABLE = 'Формулы показателей'
+
+FORMULAS_DDL = (
+    f'''
+    CREATE TABLE IF NOT EXISTS public."{FORMULAS_TABLE}" (
+        "Код показателя" varchar PRIMARY KEY
+            REFERENCES public."Показатели" ("Код показателя") ON DELETE CASCADE,
+        "Формула" text NOT NULL
+    )
+    ''',
+)
+
+# ---------- Версии схемы ----------
+
+SCHEMA_VERSIONS_TABLE = 'Версии схемы'
+SCHEMA_VERSIONS_LOCK_KEY = 'Версии схемы'
+
+SCHEMA_VERSIONS_DDL = f'''
+    CREATE TABLE IF NOT EXISTS public."{SCHEMA_VERSIONS_TABLE}" (
+        "Версия" integer PRIMARY KEY,
+        "Описание" varchar NOT NULL,
+        "Дата применения" timestamptz NOT NULL DEFAULT now()
+    )
+'''
+
+# Версии схемы по возрастанию: (версия, описание, команды). Уже примененные версии не меняются - только новые в конец.
+# Команды идемпотентны, поэтому на БД, развернутой до появления версий, они проходят поверх существующих объектов.
+# Итоги значений (ROLLUP_DDL) не входят в версии: это необязательная настройка, см. Database.install_rollups
+MIGRATIONS = (
+    (1, 'Основные таблицы', BASE_DDL),
+    (2, 'Уникальный ключ значений показателей', (VALUES_KEY_INDEX_DDL,)),
+    (3, 'Индексы значений: порядок страниц, периоды, ДЗО', VALUES_INDEX_DDL),
+    (4, 'Группы ДЗО', DZO_GROUPS_DDL),
+    (5, 'Формулы показателей', FORMULAS_DDL),
+)
@@ -0,0 +1,61 @@
+import threading
+
+from app_logging import get_logger
+from database import CancelScope
+
+log = get_logger('screen_loader')
+
+
+class ScreenLoader:
+    """Загрузка данных экрана в фоновом потоке страницы.
+    Новая загрузка вытесняет предыдущую: ее запрос прерывается на сервере, а результат отбрасывается.
+    Прерываются только запросы самой загрузки: сохранение на том же Database не затрагивается"""
+
+    def __init__(self, page, db):
+        self.page = page
+        self.db = db
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._scope = None
+        self.loading = False
+
+    def start(self, load, apply, on_error=None):
+        """Выполнить load() в фоне и передать результат в apply(result) с обновлением страницы"""
+        scope = CancelScope()
+        with self._lock:
+            self._generation += 1
+            generation = self._generation
+            superseded = self._scope if self.loading else None
+            self._scope = scope
+            self.loading = True
+        if superseded is not None:
+            self.db.cancel(superseded)
+        self.page.run_thread(self._run, generation, scope, load, apply, on_error)
+
+    def cancel(self):
+        """Отменить текущую загрузку, например при уходе с экрана"""
+        with self._lock:
+            self._generation += 1
+            scope = self._scope if self.loading else None
+            self.loading = False
+        if scope is not None:
+            self.db.cancel(scope)
+
+    def _run(self, generation: int, scope: CancelScope, load, apply, on_error):
+        error = None
+        try:
+            with self.db.scoped(scope):
+                result = load()
+        except Exception as e:
+            result, error = None, e
+        with self._lock:
+            if generation != self._generation:
+                return
+            self.loading = False
+        if error is None:
+            apply(result)
+        elif on_error is not None:
+            on_error(error)
+        else:
+            log.error("Ошибка загрузки данных экрана", exc_info=error)
+        self.page.update()
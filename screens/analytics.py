@@ -3,6 +3,8 @@ import theme.colors as colors
 from data_classes import Analytic
 from database import Database
 from dialog_manager import DialogManager
+from screen_loader import ScreenLoader
+from virtual_table import VirtualTable
 
 class AnalyticsPage(ft.Page):
     def __init__(self, page, user):
@@ -10,9 +12,11 @@ class AnalyticsPage(ft.Page):
         self.page = page
         self.db = Database()
         self.db.connect()
-        self.analytics = self.db.get_all_analytics()
+        # Данные загружаются в фоне после build(), до этого таблица показывает заглушку
+        self.analytics = []
+        self.loader = ScreenLoader(page, self.db)
         self.body = None
-        self.rows = []
+        self.table = None
 
     def build(self):
         add_fab = ft.FloatingActionButton(
@@ -30,19 +34,15 @@ class AnalyticsPage(ft.Page):
                 ft.Container(width=40)
             ]
         )
-        self.rows = [ft.Container(content=self.display_content(analytic, None)) for analytic in self.analytics]
-        for i, analytic in enumerate(self.analytics):
-            self.rows[i].content = self.display_content(analytic, self.rows[i])
-
-        self.page.floating_action_button = add_fab
-        self.body = ft.Column(
-            controls=[
-                table_header,
-                ft.Divider(color=colors.grey),
-                *self.rows,
-                ft.Container(height=50)
-            ]
+        self.table = VirtualTable(
+            table_header,
+            self.display_content,
+            key=lambda a: (a.id_analytic_type or '', a.id or ''),
+            reload=self.refresh,
         )
+        self.page.floating_action_button = add_fab
+        self.body = self.table.build()
+        self.refresh()
         return self.body
 
     def add_dialog(self):
@@ -91,9 +91,9 @@ class AnalyticsPage(ft.Page):
                 "Код вида аналитики": id_analytic_type,
                 "Аналитика": analytic_name,
             })
-            self.db.create_analytic(analytic)
+            analytic = self.db.create_analytic(analytic)
             self.show_message("Аналитика успешно добавлена", False)
-            self.refresh()
+            self.table.apply(lambda: self.table.insert(analytic))
         except Exception as exc:
             self.show_message(f"Ошибка добавления аналитики: {exc}", True)
 
@@ -104,14 +104,21 @@ class AnalyticsPage(ft.Page):
             DialogManager.show_success_dialog(self.page, "Успех", text)
 
     def refresh(self):
-        self.analytics = self.db.get_all_analytics()
-        self.rows = [ft.Container(content=self.display_content(analytic, None)) for analytic in self.analytics]
-        for i, analytic in enumerate(self.analytics):
-            self.rows[i].content = self.display_content(analytic, self.rows[i])
-        header = self.body.controls[0] if self.body and len(self.body.controls) > 0 else None
-        divider = ft.Divider(color=colors.grey)
-        self.body.controls = [self.body.controls[0], divider, *self.rows] if header else [divider, *self.rows]
-        self.page.update()
+        """Перечитать записи в фоне; таблица заполняется по окончании загрузки"""
+        self.table.show_skeleton()
+        self.loader.start(self.db.get_all_analytics, self.show_analytics, self.show_load_error)
+
+    def show_analytics(self, analytics):
+        self.analytics = analytics
+        self.table.set_items(self.analytics)
+
+    def show_load_error(self, exc):
+        self.table.set_items([])
+        self.show_message(f"Ошибка загрузки аналитик: {exc}", True)
+
+    def dispose(self):
+        """Прекратить загрузку при уходе с экрана"""
+        self.loader.cancel()
 
     def display_content(self, analytic: Analytic, container: ft.Container):
         return ft.Column(
@@ -150,7 +157,12 @@ class AnalyticsPage(ft.Page):
             except Exception as exc:
                 self.show_message(f"Ошибка сохранения: {exc}", True)
                 return
-            self.refresh()
+            if (new_type, new_id) != (analytic.id_analytic_type, analytic.id):
+                # Обновлена запись с другим ключом - ее положение на экране неизвестно
+                self.refresh()
+                return
+            new_analytic = Analytic({**analytic.to_dict(), "Аналитика": new_name})
+            self.table.apply(lambda: self.table.replace(analytic, new_analytic))
 
         def on_delete(e):
             try:
@@ -159,7 +171,7 @@ class AnalyticsPage(ft.Page):
             except Exception as exc:
                 self.show_message(f"Ошибка удаления: {exc}", True)
                 return
-            self.refresh()
+            self.table.apply(lambda: self.table.remove(analytic))
 
         def on_cancel(e):
             container.content = self.display_content(analytic, container)
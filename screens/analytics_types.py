@@ -3,6 +3,8 @@ import flet as ft
 import theme.colors as colors
 from database import Database
 from dialog_manager import DialogManager
+from screen_loader import ScreenLoader
+from virtual_table import VirtualTable
 
 class AnalyticsTypesScreen(ft.Page):
     def __init__(self, page, user):
@@ -10,9 +12,11 @@ class AnalyticsTypesScreen(ft.Page):
         self.page = page
         self.db = Database()
         self.db.connect()
-        self.analytics_types = self.db.get_all_analytic_types()
+        # Данные загружаются в фоне после build(), до этого таблица показывает заглушку
+        self.analytics_types = []
+        self.loader = ScreenLoader(page, self.db)
         self.body = None
-        self.rows = []
+        self.table = None
 
     def build(self):
         add_fab = ft.FloatingActionButton(
@@ -29,19 +33,10 @@ class AnalyticsTypesScreen(ft.Page):
                 ft.Container(width=40)
             ]
         )
-        self.rows = [ft.Container(content=self.display_content(analytic_type, None)) for analytic_type in self.analytics_types]
-        for i, analytic_type in enumerate(self.analytics_types):
-            self.rows[i].content = self.display_content(analytic_type, self.rows[i])
-
+        self.table = VirtualTable(table_header, self.display_content, key=lambda t: t.id or '', reload=self.refresh)
         self.page.floating_action_button = add_fab
-        self.body = ft.Column(
-            controls=[
-                table_header,
-                ft.Divider(color=colors.grey),
-                *self.rows,
-                ft.Container(height=50)
-            ]
-        )
+        self.body = self.table.build()
+        self.refresh()
         return self.body
 
     def add_dialog(self):
@@ -90,9 +85,9 @@ class AnalyticsTypesScreen(ft.Page):
                 "Код вида аналитики": analytic_type_id,
                 "Вид аналитики": analytic_type_name,
             })
-            self.db.create_analytic_type(analytic_type)
+            analytic_type = self.db.create_analytic_type(analytic_type)
             self.show_message("Вид аналитики успешно добавлен", False)
-            self.refresh()
+            self.table.apply(lambda: self.table.insert(analytic_type))
         except Exception as exc:
             self.show_message(f"Ошибка добавления: {exc}", True)
 
@@ -103,14 +98,21 @@ class AnalyticsTypesScreen(ft.Page):
             DialogManager.show_success_dialog(self.page, "Успех", text)
 
     def refresh(self):
-        self.analytics_types = self.db.get_all_analytic_types()
-        self.rows = [ft.Container(content=self.display_content(analytic_type, None)) for analytic_type in self.analytics_types]
-        for i, analytic_type in enumerate(self.analytics_types):
-            self.rows[i].content = self.display_content(analytic_type, self.rows[i])
-        header = self.body.controls[0] if self.body and len(self.body.controls) > 0 else None
-        divider = ft.Divider(color=colors.grey)
-        self.body.controls = [self.body.controls[0], divider, *self.rows] if header else [divider, *self.rows]
-        self.page.update()
+        """Перечитать записи в фоне; таблица заполняется по окончании загрузки"""
+        self.table.show_skeleton()
+        self.loader.start(self.db.get_all_analytic_types, self.show_analytics_types, self.show_load_error)
+
+    def show_analytics_types(self, analytics_types):
+        self.analytics_types = analytics_types
+        self.table.set_items(self.analytics_types)
+
+    def show_load_error(self, exc):
+        self.table.set_items([])
+        self.show_message(f"Ошибка загрузки видов аналитик: {exc}", True)
+
+    def dispose(self):
+        """Прекратить загрузку при уходе с экрана"""
+        self.loader.cancel()
 
     def display_content(self, analytic_type: AnalyticType, container: ft.Container):
         return ft.Column(
@@ -145,7 +147,8 @@ class AnalyticsTypesScreen(ft.Page):
             except Exception as exc:
                 self.show_message(f"Ошибка сохранения: {exc}", True)
                 return
-            self.refresh()
+            new_analytic_type = AnalyticType({**analytic_type.to_dict(), "Вид аналитики": new_name})
+            self.table.apply(lambda: self.table.replace(analytic_type, new_analytic_type))
 
         def on_delete(e):
             try:
@@ -154,7 +157,7 @@ class AnalyticsTypesScreen(ft.Page):
             except Exception as exc:
                 self.show_message(f"Ошибка удаления: {exc}", True)
                 return
-            self.refresh()
+            self.table.apply(lambda: self.table.remove(analytic_type))
 
         def on_cancel(e):
             container.content = self.display_content(analytic_type, container)
@@ -3,15 +3,19 @@ import theme.colors as colors
 from data_classes import DZO
 from database import Database
 from dialog_manager import DialogManager
+from screen_loader import ScreenLoader
+from virtual_table import VirtualTable
 
 class DZOsScreen(ft.Page):
     def __init__(self, page):
         self.page = page
         self.db = Database()
         self.db.connect()
-        self.dzos = self.db.get_all_dzos()
+        # Данные загружаются в фоне после build(), до этого таблица показывает заглушку
+        self.dzos = []
+        self.loader = ScreenLoader(page, self.db)
         self.body = None
-        self.rows = []
+        self.table = None
 
     def build(self):
         add_fab = ft.FloatingActionButton(
@@ -29,19 +33,10 @@ class DZOsScreen(ft.Page):
                 ft.Container(width=40)
             ]
         )
-        self.rows = [ft.Container(content=self.display_content(dzo, None)) for dzo in self.dzos]
-        for i, dzo in enumerate(self.dzos):
-            self.rows[i].content = self.display_content(dzo, self.rows[i])
-
+        self.table = VirtualTable(table_header, self.display_content, key=lambda d: d.id, reload=self.refresh)
         self.page.floating_action_button = add_fab
-        self.body = ft.Column(
-            controls=[
-                table_header,
-                ft.Divider(color=colors.grey),
-                *self.rows,
-                ft.Container(height=50)
-            ]
-        )
+        self.body = self.table.build()
+        self.refresh()
         return self.body
 
     def add_dialog(self):
@@ -83,9 +78,9 @@ class DZOsScreen(ft.Page):
             if not name or not address:
                 self.show_message("Все поля должны быть заполнены", True)
                 return
-            self.db.create_dzo(name, address)
+            dzo = self.db.create_dzo(name, address)
             self.show_message("ДЗО успешно добавлено", False)
-            self.refresh()
+            self.table.apply(lambda: self.table.insert(dzo))
         except Exception as exc:
             self.show_message(f"Ошибка добавления ДЗО: {exc}", True)
 
@@ -96,14 +91,21 @@ class DZOsScreen(ft.Page):
             DialogManager.show_success_dialog(self.page, "Успех", text)
 
     def refresh(self):
-        self.dzos = self.db.get_all_dzos()
-        self.rows = [ft.Container(content=self.display_content(dzo, None)) for dzo in self.dzos]
-        for i, dzo in enumerate(self.dzos):
-            self.rows[i].content = self.display_content(dzo, self.rows[i])
-        header = self.body.controls[0] if self.body and len(self.body.controls) > 0 else None
-        divider = ft.Divider(color=colors.grey)
-        self.body.controls = [self.body.controls[0], divider, *self.rows] if header else [divider, *self.rows]
-        self.page.update()
+        """Перечитать записи в фоне; таблица заполняется по окончании загрузки"""
+        self.table.show_skeleton()
+        self.loader.start(self.db.get_all_dzos, self.show_dzos, self.show_load_error)
+
+    def show_dzos(self, dzos):
+        self.dzos = dzos
+        self.table.set_items(self.dzos)
+
+    def show_load_error(self, exc):
+        self.table.set_items([])
+        self.show_message(f"Ошибка загрузки ДЗО: {exc}", True)
+
+    def dispose(self):
+        """Прекратить загрузку при уходе с экрана"""
+        self.loader.cancel()
 
     def display_content(self, dzo: DZO, container: ft.Container):
         return ft.Column(
@@ -141,7 +143,8 @@ class DZOsScreen(ft.Page):
             except Exception as exc:
                 self.show_message(f"Ошибка сохранения: {exc}", True)
                 return
-            self.refresh()
+            new_dzo = DZO({**dzo.to_dict(), "Наименование": new_name, "Адрес": new_address})
+            self.table.apply(lambda: self.table.replace(dzo, new_dzo))
 
         def on_delete(e):
             try:
@@ -150,7 +153,7 @@ class DZOsScreen(ft.Page):
             except Exception as exc:
                 self.show_message(f"Ошибка удаления: {exc}", True)
                 return
-            self.refresh()
+            self.table.apply(lambda: self.table.remove(dzo))
 
         def on_cancel(e):
             container.content = self.display_content(dzo, container)
@@ -3,16 +3,20 @@ from data_classes import Indicator, User
 import theme.colors as colors
 from database import Database
 from dialog_manager import DialogManager
+from screen_loader import ScreenLoader
+from virtual_table import VirtualTable
 
 class IndicatorsScreen(ft.Page):
     def __init__(self, page, user: User):
         self.page = page
         self.db = Database()
         self.db.connect()
-        self.indicators = self.db.get_all_indicators()
+        # Данные загружаются в фоне после build(), до этого таблица показывает заглушку
+        self.indicators = []
+        self.loader = ScreenLoader(page, self.db)
         self.allow_admin_features = user.role == "Администратор УК"
         self.body = None
-        self.rows = []
+        self.table = None
 
     def build(self):
         add_fab = ft.FloatingActionButton(
@@ -32,19 +36,10 @@ class IndicatorsScreen(ft.Page):
                 ft.Container(width=40)
             ]
         )
-        self.rows = [ft.Container(content=self._display_content(ind, None)) for ind in self.indicators]
-        for i, ind in enumerate(self.indicators):
-            self.rows[i].content = self._display_content(ind, self.rows[i])
-
+        self.table = VirtualTable(table_header, self._display_content, key=lambda ind: ind.id or '', reload=self.refresh)
         self.page.floating_action_button = add_fab
-        self.body = ft.Column(
-            controls=[
-                table_header,
-                ft.Divider(color=colors.grey),
-                *self.rows,
-                ft.Container(height=50)
-            ]
-        )
+        self.body = self.table.build()
+        self.refresh()
         return self.body
 
     def add_dialog(self):
@@ -103,9 +98,9 @@ class IndicatorsScreen(ft.Page):
                 "Код вида аналитики 2": id_analytic_type_2,
                 "Код вида аналитики 3": id_analytic_type_3,
             })
-            self.db.create_indicator(indicator)
+            indicator = self.db.create_indicator(indicator)
             self.show_message("Показатель успешно добавлен", False)
-            self.refresh()
+            self.table.apply(lambda: self.table.insert(indicator))
         except Exception as exc:
             self.show_message(f"Ошибка добавления показателя: {exc}", True)
 
@@ -116,14 +111,21 @@ class IndicatorsScreen(ft.Page):
             DialogManager.show_success_dialog(self.page, "Успех", text)
 
     def refresh(self):
-        self.indicators = self.db.get_all_indicators()
-        self.rows = [ft.Container(content=self._display_content(ind, None)) for ind in self.indicators]
-        for i, ind in enumerate(self.indicators):
-            self.rows[i].content = self._display_content(ind, self.rows[i])
-        header = self.body.controls[0] if self.body and len(self.body.controls) > 0 else None
-        divider = ft.Divider(color=colors.grey)
-        self.body.controls = [self.body.controls[0], divider, *self.rows] if header else [divider, *self.rows]
-        self.page.update()
+        """Перечитать записи в фоне; таблица заполняется по окончании загрузки"""
+        self.table.show_skeleton()
+        self.loader.start(self.db.get_all_indicators, self.show_indicators, self.show_load_error)
+
+    def show_indicators(self, indicators):
+        self.indicators = indicators
+        self.table.set_items(self.indicators)
+
+    def show_load_error(self, exc):
+        self.table.set_items([])
+        self.show_message(f"Ошибка загрузки показателей: {exc}", True)
+
+    def dispose(self):
+        """Прекратить загрузку при уходе с экрана"""
+        self.loader.cancel()
 
     def _display_content(self, indicator: Indicator, container: ft.Container):
         return ft.Column(
@@ -167,8 +169,14 @@ class IndicatorsScreen(ft.Page):
             except Exception as exc:
                 self.show_message(f"Ошибка сохранения: {exc}", True)
                 return
-            # refresh rows to reflect DB changes
-            self.refresh()
+            new_indicator = Indicator({
+                **indicator.to_dict(),
+                "Показатель": new_name,
+                "Код вида аналитики 1": new_a1,
+                "Код вида аналитики 2": new_a2,
+                "Код вида аналитики 3": new_a3,
+            })
+            self.table.apply(lambda: self.table.replace(indicator, new_indicator))
 
         def on_delete(e):
             try:
@@ -177,7 +185,7 @@ class IndicatorsScreen(ft.Page):
             except Exception as exc:
                 self.show_message(f"Ошибка удаления: {exc}", True)
                 return
-            self.refresh()
+            self.table.apply(lambda: self.table.remove(indicator))
 
         def on_cancel(e):
             container.content = self._display_content(indicator, container)
@@ -3,6 +3,9 @@ import theme.colors as colors
 from data_classes import User
 from database import Database
 from dialog_manager import DialogManager
+from app_logging import get_logger
+
+log = get_logger('login')
 
 class LoginPage(ft.Page):
     def __init__(self, page):
@@ -38,7 +41,7 @@ class LoginPage(ft.Page):
         user = self.db.get_user_by_credentials(login, password)
         if user:
             self.navigate_main(user)
-            print("User authenticated:", user.full_name)
+            log.info("Вход пользователя", user=user.login)
         else:
             self.show_message("Неверный логин или пароль")
     
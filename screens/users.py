@@ -3,15 +3,19 @@ import theme.colors as colors
 from data_classes import User
 from database import Database
 from dialog_manager import DialogManager
+from screen_loader import ScreenLoader
+from virtual_table import VirtualTable
 
 class UsersScreen(ft.Page):
     def __init__(self, page):
         self.page = page
         self.db = Database()
         self.db.connect()
-        self.users = self.db.get_all_users()
+        # Данные загружаются в фоне после build(), до этого таблица показывает заглушку
+        self.users = []
+        self.loader = ScreenLoader(page, self.db)
         self.body = None
-        self.rows = []
+        self.table = None
 
     def build(self):
         add_fab = ft.FloatingActionButton(
@@ -30,19 +34,10 @@ class UsersScreen(ft.Page):
                 ft.Container(width=40)
             ]
         )
-        self.rows = [ft.Container(content=self.display_content(user, None)) for user in self.users]
-        for i, user in enumerate(self.users):
-            self.rows[i].content = self.display_content(user, self.rows[i])
-
+        self.table = VirtualTable(table_header, self.display_content, key=lambda u: u.id, reload=self.refresh)
         self.page.floating_action_button = add_fab
-        self.body = ft.Column(
-            controls=[
-                table_header,
-                ft.Divider(color=colors.grey),
-                *self.rows,
-                ft.Container(height=50)
-            ]
-        )
+        self.body = self.table.build()
+        self.refresh()
         return self.body
 
     def add_dialog(self):
@@ -97,9 +92,9 @@ class UsersScreen(ft.Page):
                 "Пароль": password,
                 "ДЗО": dzo
             })
-            self.db.create_user(user)
+            created = self.db.create_user(user)
             self.show_message("Пользователь успешно добавлен", False)
-            self.refresh()
+            self.table.apply(lambda: self.table.insert(created))
         except Exception as exc:
             self.show_message(f"Ошибка добавления: {exc}", True)
 
@@ -110,14 +105,21 @@ class UsersScreen(ft.Page):
             DialogManager.show_success_dialog(self.page, "Успех", text)
 
     def refresh(self):
-        self.users = self.db.get_all_users()
-        self.rows = [ft.Container(content=self.display_content(user, None)) for user in self.users]
-        for i, user in enumerate(self.users):
-            self.rows[i].content = self.display_content(user, self.rows[i])
-        header = self.body.controls[0] if self.body and len(self.body.controls) > 0 else None
-        divider = ft.Divider(color=colors.grey)
-        self.body.controls = [self.body.controls[0], divider, *self.rows] if header else [divider, *self.rows]
-        self.page.update()
+        """Перечитать записи в фоне; таблица заполняется по окончании загрузки"""
+        self.table.show_skeleton()
+        self.loader.start(self.db.get_all_users, self.show_users, self.show_load_error)
+
+    def show_users(self, users):
+        self.users = users
+        self.table.set_items(self.users)
+
+    def show_load_error(self, exc):
+        self.table.set_items([])
+        self.show_message(f"Ошибка загрузки пользователей: {exc}", True)
+
+    def dispose(self):
+        """Прекратить загрузку при уходе с экрана"""
+        self.loader.cancel()
 
     def display_content(self, user: User, container: ft.Container):
         return ft.Column(
@@ -154,12 +156,12 @@ class UsersScreen(ft.Page):
                 self.show_message("Все поля должны быть заполнены", True)
                 return
             try:
-                self.db.update_user(user.id, new_full_name, new_role, new_login, user.password, new_dzo)
+                updated = self.db.update_user(user.id, new_full_name, new_role, new_login, user.password, new_dzo)
                 self.show_message("Изменения сохранены", False)
             except Exception as exc:
                 self.show_message(f"Ошибка сохранения: {exc}", True)
                 return
-            self.refresh()
+            self.table.apply(lambda: self.table.replace(user, updated))
 
         def on_delete(e):
             try:
@@ -168,7 +170,7 @@ class UsersScreen(ft.Page):
             except Exception as exc:
                 self.show_message(f"Ошибка удаления: {exc}", True)
                 return
-            self.refresh()
+            self.table.apply(lambda: self.table.remove(user))
 
         def on_cancel(e):
             container.content = self.display_content(user, container)
@@ -1,19 +1,30 @@
 import flet as ft
 import theme.colors as colors
-from data_classes import ValueIndicator, DZO
+from data_classes import ValueIndicator
 from database import Database
 from dialog_manager import DialogManager
+from screen_loader import ScreenLoader
+from virtual_table import VirtualTable
 from datetime import datetime
 class ValuesIndicatorsScreen(ft.Page):
 
     def __init__(self, page, user):
         self.allow_admin_features = user.role == "Администратор УК"
+        self.user = user
         self.page = page
         self.db = Database()
         self.db.connect()
-        self.values_indicators = self.db.get_values_indicators()
+        self.page_size = 100
+        self.filters = {}
+        # Ключи, от которых загружена текущая страница: (after, before)
+        self.page_cursor = (None, None)
+        # Страница загружается в фоне после build(), до этого таблица показывает заглушку
+        self.values_page = None
+        self.values_indicators = []
+        self.loader = ScreenLoader(page, self.db)
         self.body = None
-        self.rows = []
+        self.table = None
+        self.pager = None
 
     def build(self):
         add_fab = ft.FloatingActionButton(
@@ -37,21 +48,41 @@ class ValuesIndicatorsScreen(ft.Page):
                 ft.Container(width=40)
             ]
         )
-        self.rows = [ft.Container(content=self.display_content(value_indicator, None)) for value_indicator in self.values_indicators]
-        for i, value_indicator in enumerate(self.values_indicators):
-            self.rows[i].content = self.display_content(value_indicator, self.rows[i])
-
         self.page.floating_action_button = add_fab
-        self.body = ft.Column(
-            controls=[
-                table_header,
-                ft.Divider(color=colors.grey),
-                *self.rows,
-                ft.Container(height=50)
-            ]
+        self.pager = self.build_pager()
+        self.table = VirtualTable(
+            table_header,
+            self.display_content,
+            footer=self.pager,
+            key=lambda v: v.page_key(),
+            reload=self.refresh,
         )
+        self.body = self.table.build()
+        self.refresh()
         return self.body
 
+    def build_pager(self):
+        self.btn_previous = ft.TextButton(
+            "Назад",
+            on_click=lambda e: self.load_page(before=self.values_page.first_key),
+            disabled=True,
+            style=ft.ButtonStyle(color=colors.accent_blue)
+        )
+        self.btn_next = ft.TextButton(
+            "Вперёд",
+            on_click=lambda e: self.load_page(after=self.values_page.last_key),
+            disabled=True,
+            style=ft.ButtonStyle(color=colors.accent_blue)
+        )
+        return ft.Row(
+            controls=[self.btn_previous, self.btn_next],
+            alignment=ft.MainAxisAlignment.CENTER
+        )
+
+    def load_page(self, after=None, before=None):
+        self.page_cursor = (after, before)
+        self.refresh()
+
     def add_dialog(self):
         dialog = self.build_add_value_indicator_dialog()
         self.page.add(dialog)
@@ -96,7 +127,7 @@ class ValuesIndicatorsScreen(ft.Page):
         )
         return dialog
 
-    def add_value_indicator(self, date_start, date_end, id_indicator, analytic_1, analytic_2, analytic_3, sum_value, dzo_id ):
+    def add_value_indicator(self, date_start, date_end, id_indicator, analytic_1, analytic_2, analytic_3, sum_value, dzo_id=None):
         try:
             if not date_start or not date_end or not id_indicator or not analytic_1 or not sum_value:
                 self.show_message("Обязательные поля: даты, код показателя, аналитика 1, сумма", True)
@@ -109,14 +140,36 @@ class ValuesIndicatorsScreen(ft.Page):
                 "Код аналитики 2": analytic_2,
                 "Код аналитики 3": analytic_3,
                 "Сумма": float(sum_value),
-                "ДЗО": dzo_id
+                "ДЗО": dzo_id or self.user.dzo
             })
-            self.db.create_values_indicator(value_indicator)
+            created = self.db.create_values_indicator(value_indicator)
             self.show_message("Значение успешно добавлено", False)
-            self.refresh()
+            self.table.apply(lambda: self.insert_in_page(created))
         except Exception as exc:
             self.show_message(f"Ошибка добавления значения: {exc}", True)
 
+    def insert_in_page(self, value_indicator: ValueIndicator):
+        """Показать новую запись, если она попадает в диапазон текущей страницы"""
+        key = value_indicator.page_key()
+        if self.values_indicators:
+            if self.values_page.has_previous and key < self.values_indicators[0].page_key():
+                return
+            if self.values_page.has_next and key > self.values_indicators[-1].page_key():
+                return
+        self.table.insert(value_indicator)
+
+    def replace_in_page(self, old_value: ValueIndicator, new_value: ValueIndicator):
+        if old_value.page_key() == new_value.page_key():
+            self.table.replace(old_value, new_value)
+        else:
+            self.table.remove(old_value)
+            self.insert_in_page(new_value)
+
+    def remove_from_page(self, value_indicator: ValueIndicator):
+        self.table.remove(value_indicator)
+        if not self.values_indicators and (self.values_page.has_previous or self.values_page.has_next):
+            self.refresh()
+
     def show_message(self, text, error: bool = False):
         if error:
             DialogManager.show_error_dialog(self.page, "Ошибка", text)
@@ -124,17 +177,37 @@ class ValuesIndicatorsScreen(ft.Page):
             DialogManager.show_success_dialog(self.page, "Успех", text)
 
     def refresh(self):
-        self.values_indicators = self.db.get_values_indicators()
-        self.rows = [ft.Container(content=self.display_content(value_indicator, None)) for value_indicator in self.values_indicators]
-        for i, value_indicator in enumerate(self.values_indicators):
-            self.rows[i].content = self.display_content(value_indicator, self.rows[i])
-        header = self.body.controls[0] if self.body and len(self.body.controls) > 0 else None
-        divider = ft.Divider(color=colors.grey)
-        self.body.controls = [self.body.controls[0], divider, *self.rows] if header else [divider, *self.rows]
-        self.page.update()
+        """Перечитать текущую страницу в фоне; листание недоступно до окончания загрузки"""
+        self.table.show_skeleton()
+        self.btn_previous.disabled = True
+        self.btn_next.disabled = True
+        self.loader.start(self.fetch_page, self.show_page, self.show_load_error)
+
+    def fetch_page(self):
+        after, before = self.page_cursor
+        values_page = self.db.get_values_indicators_page(self.page_size, after=after, before=before, filters=self.filters)
+        if not values_page.items and (after or before):
+            # Страница опустела после удаления - возвращаемся к началу
+            self.page_cursor = (None, None)
+            values_page = self.db.get_values_indicators_page(self.page_size, filters=self.filters)
+        return values_page
+
+    def show_page(self, values_page):
+        self.values_page = values_page
+        self.values_indicators = values_page.items
+        self.table.set_items(self.values_indicators)
+        self.btn_previous.disabled = not values_page.has_previous
+        self.btn_next.disabled = not values_page.has_next
+
+    def show_load_error(self, exc):
+        self.table.set_items([])
+        self.show_message(f"Ошибка загрузки значений: {exc}", True)
+
+    def dispose(self):
+        """Прекратить загрузку при уходе с экрана"""
+        self.loader.cancel()
 
     def display_content(self, value_indicator: ValueIndicator, container: ft.Container):
-        dzo = self.get_dzo(value_indicator.dzo)
         return ft.Column(
             controls=[
                 ft.Row(
@@ -146,8 +219,8 @@ class ValuesIndicatorsScreen(ft.Page):
                         ft.Text(value_indicator.analytic_2, color=colors.dark_blue, expand=True, text_align=ft.TextAlign.CENTER),
                         ft.Text(value_indicator.analytic_3, color=colors.dark_blue, expand=True, text_align=ft.TextAlign.CENTER),
                         ft.Text(str(value_indicator.sum_value), color=colors.dark_blue, expand=True, text_align=ft.TextAlign.CENTER),
-                        ft.Text(dzo.name if dzo else "Неизвестно", color=colors.dark_blue, expand=True, text_align=ft.TextAlign.CENTER),
-                        ft.Text(dzo.address if dzo else "Неизвестно", color=colors.dark_blue, expand=True, text_align=ft.TextAlign.CENTER),
+                        ft.Text(value_indicator.dzo_name or "Неизвестно", color=colors.dark_blue, expand=True, text_align=ft.TextAlign.CENTER),
+                        ft.Text(value_indicator.dzo_address or "Неизвестно", color=colors.dark_blue, expand=True, text_align=ft.TextAlign.CENTER),
                         ft.IconButton(icon=ft.Icons.EDIT, icon_color=colors.accent_blue, on_click=lambda e, v=value_indicator, c=container: self.enter_edit(v, c)) if self.allow_admin_features else ft.Container(width=40)
                     ]
                 ),
@@ -200,12 +273,12 @@ class ValuesIndicatorsScreen(ft.Page):
                     "Сумма": float(new_sum),
                     "ДЗО": dzo_id
                 })
-                self.db.update_values_indicator(value_indicator, new_value_indicator)
+                updated = self.db.update_values_indicator(value_indicator, new_value_indicator)
                 self.show_message("Изменения сохранены", False)
             except Exception as exc:
                 self.show_message(f"Ошибка сохранения: {exc}", True)
                 return
-            self.refresh()
+            self.table.apply(lambda: self.replace_in_page(value_indicator, updated))
 
         def on_delete(e):
             try:
@@ -221,7 +294,7 @@ class ValuesIndicatorsScreen(ft.Page):
             except Exception as exc:
                 self.show_message(f"Ошибка удаления: {exc}", True)
                 return
-            self.refresh()
+            self.table.apply(lambda: self.remove_from_page(value_indicator))
 
         def on_cancel(e):
             container.content = self.display_content(value_indicator, container)
@@ -254,7 +327,4 @@ class ValuesIndicatorsScreen(ft.Page):
                 ),
                 ft.Divider(color=colors.grey),
             ]
-        )
-    
-    def get_dzo(self, dzo_id) -> DZO:
-        return self.db.get_dzo_by_id(dzo_id)
\ No newline at end of file
+        )
\ No newline at end of file
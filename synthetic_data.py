@@ -0,0 +1,363 @@
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+import schema
+from app_logging import get_logger, setup_logging
+from database import Database, DatabaseError
+
+log = get_logger('synthetic_data')
+
+# Размеры по умолчанию; любое можно переопределить в generate(..., indicators=5000)
+DEFAULTS = {
+    'dzo': 50,
+    'analytic_types': 20,
+    'analytics': 20000,           # всего; по видам распределяются неравномерно (несколько крупных видов)
+    'indicators': 2000,
+    'values': 1_000_000,
+    'users': 100,
+    'admins': 5,                  # из них с ролью "Администратор УК"
+    'start_year': 2020,
+    'years': 5,
+    'quarterly_share': 0.3,       # доля квартальных показателей, остальные - месячные
+    'analytic_2_share': 0.3,      # доля показателей со второй аналитикой
+    'analytic_3_share': 0.05,     # доля показателей с третьей аналитикой (из тех, у кого есть вторая)
+    'introduced_share': 0.1,      # доля аналитик, введенных позже начала горизонта
+    'retired_share': 0.03,        # доля аналитик, выведенных до его конца
+    'chunk_size': 500_000,        # строк значений в одной порции COPY
+}
+ADMIN_ROLE = 'Администратор УК'
+USER_ROLE = 'Пользователь ДЗО'
+PASSWORD = 'synthetic'
+GENERATED_TABLES = ('ДЗО', 'Виды аналитики', 'Аналитики', 'Показатели', schema.VALUES_TABLE, 'Пользователи')
+
+
+class SyntheticData:
+    """Детерминированный набор данных для нагрузочной проверки: справочники, значения и пользователи.
+    Значения - временные ряды: у ряда (показатель, аналитики) одно ДЗО и значения за каждый период,
+    в котором действуют все его аналитики, поэтому ссылки и периоды действия согласованы.
+    Справочники генерируются сразу, значения - порциями по требованию; один seed дает одни и те же данные"""
+
+    def __init__(self, seed: int = 42, **sizes):
+        unknown = set(sizes) - set(DEFAULTS)
+        if unknown:
+            raise ValueError(f"Неизвестные параметры: {', '.join(sorted(unknown))}")
+        self.seed = seed
+        self.sizes = {**DEFAULTS, **sizes}
+        self._months = self.sizes['years'] * 12
+        self._origin = np.datetime64(f"{self.sizes['start_year']}-01", 'M')
+        rng = np.random.default_rng([seed, 0])
+        self._build_types(rng)
+        self._build_analytics(rng)
+        self._build_indicators(rng)
+        self._build_quotas(rng)
+
+    # ---------- Справочники ----------
+
+    def _build_types(self, rng):
+        count = self.sizes['analytic_types']
+        self.type_codes = np.array([f'T{number:03d}' for number in range(count)], dtype=object)
+        # Размеры видов по закону Ципфа: несколько больших видов (контрагенты, статьи) и много мелких
+        weights = 1.0 / np.arange(1, count + 1) ** 0.9
+        self.type_sizes = np.maximum(2, np.round(weights / weights.sum() * self.sizes['analytics'])).astype(np.int64)
+
+    def _build_analytics(self, rng):
+        """Аналитики каждого вида и месяцы их действия [first, last] от начала горизонта"""
+        self.analytic_codes, self.analytic_first, self.analytic_last = [], [], []
+        for size in self.type_sizes:
+            first = np.zeros(size, dtype=np.int64)
+            last = np.full(size, self._months - 1, dtype=np.int64)
+            introduced = rng.random(size) < self.sizes['introduced_share']
+            first[introduced] = rng.integers(1, self._months, introduced.sum())
+            # Выведенная аналитика перестает действовать до конца горизонта
+            retired = (rng.random(size) < self.sizes['retired_share']) & (first < self._months - 1)
+            last[retired] = rng.integers(first[retired], self._months - 1)
+            self.analytic_codes.append(np.array([f'A{number:05d}' for number in range(size)], dtype=object))
+            self.analytic_first.append(first)
+            self.analytic_last.append(last)
+
+    def _build_indicators(self, rng):
+        count = self.sizes['indicators']
+        types = len(self.type_codes)
+        # Крупные виды чаще бывают первой аналитикой показателя
+        weights = self.type_sizes / self.type_sizes.sum()
+        self.indicator_codes = np.array([f'P{number:05d}' for number in range(count)], dtype=object)
+        self.indicator_step = np.where(rng.random(count) < self.sizes['quarterly_share'], 3, 1)
+        first = rng.choice(types, count, p=weights)
+        second = np.where(rng.random(count) < self.sizes['analytic_2_share'],
+                          (first + rng.integers(1, max(types, 2), count)) % types, -1)
+        third = np.where((second >= 0) & (rng.random(count) < self.sizes['analytic_3_share']),
+                         (second + rng.integers(1, max(types, 2), count)) % types, -1)
+        if types < 3:
+            third[:] = -1
+        if types < 2:
+            second[:] = -1
+        third[third == first] = -1
+        self.indicator_types = np.column_stack([first, second, third])
+
+    def _capacity(self, index: int) -> int:
+        """Наибольшее число значений показателя: все наборы аналитик за все периоды"""
+        combinations = 1
+        for type_index in self.indicator_types[index]:
+            if type_index >= 0:
+                combinations *= int(self.type_sizes[type_index])
+        return combinations * (self._months // int(self.indicator_step[index]))
+
+    def _build_quotas(self, rng):
+        """Число значений каждого показателя: логнормальные веса с ограничением по емкости"""
+        count = self.sizes['indicators']
+        weights = rng.lognormal(0.0, 1.0, count)
+        capacity = np.array([self._capacity(index) for index in range(count)], dtype=float)
+        quotas = np.zeros(count, dtype=np.int64)
+        remaining = min(self.sizes['values'], int(capacity.sum()))
+        open_ = np.ones(count, dtype=bool)
+        # Остаток от показателей, упершихся в емкость, раздается остальным
+        while remaining > 0 and open_.any():
+            share = np.zeros(count)
+            share[open_] = weights[open_] / weights[open_].sum() * remaining
+            add = np.minimum(np.floor(share).astype(np.int64), (capacity - quotas).astype(np.int64))
+            if not add.any():
+                add[np.flatnonzero(open_)[:remaining]] = 1
+            quotas += add
+            remaining -= int(add.sum())
+            open_ &= quotas < capacity
+        self.quotas = quotas
+
+    def _period_dates(self, months: np.ndarray, month_count=None):
+        start = (self._origin + months).astype('datetime64[D]')
+        if month_count is None:
+            return start
+        return start, (self._origin + months + month_count).astype('datetime64[D]') - 1
+
+    def _date_strings(self, months: np.ndarray, mask: np.ndarray, end: bool = False) -> np.ndarray:
+        dates = self._period_dates(months + 1) - 1 if end else self._period_dates(months)
+        return np.where(mask, np.datetime_as_string(dates, unit='D').astype(object), None)
+
+    def dzo_frame(self) -> pd.DataFrame:
+        numbers = np.arange(1, self.sizes['dzo'] + 1)
+        return pd.DataFrame({
+            'Наименование': [f'ДЗО {number}' for number in numbers],
+            'Адрес': [f'г. Москва, ул. Промышленная, {number}' for number in numbers],
+        })
+
+    def analytic_types_frame(self) -> pd.DataFrame:
+        return pd.DataFrame({
+            'Код вида аналитики': self.type_codes,
+            'Вид аналитики': [f'Вид аналитики {code}' for code in self.type_codes],
+        })
+
+    def analytics_frame(self) -> pd.DataFrame:
+        frames = []
+        for type_code, codes, first, last in zip(self.type_codes, self.analytic_codes,
+                                                 self.analytic_first, self.analytic_last):
+            frames.append(pd.DataFrame({
+                'Код вида аналитики': type_code,
+                'Код аналитики': codes,
+                'Аналитика': [f'{type_code} {code}' for code in codes],
+                'Дата начала периода': self._date_strings(first, first > 0),
+                'Дата конца периода': self._date_strings(last, last < self._months - 1, end=True),
+            }))
+        return pd.concat(frames, ignore_index=True)
+
+    def indicators_frame(self) -> pd.DataFrame:
+        frame = {
+            'Код показателя': self.indicator_codes,
+            'Показатель': [f'Показатель {code}' for code in self.indicator_codes],
+        }
+        for position in range(3):
+            types = self.indicator_types[:, position]
+            frame[f'Код вида аналитики {position + 1}'] = np.where(
+                types >= 0, self.type_codes[np.maximum(types, 0)], None)
+        return pd.DataFrame(frame)
+
+    def users_frame(self, dzo_ids) -> pd.DataFrame:
+        """Пользователи с открытым паролем PASSWORD; шифруется он при записи"""
+        count = self.sizes['users']
+        numbers = np.arange(1, count + 1)
+        rng = np.random.default_rng([self.seed, 2])
+        return pd.DataFrame({
+            'ФИО': [f'Пользователь {number}' for number in numbers],
+            'Роль': np.where(numbers <= self.sizes['admins'], ADMIN_ROLE, USER_ROLE),
+            'Логин': [f'user{number:05d}' for number in numbers],
+            'ДЗО': np.asarray(dzo_ids)[rng.integers(0, len(dzo_ids), count)],
+        })
+
+    # ---------- Значения ----------
+
+    def _indicator_values(self, index: int, dzo_ids: np.ndarray) -> dict:
+        """Значения одного показателя; свой генератор на показатель, поэтому результат не зависит от порций"""
+        quota = int(self.quotas[index])
+        rng = np.random.default_rng([self.seed, 1, index])
+        step = int(self.indicator_step[index])
+        periods = self._months // step
+        types = [int(type_index) for type_index in self.indicator_types[index] if type_index >= 0]
+        sizes = [int(self.type_sizes[type_index]) for type_index in types]
+        space = int(np.prod(sizes, dtype=object))
+
+        # Наборы аналитик (ряды) набираются, пока их периоды не покроют квоту показателя
+        wanted = min(space, quota // periods + 1)
+        while True:
+            combinations = rng.choice(space, wanted, replace=False)
+            positions, lo, hi = [], np.zeros(wanted, dtype=np.int64), np.full(wanted, periods - 1, dtype=np.int64)
+            rest = combinations
+            for type_index, size in zip(reversed(types), reversed(sizes)):
+                rest, position = np.divmod(rest, size)
+                positions.insert(0, position)
+                # Период ряда входит в периоды действия всех его аналитик
+                lo = np.maximum(lo, -(-self.analytic_first[type_index][position] // step))
+                hi = np.minimum(hi, (self.analytic_last[type_index][position] + 1) // step - 1)
+            lengths = np.maximum(hi - lo + 1, 0)
+            if lengths.sum() >= quota or wanted == space:
+                break
+            wanted = min(space, wanted * 2)
+        ends = np.cumsum(lengths)
+        used = min(int(np.searchsorted(ends, quota)) + 1, len(ends))
+        lengths = lengths[:used].copy()
+        if used and ends[used - 1] > quota:
+            lengths[-1] -= ends[used - 1] - quota
+        rows = int(lengths.sum())
+
+        series = np.repeat(np.arange(used), lengths)
+        offset = np.arange(rows) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        period = lo[:used][series] + offset
+        months = period * step
+        start, end = self._period_dates(months, step)
+
+        # Уровень ряда, тренд, сезонность и шум
+        level = rng.lognormal(10.0, 1.5, used)
+        trend = rng.normal(0.0, 0.01 * step, used)
+        seasonal = 1.0 + 0.1 * np.sin(2 * np.pi * (months % 12) / 12 + rng.uniform(0, 2 * np.pi, used)[series])
+        noise = rng.lognormal(0.0, 0.1, rows)
+        sums = np.round(level[series] * (1.0 + trend[series]) ** period * seasonal * noise, 2)
+
+        values = {
+            'Дата начала периода': start,
+            'Дата окончания периода': end,
+            'Код показателя': np.full(rows, self.indicator_codes[index], dtype=object),
+        }
+        for position in range(3):
+            column = f'Код аналитики {position + 1}'
+            if position < len(types):
+                values[column] = self.analytic_codes[types[position]][positions[position][:used][series]]
+            else:
+                values[column] = np.full(rows, None, dtype=object)
+        values['Сумма'] = sums
+        values['ДЗО'] = dzo_ids[rng.integers(0, len(dzo_ids), used)][series]
+        return values
+
+    def values_chunks(self, dzo_ids):
+        """Порции значений (DataFrame) по chunk_size строк; dzo_ids - идентификаторы записанных ДЗО"""
+        dzo_ids = np.asarray(dzo_ids)
+        chunk_size = self.sizes['chunk_size']
+        pending, pending_rows = [], 0
+        for index in range(len(self.indicator_codes)):
+            if not self.quotas[index]:
+                continue
+            values = self._indicator_values(index, dzo_ids)
+            pending.append(values)
+            pending_rows += len(values['Сумма'])
+            if pending_rows >= chunk_size:
+                yield _values_frame(pending)
+                pending, pending_rows = [], 0
+        if pending:
+            yield _values_frame(pending)
+
+    def sample(self) -> dict:
+        """Показатель только с первой аналитикой и действующая до конца горизонта аналитика его вида -
+        ключ для проверочных операций над значениями"""
+        for index in np.flatnonzero(self.indicator_types[:, 1] < 0):
+            type_index = self.indicator_types[index, 0]
+            open_ = np.flatnonzero(self.analytic_last[type_index] == self._months - 1)
+            if len(open_):
+                return {
+                    'indicator': self.indicator_codes[index],
+                    'analytic_type': self.type_codes[type_index],
+                    'analytic_1': self.analytic_codes[type_index][open_[0]],
+                }
+        return None
+
+
+def _values_frame(pending: list) -> pd.DataFrame:
+    frame = pd.DataFrame({column: np.concatenate([values[column] for values in pending])
+                          for column in pending[0]})
+    for column in ('Дата начала периода', 'Дата окончания периода'):
+        frame[column] = np.datetime_as_string(frame[column].to_numpy(), unit='D')
+    return frame
+
+
+def generate(db: Database, seed: int = 42, analyze: bool = True, **sizes) -> dict:
+    """Заполнить пустую БД синтетическими данными: ДЗО, виды аналитики, аналитики, показатели,
+    значения показателей и пользователи (пароль PASSWORD). Схема обновляется до последней версии (Database.migrate);
+    непустые таблицы не дополняются. Значения пишутся через COPY порциями, одной транзакцией"""
+    data = SyntheticData(seed, **sizes)
+    started = time.perf_counter()
+    try:
+        db.migrate()
+        for table in GENERATED_TABLES:
+            if db.execute_query(f'SELECT 1 FROM public."{table}" LIMIT 1'):
+                raise DatabaseError(f"Таблица '{table}' не пуста: синтетические данные пишутся в пустую БД")
+
+        result = {}
+        for table, frame in (
+            ('ДЗО', data.dzo_frame()),
+            ('Виды аналитики', data.analytic_types_frame()),
+            ('Аналитики', data.analytics_frame()),
+            ('Показатели', data.indicators_frame()),
+        ):
+            result[table] = db.copy_chunks(table, [frame])['rows']
+            log.info("Справочник записан", table=table, rows=result[table])
+        dzo_ids = [row['Идентификатор ДЗО'] for row in db.execute_query(
+            'SELECT "Идентификатор ДЗО" FROM public."ДЗО" ORDER BY "Идентификатор ДЗО"')]
+
+        loaded = db.copy_chunks(schema.VALUES_TABLE, data.values_chunks(dzo_ids))
+        result[schema.VALUES_TABLE] = loaded['rows']
+        log.info("Значения записаны", rows=loaded['rows'], seconds=round(loaded['seconds'], 1),
+                 rows_per_second=round(loaded['rows_per_second']))
+
+        users = data.users_frame(dzo_ids)
+        db.execute_command(
+            '''
+            INSERT INTO public."Пользователи"("ФИО", "Роль", "Логин", "Пароль", "ДЗО")
+            SELECT u.full_name, u.role, u.login, crypt(%s, gen_salt('bf')), u.dzo
+            FROM unnest(%s::varchar[], %s::varchar[], %s::varchar[], %s::integer[]) AS u(full_name, role, login, dzo)
+            ''',
+            (PASSWORD, users['ФИО'].tolist(), users['Роль'].tolist(), users['Логин'].tolist(),
+             [int(dzo) for dzo in users['ДЗО']])
+        )
+        result['Пользователи'] = len(users)
+        if analyze:
+            db.execute_command('ANALYZE')
+    except DatabaseError:
+        raise
+    except Exception as e:
+        raise DatabaseError(f"Ошибка генерации синтетических данных: {e}")
+    return {
+        'seed': seed,
+        'sizes': data.sizes,
+        'rows': result,
+        'seconds': time.perf_counter() - started,
+        'sample': data.sample(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Заполнить пустую БД (config.DB_CONFIG) синтетическими данными для нагрузочной проверки')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--no-analyze', action='store_true', help='Не выполнять ANALYZE после загрузки')
+    for name, default in DEFAULTS.items():
+        parser.add_argument(f"--{name.replace('_', '-')}", dest=name, type=type(default), default=default)
+    args = vars(parser.parse_args())
+    seed, analyze = args.pop('seed'), not args.pop('no_analyze')
+
+    setup_logging()
+    db = Database()
+    db.connect()
+    summary = generate(db, seed, analyze, **args)
+    log.info("Синтетические данные записаны", seconds=round(summary['seconds'], 1), rows=summary['rows'])
+
+
+if __name__ == '__main__':
+    main()
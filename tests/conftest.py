@@ -0,0 +1,95 @@
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+# Модули приложения лежат в корне репозитория
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_classes import ValueIndicator  # noqa: E402
+from values_store import CODE_COLUMNS, DATE_COLUMNS, SUM_COLUMN, ValuesStore  # noqa: E402
+
+
+def make_value(indicator, start, end, total, dzo=1, analytic_1=None, analytic_2=None, analytic_3=None):
+    """Запись ValueIndicator, как ее отдает Database"""
+    return ValueIndicator({
+        'Код показателя': indicator,
+        'Код аналитики 1': analytic_1,
+        'Код аналитики 2': analytic_2,
+        'Код аналитики 3': analytic_3,
+        'Сумма': total,
+        'Дата начала периода': start,
+        'Дата окончания периода': end,
+        'ДЗО': dzo,
+    })
+
+
+def make_store(values) -> ValuesStore:
+    """Снимок из записей ValueIndicator, как после выгрузки таблицы значений"""
+    frame = pd.DataFrame({
+        DATE_COLUMNS['start']: [value.date_period_start.isoformat() for value in values],
+        DATE_COLUMNS['end']: [value.date_period_end.isoformat() for value in values],
+        CODE_COLUMNS['indicator']: [value.id_indicator for value in values],
+        CODE_COLUMNS['analytic_1']: [value.analytic_1 for value in values],
+        CODE_COLUMNS['analytic_2']: [value.analytic_2 for value in values],
+        CODE_COLUMNS['analytic_3']: [value.analytic_3 for value in values],
+        CODE_COLUMNS['dzo']: pd.array([value.dzo for value in values], dtype='Int64'),
+        SUM_COLUMN: [value.sum_value for value in values],
+    })
+    return ValuesStore.from_frame(frame)
+
+
+def replay(values, changes, apply) -> list:
+    """Применить изменения (запись до, запись после) через apply(old, new);
+    возвращает записи после всех изменений, чтобы сравнить результат с расчетом с нуля"""
+    current = list(values)
+    for old, new in changes:
+        apply(old, new)
+        if old is not None:
+            current.remove(old)
+        if new is not None:
+            current.append(new)
+    return current
+
+
+def assert_same_rows(frame: pd.DataFrame, expected: pd.DataFrame, approx=(SUM_COLUMN,)):
+    """Таблицы совпадают с точностью до порядка строк; колонки approx сравниваются приближенно"""
+    assert list(frame.columns) == list(expected.columns)
+    keys = [position for position, column in enumerate(expected.columns) if column not in approx]
+    rows, expected_rows = _rows(frame, keys), _rows(expected, keys)
+    assert [[row[i] for i in keys] for row in rows] == [[row[i] for i in keys] for row in expected_rows]
+    for position, column in enumerate(expected.columns):
+        if column in approx:
+            assert [row[position] for row in rows] == \
+                pytest.approx([row[position] for row in expected_rows], nan_ok=True)
+
+
+def _rows(frame: pd.DataFrame, keys: list) -> list:
+    frame = frame.astype(object)
+    frame = frame.where(frame.notna(), None)
+    return sorted(frame.itertuples(index=False, name=None), key=lambda row: str([row[i] for i in keys]))
+
+
+def month_values(indicator, months, total=1.0, **fields):
+    """Месячные значения показателя за месяцы 'YYYY-MM'; сумма - число или функция месяца"""
+    values = []
+    for month in months:
+        start = pd.Period(month, 'M')
+        amount = total(month) if callable(total) else total
+        values.append(make_value(indicator, start.start_time.date().isoformat(),
+                                 start.end_time.date().isoformat(), amount, **fields))
+    return values
+
+
+@pytest.fixture
+def values():
+    """Небольшой набор значений: два показателя, два ДЗО, аналитики и пропуски сумм"""
+    months = ['2023-01', '2023-02', '2023-03', '2023-05', '2023-12', '2024-01', '2024-02']
+    result = []
+    result += month_values('P1', months, lambda month: float(int(month[-2:]) * 10), dzo=1)
+    result += month_values('P1', months[:4], 5.0, dzo=2, analytic_1='A1')
+    result += month_values('P2', months, lambda month: float(int(month[:4]) - 2020), dzo=1)
+    result += month_values('P2', months[2:], 2.0, dzo=2, analytic_1='A1')
+    result += month_values('P3', months[:3], None, dzo=1)
+    return result
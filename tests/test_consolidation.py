@@ -0,0 +1,45 @@
+import pytest
+
+from conftest import assert_same_rows, make_store, make_value, replay
+from consolidation import ConsolidationEngine
+from data_classes import DZOGroup
+
+
+def _group(group_id, name, parent_id=None):
+    return DZOGroup({'Идентификатор группы': group_id, 'Наименование': name, 'Родительская группа': parent_id})
+
+
+GROUPS = [_group(1, 'Холдинг'), _group(2, 'Дивизион', 1), _group(3, 'Отдельная')]
+# ДЗО 1 входит в холдинг через дивизион, ДЗО 3 - в дивизион и в отдельную группу
+MEMBERS = [(2, 1), (1, 2), (2, 3), (3, 3)]
+
+
+def test_nested_groups_total(values):
+    engine = ConsolidationEngine(GROUPS, MEMBERS, make_store(values))
+
+    january = ('2023-01-01', '2023-01-31')
+    assert engine.total(2, 'P1', *january) == 10.0
+    assert engine.total(1, 'P1', *january) == 15.0
+    assert engine.total(3, 'P1', *january) == 0.0
+
+
+def test_apply_change_matches_rebuild(values):
+    engine = ConsolidationEngine(GROUPS, MEMBERS, make_store(values))
+
+    current = replay(values, [
+        # Новое значение ДЗО, которого еще не было в снимке
+        (None, make_value('P1', '2023-01-01', '2023-01-31', 4.0, dzo=3)),
+        # Изменение суммы и изменение ключа
+        (values[0], make_value('P1', '2023-01-01', '2023-01-31', 12.5, dzo=1)),
+        (values[8], make_value('P1', '2023-03-01', '2023-03-31', 6.0, dzo=1, analytic_1='A1')),
+        # Пустая сумма и удаление последнего значения периода
+        (values[11], make_value('P2', '2023-01-01', '2023-01-31', None, dzo=1)),
+        (values[6], None),
+    ], engine.apply_change)
+
+    assert_same_rows(engine.to_frame(), ConsolidationEngine(GROUPS, MEMBERS, make_store(current)).to_frame())
+
+
+def test_nested_group_cycle():
+    with pytest.raises(ValueError):
+        ConsolidationEngine([_group(1, 'А', 2), _group(2, 'Б', 1)], [])
@@ -0,0 +1,61 @@
+import pandas as pd
+import pytest
+
+from conftest import make_store, make_value
+from cube import TOTAL_LABEL, ValuesCube
+
+# Квартал и год не выводятся из месяца: детальная группировка содержит их явно
+FINE = ('indicator', 'dzo', 'analytic_1', 'month', 'quarter', 'year')
+COARSER = [
+    ('indicator', 'dzo', 'month'),
+    ('indicator', 'quarter'),
+    ('dzo', 'year'),
+    ('month', 'indicator'),
+    ('analytic_1',),
+    (),
+]
+
+
+@pytest.mark.parametrize('dimensions', COARSER)
+@pytest.mark.parametrize('filters', [None, {'indicator_id': ['P1', 'P3']}])
+def test_roll_up_from_cache_matches_scan(values, dimensions, filters):
+    cached = ValuesCube(make_store(values))
+    cached.group(FINE, filters)
+    rolled = cached.group(dimensions, filters)
+    assert cached.stats()['rollups'] == 1
+
+    fresh = ValuesCube(make_store(values))
+    scanned = fresh.group(dimensions, filters)
+    assert fresh.stats()['scans'] == 1
+
+    pd.testing.assert_frame_equal(rolled, scanned, check_dtype=False)
+
+
+def test_cache_hit_ignores_dimension_order(values):
+    cube = ValuesCube(make_store(values))
+    first = cube.group(('dzo', 'indicator'))
+
+    second = cube.group(('indicator', 'dzo'))
+
+    assert cube.stats()['hits'] == 1
+    pd.testing.assert_series_equal(first['sum'].swaplevel().sort_index(), second['sum'])
+
+
+def test_cache_dropped_after_store_change(values):
+    store = make_store(values)
+    cube = ValuesCube(store)
+    before = cube.group(('indicator',))['sum']['P1']
+
+    store.upsert([make_value('P1', '2030-01-01', '2030-01-31', 1000.0)])
+
+    assert cube.group(('indicator',))['sum']['P1'] == before + 1000.0
+    assert cube.stats()['scans'] == 2
+
+
+def test_pivot_margins(values):
+    cube = ValuesCube(make_store(values))
+
+    table = cube.pivot('indicator', 'dzo', margins=True)
+
+    assert table.loc[TOTAL_LABEL, TOTAL_LABEL] == pytest.approx(sum(v.sum_value or 0 for v in values))
+    assert table.loc['P1', TOTAL_LABEL] == pytest.approx(table.loc['P1', [1, 2]].sum())
@@ -0,0 +1,110 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import assert_same_rows, make_store, make_value, replay
+from formulas import Formula, FormulaEngine, evaluation_order
+
+FORMULAS = {
+    'F1': '[P1] / [P2] * 100',
+    'F2': 'nvl([F1], 0) + [P1]',
+    'F3': 'max([F2], [P2]) - abs([P3])',
+}
+
+
+def test_formula_values(values):
+    engine = FormulaEngine(FORMULAS, make_store(values))
+
+    assert engine.value('F1', 1, '2023-03-01', '2023-03-31') == pytest.approx(30 / 3 * 100)
+    assert engine.value('F2', 2, '2023-03-01', '2023-03-31', analytic_1='A1') == pytest.approx(5 / 2 * 100 + 5)
+    # Нет значений по ключу или пустая сумма в ссылке - значения формулы нет
+    assert engine.value('F1', 2, '2023-05-01', '2023-05-31') is None
+    assert engine.value('F3', 1, '2023-03-01', '2023-03-31') is None
+
+
+def test_division_by_zero_gives_no_value():
+    store = make_store([
+        make_value('P1', '2023-01-01', '2023-01-31', 5.0),
+        make_value('P2', '2023-01-01', '2023-01-31', 0.0),
+    ])
+    engine = FormulaEngine(FORMULAS, store)
+
+    assert engine.value('F1', 1, '2023-01-01', '2023-01-31') is None
+    assert engine.value('F2', 1, '2023-01-01', '2023-01-31') == 5.0
+
+
+def test_partial_refresh_matches_full_rebuild(values):
+    engine = FormulaEngine(FORMULAS, make_store(values))
+    engine.refresh()
+    evaluations = engine.evaluations
+
+    current = replay(values, [
+        (values[0], make_value('P1', '2023-01-01', '2023-01-31', 40.0, dzo=1)),
+        (None, make_value('P2', '2023-02-01', '2023-02-28', 0.0, dzo=2, analytic_1='A1')),
+        (None, make_value('P3', '2024-01-01', '2024-01-31', -2.0, dzo=1)),
+        # Смена ключа: значение уходит из одного периода в другой
+        (values[2], make_value('P1', '2023-04-01', '2023-04-30', 7.0, dzo=1)),
+        # После удаления у формул периода не остается входных значений
+        (values[6], None),
+        (values[17], None),
+    ], engine.apply_change)
+    engine.refresh()
+
+    assert engine.evaluations == evaluations
+    assert engine.partial_evaluations == len(FORMULAS)
+    assert_same_rows(engine.to_frame(), FormulaEngine(FORMULAS, make_store(current)).to_frame())
+
+
+def test_set_formula_recomputes_dependents(values):
+    engine = FormulaEngine(FORMULAS, make_store(values))
+    engine.refresh()
+
+    engine.set_formula('F1', '[P1] - [P2]')
+
+    expected = FormulaEngine(dict(FORMULAS, F1='[P1] - [P2]'), make_store(values))
+    assert_same_rows(engine.to_frame(), expected.to_frame())
+
+
+def test_evaluation_order_and_cycles():
+    formulas = {code: Formula(code, expression) for code, expression in FORMULAS.items()}
+    assert evaluation_order(formulas) == ['F1', 'F2', 'F3']
+
+    with pytest.raises(ValueError):
+        evaluation_order({'A': Formula('A', '[B] + 1'), 'B': Formula('B', '[A] * 2')})
+    with pytest.raises(ValueError):
+        Formula('A', '__import__("os")')
+
+
+@pytest.mark.parametrize('expression', [
+    # Лишний аргумент ufunc numpy записал бы результат в массив показателя
+    'abs([P1], [P2])',
+    'min([P1], [P2], [P3])',
+    'min([P1])',
+    'nvl([P1])',
+    # Функция без вызова
+    'abs',
+    'max + [P1]',
+    'abs(*[P1])',
+    '[P1](2)',
+    'abs(x=[P1])',
+])
+def test_function_calls_rejected(expression):
+    with pytest.raises(ValueError):
+        Formula('F', expression)
+
+
+def test_function_calls_do_not_modify_inputs():
+    first, second = np.array([1.0, -2.0]), np.array([3.0, np.nan])
+
+    result = Formula('F', 'min([P1], [P2]) + abs([P1]) + nvl([P2], 0)').evaluate([first, second])
+
+    np.testing.assert_array_equal(result, [5.0, np.nan])
+    np.testing.assert_array_equal(first, [1.0, -2.0])
+    np.testing.assert_array_equal(second, [3.0, np.nan])
+
+
+def test_empty_results_frame():
+    engine = FormulaEngine({'F1': '[P1] + 1'}, make_store([make_value('P2', '2023-01-01', '2023-01-31', 1.0)]))
+
+    assert isinstance(engine.to_frame(), pd.DataFrame)
+    assert engine.to_frame().empty
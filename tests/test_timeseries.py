@@ -0,0 +1,87 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import make_store, month_values
+from timeseries import period_over_period, resample
+
+NAN = np.nan
+
+
+def _p1(values, frequency='month'):
+    return resample(make_store(values), frequency, {'indicator_id': 'P1', 'dzo_id': 1})
+
+
+def test_resample_buckets(values):
+    series = _p1(values, 'quarter')
+
+    frame = series.to_frame()
+    assert frame['Период'].tolist() == list(pd.to_datetime(['2023-01-01', '2023-04-01', '2023-10-01', '2024-01-01']))
+    assert series.sums.tolist() == [60.0, 50.0, 120.0, 30.0]
+    assert series.counts.tolist() == [3, 1, 1, 2]
+
+
+def test_shift_across_missing_buckets(values):
+    # Месяцы P1 по ДЗО 1: 2023-01..03, 2023-05, 2023-12, 2024-01..02; апреля и лета нет
+    series = _p1(values)
+
+    np.testing.assert_array_equal(series.shift(1), [NAN, 10, 20, NAN, NAN, 120, 10])
+    np.testing.assert_array_equal(series.shift(2), [NAN, NAN, 10, 30, NAN, NAN, 120])
+    np.testing.assert_array_equal(series.shift(12), [NAN, NAN, NAN, NAN, NAN, 10, 20])
+    np.testing.assert_array_equal(_p1(values, 'quarter').shift(1), [NAN, 60, NAN, 120])
+
+
+def test_compare_across_missing_buckets(values):
+    frame = _p1(values).compare(1)
+
+    np.testing.assert_array_equal(frame['Предыдущее значение'], [NAN, 10, 20, NAN, NAN, 120, 10])
+    np.testing.assert_array_equal(frame['Изменение'], [NAN, 10, 10, NAN, NAN, -110, 10])
+    np.testing.assert_allclose(frame['Темп прироста'], [NAN, 1.0, 0.5, NAN, NAN, -110 / 120, 1.0])
+
+
+def test_compare_does_not_cross_series(values):
+    frame = period_over_period(make_store(values), 'mom', filters={'indicator_id': ['P1', 'P2']})
+
+    # Первый месяц каждого ряда не сравнивается с последним месяцем предыдущего ряда
+    firsts = frame.groupby(['Код показателя', 'ДЗО', 'Код аналитики 1'], dropna=False, sort=False).head(1)
+    assert len(firsts) == 4
+    assert firsts['Предыдущее значение'].isna().all()
+
+
+def test_compare_with_zero_and_empty_previous():
+    values = month_values('P1', ['2023-01', '2023-02', '2023-03'], {'2023-01': 0.0, '2023-02': 5.0}.get)
+
+    frame = resample(make_store(values)).compare(1)
+
+    np.testing.assert_array_equal(frame['Изменение'], [NAN, 5, NAN])
+    assert frame['Темп прироста'].isna().all()
+
+
+def test_year_over_year(values):
+    frame = _p1(values, 'quarter').year_over_year()
+
+    np.testing.assert_array_equal(frame['Предыдущее значение'], [NAN, NAN, NAN, 60])
+
+
+def test_running_total_resets_each_year(values):
+    series = _p1(values)
+
+    np.testing.assert_array_equal(series.running_total(), [10, 30, 60, 110, 230, 240, 260])
+    np.testing.assert_array_equal(series.running_total(reset='year'), [10, 30, 60, 110, 230, 10, 30])
+    np.testing.assert_array_equal(series.running_total(reset='quarter'), [10, 30, 60, 50, 120, 10, 30])
+
+
+def test_running_total_restarts_per_series(values):
+    series = resample(make_store(values), filters={'indicator_id': 'P1'})
+
+    totals = series.running_total(reset='year')
+
+    starts = np.flatnonzero(np.diff(series.series, prepend=-1))
+    assert len(starts) == 2
+    np.testing.assert_array_equal(totals[starts], series.sums[starts])
+    assert totals[-1] == pytest.approx(5.0 * 4)
+
+
+def test_unknown_frequency(values):
+    with pytest.raises(ValueError):
+        resample(make_store(values), 'week')
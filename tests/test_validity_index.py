@@ -0,0 +1,81 @@
+import pytest
+
+from data_classes import Indicator
+from validity_index import ValidityIndex
+
+
+def _indicator(code, start, end):
+    return Indicator({'Код показателя': code, 'Дата начала периода': start, 'Дата конца периода': end})
+
+
+@pytest.fixture
+def index():
+    return ValidityIndex([
+        _indicator('P1', '2023-01-01', '2023-12-31'),
+        _indicator('P2', None, '2023-06-30'),
+        _indicator('P3', '2023-07-01', None),
+        _indicator('P4', '2023-06-15', '2023-06-15'),
+        # Период с концом раньше начала не действует ни на одну дату
+        _indicator('P5', '2023-02-01', '2023-01-01'),
+    ], key=lambda indicator: indicator.id)
+
+
+@pytest.mark.parametrize('code, date, expected', [
+    ('P1', '2022-12-31', False),
+    ('P1', '2023-01-01', True),
+    ('P1', '2023-12-31', True),
+    ('P1', '2024-01-01', False),
+    ('P2', '0001-01-01', True),
+    ('P2', '2023-06-30', True),
+    ('P2', '2023-07-01', False),
+    ('P3', '2023-06-30', False),
+    ('P3', '2023-07-01', True),
+    ('P3', '9999-12-31', True),
+    ('P4', '2023-06-14', False),
+    ('P4', '2023-06-15', True),
+    ('P4', '2023-06-16', False),
+    ('P5', '2023-01-15', False),
+    ('нет такого', '2023-01-15', False),
+])
+def test_covers_date_at_edges(index, code, date, expected):
+    assert index.covers(code, date) is expected
+    assert (code in index.valid_keys(date)) is expected
+
+
+@pytest.mark.parametrize('code, start, end, expected', [
+    ('P1', '2023-01-01', '2023-12-31', True),
+    ('P1', '2022-12-31', '2023-01-31', False),
+    ('P1', '2023-12-01', '2024-01-01', False),
+    ('P2', '2023-06-01', '2023-06-30', True),
+    ('P2', '2023-06-01', '2023-07-01', False),
+    ('P3', '2023-07-01', '9999-12-31', True),
+    ('P4', '2023-06-15', '2023-06-15', True),
+    ('P4', '2023-06-15', '2023-06-16', False),
+])
+def test_covers_period_at_edges(index, code, start, end, expected):
+    assert index.covers(code, start, end) is expected
+
+
+def test_covers_adjacent_and_overlapping_intervals():
+    index = ValidityIndex([
+        _indicator('P1', '2023-01-01', '2023-06-30'),
+        _indicator('P1', '2023-07-01', '2023-09-30'),
+        _indicator('P1', '2023-08-01', '2023-12-31'),
+        _indicator('P1', '2024-02-01', '2024-12-31'),
+    ], key=lambda indicator: indicator.id)
+
+    assert index.covers('P1', '2023-06-01', '2023-07-31')
+    assert index.covers('P1', '2023-01-01', '2023-12-31')
+    assert not index.covers('P1', '2023-12-01', '2024-02-29')
+    assert not index.covers('P1', '2024-01-15')
+    assert index.covers('P1', '2024-02-01', '2024-12-31')
+    assert 'P1' not in index.spans()
+
+
+def test_spans(index):
+    spans = index.spans()
+
+    assert spans['P1'] == ('2023-01-01', '2023-12-31')
+    assert spans['P2'] == ('0001-01-01', '2023-06-30')
+    assert spans['P3'] == ('2023-07-01', '9999-12-31')
+    assert 'P5' not in spans
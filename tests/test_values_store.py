@@ -0,0 +1,108 @@
+import datetime
+
+import numpy as np
+import pytest
+
+from conftest import assert_same_rows, make_store, make_value, replay
+from values_store import ValuesStore, values_filter_clause
+
+
+def test_upsert_batch(values):
+    store = make_store(values[:10])
+    changed = make_value(values[3].id_indicator, values[3].date_period_start, values[3].date_period_end, 99.0,
+                         dzo=values[3].dzo)
+    added = make_value('P9', '2023-01-01', '2023-01-31', 1.5, dzo=3, analytic_2='B')
+
+    # Дубль ключа внутри пачки добавляется один раз
+    result = store.upsert([changed, added, added])
+
+    assert result == {'inserted': 1, 'updated': 1}
+    assert_same_rows(store.to_frame(), make_store(values[:3] + [changed] + values[4:10] + [added]).to_frame())
+
+
+def test_upsert_treats_empty_analytic_as_null():
+    store = make_store([make_value('P1', '2023-01-01', '2023-01-31', 1.0)])
+
+    result = store.upsert([make_value('P1', '2023-01-01', '2023-01-31', 2.0, analytic_1='')])
+
+    assert result == {'inserted': 0, 'updated': 1}
+    assert store.total() == 2.0
+
+
+def test_changes_match_rebuild(values):
+    store = make_store(values)
+
+    def apply(old, new):
+        if old is not None and new is not None:
+            store.replace(old, new)
+        elif new is not None:
+            store.upsert([new])
+        else:
+            store.delete([old])
+
+    current = replay(values, [
+        (values[0], make_value('P1', '2022-12-01', '2022-12-31', 7.0, dzo=1)),
+        (values[1], make_value('P1', values[1].date_period_start, values[1].date_period_end, 3.0, dzo=1)),
+        (None, make_value('P9', '2023-01-01', '2023-01-31', None, dzo=3, analytic_3='C')),
+        (values[5], None),
+    ], apply)
+
+    assert_same_rows(store.to_frame(), make_store(current).to_frame())
+
+
+def test_delete_unknown_key(values):
+    store = make_store(values)
+    unknown = make_value('P1', '2023-01-01', '2023-01-31', 1.0, analytic_3='нет такой')
+
+    assert store.delete([unknown, values[0], values[0]]) == 1
+    assert len(store) == len(values) - 1
+
+
+def test_changes_bump_version(values):
+    store = make_store(values)
+    version = store.version
+
+    store.upsert([values[0]])
+    assert store.version == version + 1
+    store.delete([make_value('P1', '1999-01-01', '1999-01-31', 1.0)])
+    assert store.version == version + 1
+    store.delete([values[0]])
+    assert store.version == version + 2
+
+
+def test_mask_filters(values):
+    store = make_store(values)
+
+    mask = store.mask({'indicator_id': 'P1', 'dzo_id': '2', 'date_from': '2023-02-01'})
+
+    assert mask.sum() == 3
+    assert set(store.decode('analytic_1', mask)) == {'A1'}
+    assert not store.mask({'indicator_id': 'нет такого'}).any()
+    assert store.mask({'analytic_1': ['A1', None]}).all()
+
+
+def test_empty_store():
+    store = ValuesStore.empty()
+
+    assert len(store) == 0
+    assert store.upsert([make_value('P1', '2023-01-01', '2023-01-31', 1.0)]) == {'inserted': 1, 'updated': 0}
+    assert np.array_equal(store.decode('indicator'), np.array(['P1'], dtype=object))
+
+
+def test_total_skips_empty_sums(values):
+    store = make_store(values)
+
+    assert store.total() == pytest.approx(sum(value.sum_value for value in values if value.sum_value is not None))
+    assert store.total(store.mask({'indicator_id': 'P3'})) == 0.0
+
+
+def test_values_filter_clause():
+    where, params = values_filter_clause(
+        {'date_from': '01.02.2023', 'indicator_id': ['P1', 'P2'], 'dzo_id': 3, 'analytic_1': '', 'analytic_2': None},
+        alias='t',
+    )
+
+    assert where == ['t."Дата начала периода" >= %s', 't."Код показателя" = ANY(%s)', 't."ДЗО" = %s']
+    assert params == [datetime.date(2023, 2, 1), ['P1', 'P2'], 3]
+    with pytest.raises(ValueError):
+        values_filter_clause({'unknown': 1})
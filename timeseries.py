@@ -0,0 +1,156 @@
+import numpy as np
+import pandas as pd
+
+from values_store import CODE_COLUMNS, ValuesStore
+
+# Шаг календарной корзины в месяцах; значение попадает в корзину по дате начала периода
+FREQUENCIES = {'month': 1, 'quarter': 3, 'year': 12}
+# Сравнения период к периоду: (частота, сдвиг в периодах этой частоты); yoy - на той частоте, что задана
+COMPARISONS = {'mom': ('month', 1), 'qoq': ('quarter', 1), 'yoy': (None, None)}
+# Поля ряда: отдельный ряд для каждого показателя, ДЗО и набора аналитик
+SERIES_FIELDS = ('indicator', 'dzo', 'analytic_1', 'analytic_2', 'analytic_3')
+
+
+class PeriodSeries:
+    """Все ряды значений, сведенные к календарным корзинам одной частоты.
+    Строки отсортированы по (ряд, корзина); сдвиги и накопленные итоги считаются по всем рядам сразу"""
+
+    def __init__(self, store: ValuesStore, frequency: str, series: np.ndarray, keys: np.ndarray,
+                 months: np.ndarray, sums: np.ndarray, counts: np.ndarray):
+        self.store = store
+        self.frequency = frequency
+        self.series = series               # номер ряда строки
+        self.keys = keys                   # коды SERIES_FIELDS для каждого номера ряда
+        self.months = months               # корзина: номер первого месяца от 1970-01
+        self.sums = sums
+        self.counts = counts
+
+    def __len__(self):
+        return len(self.sums)
+
+    def _positions(self, lag_months: int) -> np.ndarray:
+        """Позиции строк того же ряда на lag_months месяцев раньше, -1 если такой корзины нет"""
+        keys = _row_keys(self.series, self.months)
+        wanted = _row_keys(self.series, self.months - lag_months)
+        found = np.minimum(np.searchsorted(keys, wanted), max(len(keys) - 1, 0))
+        positions = np.full(len(keys), -1, dtype=np.int64)
+        if len(keys):
+            hit = keys[found] == wanted
+            positions[hit] = found[hit]
+        return positions
+
+    def shift(self, periods: int = 1) -> np.ndarray:
+        """Значения того же ряда на periods корзин раньше (NaN, если значения не было)"""
+        positions = self._positions(periods * FREQUENCIES[self.frequency])
+        previous = np.full(len(self), np.nan)
+        found = positions >= 0
+        previous[found] = self.sums[positions[found]]
+        return previous
+
+    def compare(self, periods: int = 1) -> pd.DataFrame:
+        """Сравнение с корзиной на periods раньше: предыдущее значение, разница и темп прироста (доля)"""
+        previous = self.shift(periods)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            change = self.sums - previous
+            ratio = change / np.abs(previous)
+        ratio[~np.isfinite(ratio)] = np.nan
+        frame = self.to_frame()
+        frame['Предыдущее значение'] = previous
+        frame['Изменение'] = change
+        frame['Темп прироста'] = ratio
+        return frame
+
+    def year_over_year(self) -> pd.DataFrame:
+        return self.compare(12 // FREQUENCIES[self.frequency])
+
+    def running_total(self, reset: str = None) -> np.ndarray:
+        """Накопленный итог по каждому ряду; reset='year' или 'quarter' начинает накопление заново
+        с каждого года или квартала (итог с начала года/квартала)"""
+        sums = np.nan_to_num(self.sums)
+        total = np.cumsum(sums)
+        starts = np.ones(len(self), dtype=bool)
+        if len(self):
+            starts[1:] = self.series[1:] != self.series[:-1]
+            if reset is not None:
+                bucket = self.months - self.months % FREQUENCIES[reset]
+                starts[1:] |= bucket[1:] != bucket[:-1]
+        # Из накопленной суммы вычитается накопленное до первой строки текущего отрезка
+        segment_start = np.maximum.accumulate(np.where(starts, np.arange(len(self)), 0))
+        return total - (total - sums)[segment_start]
+
+    def to_frame(self) -> pd.DataFrame:
+        """Ряды в колонках таблицы значений: поля ряда, начало корзины, сумма и число исходных значений"""
+        frame = {}
+        for index, field in enumerate(SERIES_FIELDS):
+            frame[CODE_COLUMNS[field]] = self.store.dictionaries[field].decode(self.keys[self.series, index])
+        frame['Период'] = self.months.astype('datetime64[M]').astype('datetime64[D]')
+        frame['Сумма'] = self.sums
+        frame['Количество'] = self.counts
+        return pd.DataFrame(frame)
+
+
+def resample(store: ValuesStore, frequency: str = 'month', filters: dict = None) -> PeriodSeries:
+    """Свести значения к календарным корзинам (month, quarter, year) для каждого ряда.
+    Фильтры - как у ValuesStore.mask; значения без даты начала периода пропускаются"""
+    if frequency not in FREQUENCIES:
+        raise ValueError(f"Неизвестная частота: {frequency}")
+    rows = store.mask(filters) & ~np.isnat(store.start)
+    months = store.start[rows].astype('datetime64[M]').astype(np.int64)
+    months -= months % FREQUENCIES[frequency]
+    sums = store.sums[rows]
+    codes = [store.codes[field][rows] for field in SERIES_FIELDS]
+    sizes = [len(store.dictionaries[field]) + 1 for field in SERIES_FIELDS]
+
+    # Ключ строки (ряд, корзина) одним числом: сортировка ключей упорядочивает строки по ряду и времени,
+    # а сдвиг по времени становится поиском по отсортированному массиву
+    base = int(months.min()) if len(months) else 0
+    span = int(months.max()) - base + 1 if len(months) else 1
+    if np.prod(sizes, dtype=float) * span < 2.0 ** 62:
+        # Коды -1..size-2 сдвигаются на 1 и складываются в смешанной системе счисления
+        combined = np.zeros(len(months), dtype=np.int64)
+        for field_codes, size in zip(codes, sizes):
+            combined *= size
+            combined += field_codes + 1
+        cells, inverse = np.unique(combined * span + (months - base), return_inverse=True)
+        cell_series, cell_months = np.divmod(cells, span)
+        cell_months += base
+        starts = np.ones(len(cells), dtype=bool)
+        starts[1:] = cell_series[1:] != cell_series[:-1]
+        series = np.cumsum(starts) - 1
+        keys = _radix_decode(cell_series[starts], sizes)
+    else:
+        keys, row_series = np.unique(np.column_stack(codes).astype(np.int64), axis=0, return_inverse=True)
+        cells, inverse = np.unique(_row_keys(row_series.reshape(-1), months), return_inverse=True)
+        series, cell_months = cells >> 32, (cells & 0xFFFFFFFF) - _MONTH_OFFSET
+
+    valid = ~np.isnan(sums)
+    totals = np.bincount(inverse, weights=np.where(valid, sums, 0.0), minlength=len(cells))
+    counts = np.bincount(inverse, minlength=len(cells))
+    totals[np.bincount(inverse, weights=valid, minlength=len(cells)) == 0] = np.nan
+    return PeriodSeries(store, frequency, series, keys, cell_months, totals, counts)
+
+
+def period_over_period(store: ValuesStore, comparison: str = 'mom', frequency: str = 'month',
+                       filters: dict = None) -> pd.DataFrame:
+    """Сравнение mom (месяц к месяцу), qoq (квартал к кварталу) или yoy (год к году на частоте frequency)"""
+    if comparison not in COMPARISONS:
+        raise ValueError(f"Неизвестное сравнение: {comparison}")
+    comparison_frequency, periods = COMPARISONS[comparison]
+    series = resample(store, comparison_frequency or frequency, filters)
+    return series.compare(periods) if periods else series.year_over_year()
+
+
+# Месяцы до 1970 отрицательны; в ключе строки они сдвигаются в неотрицательный диапазон
+_MONTH_OFFSET = 1 << 31
+
+
+def _row_keys(series: np.ndarray, months: np.ndarray) -> np.ndarray:
+    return (series.astype(np.int64) << 32) | (months + _MONTH_OFFSET)
+
+
+def _radix_decode(combined: np.ndarray, sizes: list) -> np.ndarray:
+    """Коды полей ряда из числа в смешанной системе счисления"""
+    keys = np.empty((len(combined), len(sizes)), dtype=np.int64)
+    for index in range(len(sizes) - 1, -1, -1):
+        combined, keys[:, index] = np.divmod(combined, sizes[index])
+    return keys - 1
@@ -0,0 +1,103 @@
+import datetime
+from bisect import bisect_right
+
+from date_parsing import parse_date
+
+# Пустая дата начала или конца - период действия не ограничен с этой стороны
+_MIN = datetime.date.min
+_MAX = datetime.date.max
+_DAY = datetime.timedelta(days=1)
+
+
+class ValidityIndex:
+    """Индекс периодов действия записей справочника (показателей, аналитик).
+    Границы периодов отсортированы; для каждого отрезка между соседними границами хранятся действующие ключи,
+    поэтому "что действовало на дату" - один bisect. Дата конца периода включается в период"""
+
+    def __init__(self, records, key):
+        # key(record) - ключ записи, как в REFERENCE_TABLES
+        self.records = {}
+        self._intervals = {}               # ключ -> (начала, концы) непересекающихся интервалов по возрастанию
+        self._spans = None
+        events = []
+        for record in records:
+            record_key = key(record)
+            start = parse_date(record.date_period_start) or _MIN
+            end = parse_date(record.date_period_end) or _MAX
+            self.records[record_key] = record
+            self._intervals.setdefault(record_key, []).append((start, end))
+            if start > end:
+                continue
+            events.append((start, 1, record_key))
+            if end < _MAX:
+                events.append((end + _DAY, -1, record_key))
+        for record_key, intervals in self._intervals.items():
+            # Пересекающиеся и смежные интервалы сливаются: период, покрытый ими подряд, покрыт записью
+            starts, ends = [], []
+            for start, end in sorted(intervals):
+                if start > end:
+                    continue
+                if ends and (start <= ends[-1] or start - ends[-1] == _DAY):
+                    ends[-1] = max(ends[-1], end)
+                else:
+                    starts.append(start)
+                    ends.append(end)
+            self._intervals[record_key] = (starts, ends)
+
+        # Проход по границам: после каждой границы запоминается набор действующих ключей
+        events.sort(key=lambda event: event[0])
+        self._boundaries = [_MIN]
+        self._segments = [()]
+        active = {}
+        index = 0
+        while index < len(events):
+            boundary = events[index][0]
+            while index < len(events) and events[index][0] == boundary:
+                _, delta, record_key = events[index]
+                active[record_key] = active.get(record_key, 0) + delta
+                if not active[record_key]:
+                    del active[record_key]
+                index += 1
+            segment = tuple(sorted(active, key=str))
+            if boundary == self._boundaries[-1]:
+                self._segments[-1] = segment
+            else:
+                self._boundaries.append(boundary)
+                self._segments.append(segment)
+
+    def __len__(self):
+        return len(self.records)
+
+    def valid_keys(self, date) -> tuple:
+        """Ключи записей, действовавших на дату"""
+        return self._segments[bisect_right(self._boundaries, parse_date(date)) - 1]
+
+    def valid_on(self, date) -> list:
+        """Записи, действовавшие на дату"""
+        return [self.records[record_key] for record_key in self.valid_keys(date)]
+
+    def covers(self, record_key, date_start, date_end=None) -> bool:
+        """Действует ли запись весь период [date_start, date_end] (без date_end - на дату date_start)"""
+        intervals = self._intervals.get(record_key)
+        if intervals is None:
+            return False
+        starts, ends = intervals
+        start = parse_date(date_start) or _MIN
+        end = parse_date(date_end) or start
+        # Период покрыт, если последний интервал, начавшийся не позже начала периода, доходит до его конца
+        position = bisect_right(starts, start) - 1
+        return position >= 0 and ends[position] >= end
+
+    def spans(self) -> dict:
+        """Ключи записей с одним периодом действия -> (начало, конец) строками ISO, без ограничения -
+        крайние даты. По ним порцию дат можно проверить сравнением строк; остальные ключи - через covers"""
+        if self._spans is None:
+            self._spans = {
+                record_key: (starts[0].isoformat(), ends[0].isoformat())
+                for record_key, (starts, ends) in self._intervals.items()
+                if len(starts) == 1
+            }
+        return self._spans
+
+    def exists(self, record_key) -> bool:
+        return record_key in self.records
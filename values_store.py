@@ -0,0 +1,337 @@
+import io
+
+import numpy as np
+import pandas as pd
+
+from date_parsing import parse_date
+from schema import VALUES_TABLE
+
+# Поле хранилища -> колонка таблицы для колонок, хранимых кодами словаря
+CODE_COLUMNS = {
+    'indicator': 'Код показателя',
+    'analytic_1': 'Код аналитики 1',
+    'analytic_2': 'Код аналитики 2',
+    'analytic_3': 'Код аналитики 3',
+    'dzo': 'ДЗО',
+}
+DATE_COLUMNS = {
+    'start': 'Дата начала периода',
+    'end': 'Дата окончания периода',
+}
+SUM_COLUMN = 'Сумма'
+# Ключ значения, как в уникальном индексе таблицы (NULL в аналитиках равны между собой)
+KEY_FIELDS = ('indicator', 'start', 'end', 'analytic_1', 'analytic_2', 'analytic_3')
+# Фильтры значений (values_filter_clause, ValuesStore.mask) -> поле хранилища
+FILTER_FIELDS = {
+    'indicator_id': 'indicator',
+    'dzo_id': 'dzo',
+    'analytic_1': 'analytic_1',
+    'analytic_2': 'analytic_2',
+    'analytic_3': 'analytic_3',
+}
+# Атрибуты ValueIndicator -> поле хранилища
+RECORD_FIELDS = {
+    'id_indicator': 'indicator',
+    'analytic_1': 'analytic_1',
+    'analytic_2': 'analytic_2',
+    'analytic_3': 'analytic_3',
+    'dzo': 'dzo',
+}
+NULL_CODE = -1
+
+
+class Dictionary:
+    """Словарь кодирования колонки: значение <-> целочисленный код, NULL кодируется как -1"""
+
+    def __init__(self, values=()):
+        self.values = list(values)
+        self.codes = {value: code for code, value in enumerate(self.values)}
+
+    def __len__(self):
+        return len(self.values)
+
+    def encode(self, value) -> int:
+        """Код значения; новое значение добавляется в словарь"""
+        if value is None:
+            return NULL_CODE
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def lookup(self, value):
+        """Код значения без добавления: NULL_CODE для None, None для неизвестного значения"""
+        if value is None:
+            return NULL_CODE
+        return self.codes.get(value)
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        values = np.empty(len(self.values) + 1, dtype=object)
+        values[:-1] = self.values
+        values[-1] = None
+        # Код -1 указывает на последний элемент, то есть на None
+        return values[codes]
+
+
+class ValuesStore:
+    """Колоночный снимок таблицы значений показателей: даты - datetime64[D], суммы - float64,
+    коды показателя, аналитик и ДЗО - int32 со словарями. Фильтрация - векторные маски без циклов Python"""
+
+    def __init__(self, start: np.ndarray, end: np.ndarray, sums: np.ndarray, codes: dict, dictionaries: dict):
+        self.start = start
+        self.end = end
+        self.sums = sums
+        self.codes = codes
+        self.dictionaries = dictionaries
+        # Растет при каждом изменении; по нему производные кэши понимают, что снимок устарел
+        self.version = 0
+        self._key_index = None
+
+    @classmethod
+    def empty(cls) -> 'ValuesStore':
+        return cls(
+            np.empty(0, dtype='datetime64[D]'), np.empty(0, dtype='datetime64[D]'), np.empty(0, dtype=np.float64),
+            {field: np.empty(0, dtype=np.int32) for field in CODE_COLUMNS},
+            {field: Dictionary() for field in CODE_COLUMNS},
+        )
+
+    @classmethod
+    def from_frame(cls, frame: pd.DataFrame) -> 'ValuesStore':
+        """Построить снимок из DataFrame с колонками таблицы (даты - ISO-строки или даты)"""
+        codes, dictionaries = {}, {}
+        for field, column in CODE_COLUMNS.items():
+            field_codes, uniques = pd.factorize(frame[column], use_na_sentinel=True)
+            codes[field] = field_codes.astype(np.int32)
+            dictionaries[field] = Dictionary(uniques.tolist())
+        return cls(
+            _to_days(frame[DATE_COLUMNS['start']]),
+            _to_days(frame[DATE_COLUMNS['end']]),
+            pd.to_numeric(frame[SUM_COLUMN]).to_numpy(dtype=np.float64, na_value=np.nan, copy=True),
+            codes,
+            dictionaries,
+        )
+
+    @classmethod
+    def from_database(cls, db, filters: dict = None) -> 'ValuesStore':
+        """Загрузить снимок одной выгрузкой COPY TO (с необязательными фильтрами values_filter_clause)"""
+        where, params = values_filter_clause(filters)
+        columns = list(DATE_COLUMNS.values()) + list(CODE_COLUMNS.values()) + [SUM_COLUMN]
+        query = f'''
+            SELECT {', '.join(f'v."{column}"' for column in columns)}
+            FROM public."{VALUES_TABLE}" v
+            {'WHERE ' + ' AND '.join(where) if where else ''}
+        '''
+        buffer = io.BytesIO()
+        db.copy_to(query, tuple(params), buffer)
+        buffer.seek(0)
+        frame = pd.read_csv(
+            buffer,
+            dtype={column: str for column in columns if column != 'ДЗО'} | {'ДЗО': 'Int64', SUM_COLUMN: np.float64},
+            encoding='utf-8',
+        )
+        return cls.from_frame(frame)
+
+    def __len__(self):
+        return len(self.sums)
+
+    def mask(self, filters: dict = None) -> np.ndarray:
+        """Булева маска строк по тем же фильтрам, что и values_filter_clause:
+        date_from, date_to, indicator_id, dzo_id, analytic_1..3; значение - одно или список"""
+        mask = np.ones(len(self), dtype=bool)
+        for name, value in (filters or {}).items():
+            if value is None or value == '' or value == []:
+                continue
+            if name == 'date_from':
+                mask &= self.start >= np.datetime64(parse_date(value), 'D')
+            elif name == 'date_to':
+                mask &= self.end <= np.datetime64(parse_date(value), 'D')
+            elif name in FILTER_FIELDS:
+                field = FILTER_FIELDS[name]
+                wanted = value if isinstance(value, (list, tuple, set)) else [value]
+                dictionary = self.dictionaries[field]
+                known = [code for code in (dictionary.lookup(_normalize(field, item)) for item in wanted)
+                         if code is not None]
+                mask &= np.isin(self.codes[field], known)
+            else:
+                raise ValueError(f"Неизвестный фильтр значений: {name}")
+        return mask
+
+    def take(self, rows) -> 'ValuesStore':
+        """Снимок из выбранных строк (маска или индексы); словари общие с исходным снимком"""
+        return ValuesStore(
+            self.start[rows], self.end[rows], self.sums[rows],
+            {field: codes[rows] for field, codes in self.codes.items()},
+            self.dictionaries,
+        )
+
+    def total(self, mask: np.ndarray = None) -> float:
+        # Пустые суммы пропускаются, как в SUM на сервере
+        return float(np.nansum(self.sums if mask is None else self.sums[mask]))
+
+    def decode(self, field: str, rows=None) -> np.ndarray:
+        """Значения колонки field (объекты Python, None для NULL)"""
+        codes = self.codes[field] if rows is None else self.codes[field][rows]
+        return self.dictionaries[field].decode(codes)
+
+    def to_frame(self, mask: np.ndarray = None) -> pd.DataFrame:
+        """DataFrame с колонками таблицы; коды превращаются в категориальные колонки без копирования значений"""
+        rows = slice(None) if mask is None else mask
+        frame = {
+            DATE_COLUMNS['start']: self.start[rows],
+            DATE_COLUMNS['end']: self.end[rows],
+        }
+        for field, column in CODE_COLUMNS.items():
+            frame[column] = pd.Categorical.from_codes(
+                self.codes[field][rows], categories=pd.Index(self.dictionaries[field].values, dtype=object)
+            )
+        frame[SUM_COLUMN] = self.sums[rows]
+        return pd.DataFrame(frame)
+
+    # ---------- Инкрементальные изменения ----------
+
+    def upsert(self, records) -> dict:
+        """Применить новые и измененные записи ValueIndicator: совпадающие по ключу обновляются на месте,
+        остальные добавляются в конец"""
+        records = list(records)
+        if not records:
+            return {'inserted': 0, 'updated': 0}
+        encoded = self._encode(records)
+        positions = self._locate(encoded)
+        found = positions >= 0
+        rows = positions[found]
+        self.sums[rows] = encoded['sums'][found]
+        self.codes['dzo'][rows] = encoded['dzo'][found]
+
+        new = ~found
+        if new.any():
+            # Дубли ключа внутри пачки: берется последняя запись, как при слиянии импорта
+            new_rows = np.flatnonzero(new)
+            _, last = np.unique(_key_array(encoded)[new_rows][::-1], return_index=True)
+            new_rows = np.sort(new_rows[::-1][last])
+            self.start = np.concatenate([self.start, encoded['start'][new_rows]])
+            self.end = np.concatenate([self.end, encoded['end'][new_rows]])
+            self.sums = np.concatenate([self.sums, encoded['sums'][new_rows]])
+            for field in CODE_COLUMNS:
+                self.codes[field] = np.concatenate([self.codes[field], encoded[field][new_rows]])
+            self._key_index = None
+            inserted = len(new_rows)
+        else:
+            inserted = 0
+        self.version += 1
+        return {'inserted': inserted, 'updated': int(found.sum())}
+
+    def delete(self, records) -> int:
+        """Удалить записи по ключу ValueIndicator; возвращает число удаленных строк"""
+        records = list(records)
+        if not records:
+            return 0
+        positions = self._locate(self._encode(records, add=False))
+        positions = np.unique(positions[positions >= 0])
+        if len(positions):
+            keep = np.ones(len(self), dtype=bool)
+            keep[positions] = False
+            self.start, self.end, self.sums = self.start[keep], self.end[keep], self.sums[keep]
+            for field in CODE_COLUMNS:
+                self.codes[field] = self.codes[field][keep]
+            self._key_index = None
+            self.version += 1
+        return len(positions)
+
+    def replace(self, old_record, new_record):
+        """Отразить изменение записи, в том числе с изменением ключа"""
+        if _record_key(old_record) != _record_key(new_record):
+            self.delete([old_record])
+        self.upsert([new_record])
+
+    def _encode(self, records: list, add: bool = True) -> dict:
+        encoded = {
+            'start': np.array([parse_date(record.date_period_start) for record in records], dtype='datetime64[D]'),
+            'end': np.array([parse_date(record.date_period_end) for record in records], dtype='datetime64[D]'),
+            'sums': np.array([np.nan if record.sum_value is None else float(record.sum_value) for record in records]),
+        }
+        for attribute, field in RECORD_FIELDS.items():
+            dictionary = self.dictionaries[field]
+            values = [_normalize(field, getattr(record, attribute)) for record in records]
+            if add:
+                codes = [dictionary.encode(value) for value in values]
+            else:
+                # Неизвестное значение не может совпасть ни с одной строкой снимка
+                codes = [dictionary.lookup(value) for value in values]
+                codes = [-2 if code is None else code for code in codes]
+            encoded[field] = np.array(codes, dtype=np.int32)
+        return encoded
+
+    def _locate(self, encoded: dict) -> np.ndarray:
+        """Позиции строк снимка с ключами encoded или -1"""
+        if self._key_index is None:
+            keys = _key_array({'start': self.start, 'end': self.end, **self.codes})
+            order = np.argsort(keys, kind='stable')
+            self._key_index = (keys[order], order)
+        sorted_keys, order = self._key_index
+        wanted = _key_array(encoded)
+        found = np.searchsorted(sorted_keys, wanted)
+        found = np.minimum(found, max(len(sorted_keys) - 1, 0))
+        positions = np.full(len(wanted), -1, dtype=np.int64)
+        if len(sorted_keys):
+            hit = sorted_keys[found] == wanted
+            positions[hit] = order[found[hit]]
+        return positions
+
+
+def values_filter_clause(filters: dict = None, alias: str = 'v'):
+    """Условия WHERE и параметры по фильтрам значений показателей: date_from, date_to, indicator_id, dzo_id,
+    analytic_1..3. Значение фильтра - одно значение или список; пустые фильтры пропускаются"""
+    where, params = [], []
+    for name, value in (filters or {}).items():
+        if value is None or value == '' or value == []:
+            continue
+        if name == 'date_from':
+            where.append(f'{alias}."{DATE_COLUMNS["start"]}" >= %s')
+            params.append(parse_date(value))
+        elif name == 'date_to':
+            where.append(f'{alias}."{DATE_COLUMNS["end"]}" <= %s')
+            params.append(parse_date(value))
+        elif name in FILTER_FIELDS:
+            column = f'{alias}."{CODE_COLUMNS[FILTER_FIELDS[name]]}"'
+            if isinstance(value, (list, tuple, set)):
+                where.append(f'{column} = ANY(%s)')
+                params.append(list(value))
+            else:
+                where.append(f'{column} = %s')
+                params.append(value)
+        else:
+            raise ValueError(f"Неизвестный фильтр значений показателей: '{name}'")
+    return where, params
+
+
+def _key_array(columns: dict) -> np.ndarray:
+    """Ключи строк как структурный массив: сравнивается и сортируется лексикографически"""
+    keys = np.empty(len(columns['indicator']), dtype=[(field, np.int64) for field in KEY_FIELDS])
+    for field in KEY_FIELDS:
+        values = columns[field]
+        keys[field] = values.astype(np.int64) if values.dtype.kind != 'M' else values.view(np.int64)
+    return keys
+
+
+def _record_key(record) -> tuple:
+    return (
+        record.id_indicator, parse_date(record.date_period_start), parse_date(record.date_period_end),
+        record.analytic_1 or None, record.analytic_2 or None, record.analytic_3 or None,
+    )
+
+
+def _normalize(field: str, value):
+    # Пустая аналитика хранится в БД как NULL; идентификатор ДЗО из полей ввода приходит строкой
+    if value is None or value == '':
+        return None
+    if field == 'dzo':
+        return int(value)
+    return value
+
+
+def _to_days(values: pd.Series) -> np.ndarray:
+    if values.dtype.kind == 'M':
+        return values.to_numpy().astype('datetime64[D]')
+    # numpy разбирает ISO-даты сам и, в отличие от datetime64[ns], принимает 9999-12-31
+    return np.array(values.where(values.notna(), 'NaT').astype(str), dtype='datetime64[D]')
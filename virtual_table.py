@@ -0,0 +1,163 @@
+from bisect import bisect_right
+
+import flet as ft
+import theme.colors as colors
+
+
+class VirtualTable:
+    """Таблица для экранов справочников: строки создаются порциями по мере прокрутки ft.ListView,
+    поэтому в дереве контролов находятся только просмотренные записи"""
+
+    def __init__(self, header: ft.Row, render_row, batch_size: int = 60, footer: ft.Control = None,
+                 key=None, reload=None):
+        # render_row(item, container) строит содержимое строки; container нужен для перехода в режим редактирования
+        self.render_row = render_row
+        # key(item) - порядок записей, в котором их отдает БД; нужен для вставки на место
+        self.key = key
+        # reload() - полная перезагрузка экрана, если точечное изменение применить не удалось
+        self.reload = reload
+        self.batch_size = batch_size
+        self.items = []
+        self.loading = False
+        self.controls_created = 0
+        self.header = header
+        self.footer = footer
+        self.list_view = ft.ListView(
+            expand=True,
+            spacing=0,
+            padding=ft.padding.only(bottom=50),
+            on_scroll=self._on_scroll,
+            on_scroll_interval=100,
+        )
+
+    def build(self):
+        controls = [self.header, ft.Divider(color=colors.grey), self.list_view]
+        if self.footer:
+            controls.append(self.footer)
+        return ft.Column(controls=controls, expand=True)
+
+    def set_items(self, items):
+        """Заменить записи таблицы; строится только первая порция строк.
+        Список не копируется: insert/replace/remove меняют его на месте"""
+        self.items = items if isinstance(items, list) else list(items)
+        self.loading = False
+        self.list_view.controls = []
+        self._materialize(self.batch_size)
+
+    def show_skeleton(self, rows: int = 8):
+        """Показать заглушки строк по колонкам заголовка, пока данные загружаются"""
+        self.items = []
+        self.loading = True
+        self.list_view.controls = [self._skeleton_row() for _ in range(rows)]
+
+    def apply(self, change):
+        """Выполнить точечное изменение; при ошибке перезагрузить таблицу целиком.
+        Пока идет загрузка, изменение не применяется: таблица загружается заново"""
+        if self.loading and self.reload is not None:
+            return self.reload()
+        try:
+            return change()
+        except Exception:
+            if self.reload is None:
+                raise
+            self.reload()
+
+    def insert(self, item) -> int:
+        """Вставить запись на место по key; строка строится, только если попадает в построенную часть"""
+        if self.key is None:
+            index = len(self.items)
+        else:
+            keys = [self.key(existing) for existing in self.items]
+            index = bisect_right(keys, self.key(item))
+        self.items.insert(index, item)
+        if index < self.materialized or self.materialized == len(self.items) - 1:
+            self.list_view.controls.insert(index, self._build_row(item))
+            self.list_view.update()
+        return index
+
+    def replace(self, old_item, new_item) -> int:
+        """Заменить запись; если ее место в порядке не изменилось, перестраивается одна строка"""
+        index = self.index_of(old_item)
+        if self.key is not None and self.key(old_item) != self.key(new_item):
+            self.remove(old_item)
+            return self.insert(new_item)
+        self.items[index] = new_item
+        if index < self.materialized:
+            container = self.list_view.controls[index]
+            container.content = self.render_row(new_item, container)
+            self.controls_created += _count_controls(container.content)
+            container.update()
+        return index
+
+    def remove(self, item) -> int:
+        index = self.index_of(item)
+        self.items.pop(index)
+        if index < self.materialized:
+            self.list_view.controls.pop(index)
+            self.list_view.update()
+        return index
+
+    def index_of(self, item) -> int:
+        for index, existing in enumerate(self.items):
+            if existing is item:
+                return index
+        if self.key is not None:
+            item_key = self.key(item)
+            for index, existing in enumerate(self.items):
+                if self.key(existing) == item_key:
+                    return index
+        raise ValueError("Запись не найдена в таблице")
+
+    @property
+    def materialized(self) -> int:
+        return len(self.list_view.controls)
+
+    def stats(self) -> dict:
+        return {
+            'items': len(self.items),
+            'materialized_rows': self.materialized,
+            'controls_created': self.controls_created,
+        }
+
+    def _materialize(self, count: int):
+        start = self.materialized
+        for item in self.items[start:start + count]:
+            self.list_view.controls.append(self._build_row(item))
+
+    def _build_row(self, item) -> ft.Container:
+        container = ft.Container()
+        container.content = self.render_row(item, container)
+        self.controls_created += 1 + _count_controls(container.content)
+        return container
+
+    def _skeleton_row(self) -> ft.Container:
+        cells = []
+        for column in self.header.controls:
+            if column.expand:
+                cells.append(ft.Container(height=14, expand=True, bgcolor=colors.grey, opacity=0.4, border_radius=4))
+            else:
+                cells.append(ft.Container(width=column.width))
+        return ft.Container(
+            content=ft.Row(controls=cells),
+            padding=ft.padding.symmetric(vertical=12),
+        )
+
+    def _on_scroll(self, e: ft.OnScrollEvent):
+        if self.materialized >= len(self.items) or e.max_scroll_extent is None:
+            return
+        # Достраиваем следующую порцию, когда до конца списка осталось меньше экрана
+        if e.pixels >= e.max_scroll_extent - (e.viewport_dimension or 0):
+            self._materialize(self.batch_size)
+            self.list_view.update()
+
+
+def _count_controls(control) -> int:
+    if control is None:
+        return 0
+    count = 1
+    for child in getattr(control, 'controls', None) or []:
+        count += _count_controls(child)
+    content = getattr(control, 'content', None)
+    if isinstance(content, ft.Control):
+        count += _count_controls(content)
+    return count